@@ -0,0 +1,34 @@
+"""
+为已有 session 回填 raw IMU 列式存储（imu/{session_id}/*.npy）
+新上传的 session 在上传时已自动生成，只需对旧数据运行一次
+运行: python backfill_imu_store.py [--force]
+"""
+import sys
+from pathlib import Path
+
+from config import settings
+from services import storage
+from services.csv_parser import iter_raw_csv_chunks
+
+force = "--force" in sys.argv
+
+csv_root = Path(settings.data_dir) / "csv_files"
+raw_files = sorted(csv_root.glob("*/raw.csv")) if csv_root.exists() else []
+
+done, skipped, failed = 0, 0, 0
+for raw_path in raw_files:
+    session_id = raw_path.parent.name
+    if storage.has_raw_columns(session_id) and not force:
+        skipped += 1
+        continue
+    try:
+        rows = storage.write_raw_columns(
+            session_id, iter_raw_csv_chunks(raw_path, settings.raw_csv_chunk_rows)
+        )
+        print(f"✅ {session_id}: {rows} 行")
+        done += 1
+    except Exception as e:
+        print(f"❌ {session_id}: {e}")
+        failed += 1
+
+print(f"\n完成: 回填 {done}, 跳过 {skipped}, 失败 {failed}")
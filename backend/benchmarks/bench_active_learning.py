@@ -0,0 +1,78 @@
+"""
+主动学习队列基准：冷启动打分 vs 缓存命中 vs 队列标注后重取
+在临时库里造一个带标注的 session 训练模型，再造 N 个未标注动作（分在 10 个 session），
+经 TestClient 调 GET /api/active-learning/queue 和 POST /api/active-learning/label 计时
+运行: python benchmarks/bench_active_learning.py [未标注动作数]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/active.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from db.database import SessionLocal, init_db
+from main import app
+from services import storage
+from services.model_trainer import run_training
+
+N_SESSIONS = 10
+
+
+def add_session(db, session_id: str, n_actions: int, labeled: bool, seed: int):
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 2, n_actions)
+    feats = rng.normal(size=(n_actions, 40)).astype(np.float32) + labels[:, None] * 0.3
+    storage.save_session(db, session_id, {"name": session_id})
+    storage.save_actions(db, session_id, [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": ("good" if labels[i] else "bad") if labeled else "unlabeled", "features": feats[i]}
+        for i in range(n_actions)
+    ])
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:>40}: {(time.perf_counter() - start) * 1000:9.1f} ms")
+    return result
+
+
+if __name__ == "__main__":
+    n_unlabeled = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    init_db()
+    db = SessionLocal()
+    add_session(db, "labeled", 3000, labeled=True, seed=0)
+    run_training(db, "model", ["labeled"], model_type="hist_gradient_boosting", eval_mode="fast")
+    session_ids = [f"u{i}" for i in range(N_SESSIONS)]
+    for i, session_id in enumerate(session_ids):
+        add_session(db, session_id, n_unlabeled // N_SESSIONS, labeled=False, seed=i + 1)
+    db.close()
+
+    client = TestClient(app)
+    params = {"run_id": "model", "session_ids": session_ids, "limit": 20}
+
+    def queue():
+        r = client.get("/api/active-learning/queue", params=params)
+        assert r.status_code == 200, r.text
+        return r.json()
+
+    print(f"unlabeled actions: {n_unlabeled}")
+    page = timed("first fetch (score all sessions)", queue)
+    timed("re-fetch (cached)", queue)
+    for _ in range(3):
+        top = page["items"][0]
+        timed("label top item via queue", lambda: client.post(
+            "/api/active-learning/label", json=[{"action_id": top["action_id"], "manual_quality": top["predicted"]}]
+        ))
+        page = timed("re-fetch after queue label", queue)
+    client.post(f"/api/sessions/{session_ids[0]}/actions/bulk-update",
+                json=[{"action_id": page["items"][-1]["action_id"], "manual_quality": "good"}])
+    timed("re-fetch after outside edit (1 session)", queue)
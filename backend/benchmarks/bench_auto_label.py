@@ -0,0 +1,84 @@
+"""
+自动标注吞吐基准
+在临时库里造一个带标注的小 session 训练 hist_gradient_boosting，再造 N 个未标注动作，
+直接调用 auto_labeler.label_actions，分别统计读特征矩阵、打分、写回的耗时
+运行: python benchmarks/bench_auto_label.py [未标注动作数]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/autolabel.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from db.database import SessionLocal, init_db
+from services import auto_labeler, model_registry, storage
+from services.model_trainer import run_training
+
+
+def add_session(db, session_id: str, n_actions: int, labeled: bool, seed: int):
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 2, n_actions)
+    feats = rng.normal(size=(n_actions, 40)).astype(np.float32) + labels[:, None] * 0.3
+    storage.save_session(db, session_id, {"name": session_id})
+    storage.save_actions(db, session_id, [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": ("good" if labels[i] else "bad") if labeled else "unlabeled", "features": feats[i]}
+        for i in range(n_actions)
+    ])
+
+
+class Timer:
+    """包一层 storage / registry 函数，累计各阶段耗时"""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def wrap(self, module, name: str, stage: str):
+        original = getattr(module, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.seconds[stage] = self.seconds.get(stage, 0.0) + time.perf_counter() - start
+
+        setattr(module, name, timed)
+
+
+if __name__ == "__main__":
+    n_unlabeled = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    init_db()
+    db = SessionLocal()
+
+    add_session(db, "labeled", 3000, labeled=True, seed=0)
+    run_training(db, "model", ["labeled"], model_type="hist_gradient_boosting", eval_mode="fast")
+    session_ids = []
+    for i in range(0, n_unlabeled, 50_000):
+        session_ids.append(f"u{i // 50_000:02d}")
+        add_session(db, session_ids[-1], min(50_000, n_unlabeled - i), labeled=False, seed=i + 1)
+
+    timer = Timer()
+    timer.wrap(storage, "load_unlabeled_matrix", "load")
+    timer.wrap(model_registry, "score", "score")
+    timer.wrap(storage, "write_ml_labels", "write")
+
+    storage.create_label_job(db, "bench", {"run_id": "model", "session_ids": session_ids})
+    storage.claim_label_job(db, "bench")
+    start = time.perf_counter()
+    auto_labeler.label_actions(db, "bench", "model", session_ids)
+    total = time.perf_counter() - start
+
+    job = storage.get_label_job(db, "bench")
+    print(f"actions: {job['processed']} (good {job['good_count']}, bad {job['bad_count']})")
+    for stage, seconds in timer.seconds.items():
+        print(f"{stage:>6}: {seconds:7.2f}s")
+    print(f" total: {total:7.2f}s  ({job['processed'] / total:,.0f} actions/s)")
+    db.close()
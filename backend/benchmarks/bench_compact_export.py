@@ -0,0 +1,64 @@
+"""
+手表精简导出基准：不同预算下学生模型的体积、保真度和单样本推理耗时
+在临时库里训练一个大随机森林作为教师，依次用几档字节数预算调用 compact_exporter.export_compact，
+打印选中的学生模型和教师的对比
+运行: python benchmarks/bench_compact_export.py [训练样本数] [森林树数]
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/compact.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from db.database import SessionLocal, init_db
+from services import compact_exporter, storage
+from services.model_trainer import run_training
+
+BUDGETS = [2_000, 4_000, 16_000, 64_000]
+
+
+def seed(db, n_actions: int):
+    """带非线性边界的两类数据：标签由几个特征的交互决定，线性学生和浅树都有损失"""
+    rng = np.random.default_rng(0)
+    feats = rng.normal(size=(n_actions, 40)).astype(np.float32)
+    score = feats[:, 0] * feats[:, 1] + np.sin(feats[:, 2] * 2) + 0.5 * feats[:, 3] + rng.normal(0, 0.3, n_actions)
+    labels = score > 0
+    storage.save_session(db, "bench", {"name": "bench"})
+    storage.save_actions(db, "bench", [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": "good" if labels[i] else "bad", "features": feats[i]}
+        for i in range(n_actions)
+    ])
+
+
+if __name__ == "__main__":
+    n_train = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    n_estimators = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    init_db()
+    db = SessionLocal()
+    seed(db, n_train)
+    run_training(db, "teacher", ["bench"], model_type="random_forest", n_estimators=n_estimators,
+                 eval_mode="fast", scalable=False)
+
+    print(f"{'budget B':>9} {'student':>8} {'size':>7} {'size B':>7} {'fidelity':>9} {'accuracy':>9} "
+          f"{'p50 us':>7} {'teacher B':>10} {'teacher p50 us':>15} {'distill s':>10}")
+    for budget in BUDGETS:
+        report = compact_exporter.export_compact(db, "teacher", max_bytes=budget)
+        size = report["nodes"] if report["student"] == "tree" else report["params"]["n_features"]
+        unit = "nodes" if report["student"] == "tree" else "feats"
+        print(f"{budget:>9} {report['student']:>8} {f'{size} {unit}':>7} {report['size_bytes']:>7} "
+              f"{report['fidelity']:>9.2%} {report['accuracy']:>9.2%} {report['latency_us']['p50']:>7.1f} "
+              f"{report['teacher_bytes']:>10} {report['teacher_latency_us']['p50']:>15.1f} "
+              f"{report['distill_seconds']:>10.2f}")
+
+    print("\n最后一档预算的保真度 - 体积曲线:")
+    for candidate in report["candidates"]:
+        size = candidate["nodes"] if candidate["student"] == "tree" else candidate["params"]["n_features"]
+        print(f"  {candidate['student']:>6} {size:>5} {candidate['size_bytes']:>7} B  fidelity {candidate['fidelity']:.2%}")
+    db.close()
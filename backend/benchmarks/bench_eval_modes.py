@@ -0,0 +1,54 @@
+"""
+训练评估方式基准：full（交叉验证 + 80/20 + 全量重训）vs fast（out-of-fold + 一次全量训练）
+在临时库里造一个带标注的 session，各模型类型分别用两种方式跑 run_training，
+比较 TrainingRun 里记录的 train_seconds 和指标
+运行: python benchmarks/bench_eval_modes.py [样本数]
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/eval.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from db.database import SessionLocal, init_db
+from services import storage
+from services.model_trainer import EVAL_MODES, run_training
+
+MODEL_TYPES = ["svm", "decision_tree", "random_forest"]
+
+
+def seed(db, n_actions: int):
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 2, n_actions)
+    feats = rng.normal(size=(n_actions, 40)).astype(np.float32) + labels[:, None] * 0.3
+    storage.save_session(db, "bench", {"name": "bench"})
+    storage.save_actions(db, "bench", [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": "good" if labels[i] else "bad", "features": feats[i]}
+        for i in range(n_actions)
+    ])
+
+
+if __name__ == "__main__":
+    n_actions = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    init_db()
+    db = SessionLocal()
+    seed(db, n_actions)
+
+    print(f"{'model':>14} {'mode':>5} {'seconds':>9} {'accuracy':>9} {'f1':>7} {'cv_mean':>8} {'speedup':>8}")
+    for model_type in MODEL_TYPES:
+        seconds = {}
+        for mode in EVAL_MODES:
+            run_id = f"{model_type}-{mode}"
+            run_training(db, run_id, ["bench"], model_type=model_type, eval_mode=mode)
+            run = storage.get_training_run(db, run_id)
+            seconds[mode] = run["train_seconds"]
+            print(f"{model_type:>14} {mode:>5} {run['train_seconds']:>8.2f}s {run['accuracy']:>9.3f} "
+                  f"{run['f1_score']:>7.3f} {run['cv_mean']:>8.3f} {seconds['full'] / run['train_seconds']:>7.1f}x")
+    db.close()
@@ -0,0 +1,135 @@
+"""
+事件循环阻塞基准：训练进行中 /health 和 /api/sessions/list 的延迟
+用 uvicorn 启动后端（单 worker），先测空闲时的延迟，再在另一个线程里提交
+训练任务（SVM，数千个样本）并轮询到结束，训练期间持续请求两个轻量接口，
+对比两个阶段的 p50 / p99 / max
+运行: python benchmarks/bench_event_loop.py [样本数]
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+IDLE_SECONDS = 3.0
+PROBE_PATHS = ["/health", "/api/sessions/list"]
+
+
+def seed(n_actions: int):
+    """在临时库里造一个带特征和标注的 session，供训练使用"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    from db.database import SessionLocal, init_db
+    from services import storage
+
+    init_db()
+    db = SessionLocal()
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 2, n_actions)
+    feats = rng.normal(size=(n_actions, 40)).astype(np.float32) + labels[:, None] * 0.3
+    storage.save_session(db, "bench", {"name": "bench"})
+    storage.save_actions(db, "bench", [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": "good" if labels[i] else "bad", "features": feats[i]}
+        for i in range(n_actions)
+    ])
+    db.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(url: str, body: dict = None, timeout: float = 600) -> float:
+    """发请求并返回耗时（秒）"""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        r.read()
+    return time.perf_counter() - start
+
+
+def probe(base: str, stop: threading.Event) -> dict[str, list[float]]:
+    latencies = {path: [] for path in PROBE_PATHS}
+    while not stop.is_set():
+        for path in PROBE_PATHS:
+            latencies[path].append(request(base + path))
+        time.sleep(0.02)
+    return latencies
+
+
+def report(phase: str, latencies: dict[str, list[float]]):
+    for path, values in latencies.items():
+        ms = np.array(values) * 1000
+        print(f"{phase:>9} {path:<20} {len(ms):>6} {np.percentile(ms, 50):>8.1f} "
+              f"{np.percentile(ms, 99):>8.1f} {ms.max():>9.1f}")
+
+
+if __name__ == "__main__":
+    n_actions = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATA_DIR"] = tmp
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    seed(n_actions)
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy(),
+    )
+    try:
+        for _ in range(100):
+            try:
+                request(base + "/health", timeout=1)
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        print(f"{'phase':>9} {'path':<20} {'reqs':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>9}")
+
+        stop = threading.Event()
+        threading.Timer(IDLE_SECONDS, stop.set).start()
+        report("idle", probe(base, stop))
+
+        stop = threading.Event()
+        train_time = []
+
+        def train():
+            # /start 立即返回 run_id，轮询 /status 直到训练结束
+            start = time.perf_counter()
+            with urllib.request.urlopen(urllib.request.Request(
+                base + "/api/training/start",
+                data=json.dumps({"session_ids": ["bench"], "model_type": "svm"}).encode(),
+                headers={"Content-Type": "application/json"},
+            )) as r:
+                run_id = json.loads(r.read())["run_id"]
+            while True:
+                with urllib.request.urlopen(f"{base}/api/training/status/{run_id}") as r:
+                    if json.loads(r.read())["status"] in ("completed", "failed", "cancelled"):
+                        break
+                time.sleep(0.2)
+            train_time.append(time.perf_counter() - start)
+            stop.set()
+
+        trainer = threading.Thread(target=train)
+        trainer.start()
+        report("training", probe(base, stop))
+        trainer.join()
+        print(f"training run: {train_time[0]:.1f}s ({n_actions} samples)")
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,63 @@
+"""
+特征提取基准：前缀和批量路径 vs 逐窗口路径
+在生成的 100Hz session 上比较耗时，并检查两者结果一致
+运行: python benchmarks/bench_features.py [分钟数]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.csv_parser import TimeIndex, detect_peaks
+from services.feature_extractor import batch_extract_features, _batch_extract_features_per_window
+
+SAMPLE_RATE = 100
+WINDOW_SIZE = 0.45
+
+
+def make_session(minutes: float, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n = int(minutes * 60 * SAMPLE_RATE)
+    df = pd.DataFrame({
+        "time": 1708180000.0 + np.arange(n) / SAMPLE_RATE,
+        "userAccelX": rng.normal(0, 0.8, n),
+        "userAccelY": rng.normal(0, 0.8, n),
+        "userAccelZ": rng.normal(0, 1.2, n),
+        "rotationRateX": rng.normal(0, 0.5, n),
+        "rotationRateY": rng.normal(0, 0.5, n),
+        "rotationRateZ": rng.normal(0, 0.5, n),
+    })
+    df["accMag"] = np.sqrt(df.userAccelX**2 + df.userAccelY**2 + df.userAccelZ**2)
+    df["gyroMag"] = np.sqrt(df.rotationRateX**2 + df.rotationRateY**2 + df.rotationRateZ**2)
+    return df
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    minutes_list = [float(sys.argv[1])] if len(sys.argv) > 1 else [1, 10, 60]
+
+    print(f"{'minutes':>8} {'rows':>9} {'actions':>8} {'per-window':>11} {'prefix-sum':>11} {'speedup':>8} {'max diff':>9}")
+    for minutes in minutes_list:
+        df = make_session(minutes)
+        peaks = detect_peaks(df)
+
+        (X_ref, p_ref), t_ref = timed(
+            _batch_extract_features_per_window, df, peaks, WINDOW_SIZE, TimeIndex.from_frame(df)
+        )
+        (X_new, p_new), t_new = timed(batch_extract_features, df, peaks, WINDOW_SIZE)
+
+        assert p_ref == p_new
+        max_diff = float(np.max(np.abs(X_ref - X_new))) if len(X_ref) else 0.0
+        assert np.allclose(X_ref, X_new, rtol=1e-5, atol=1e-5), max_diff
+
+        print(f"{minutes:>8g} {len(df):>9} {len(peaks):>8} {t_ref:>10.3f}s {t_new:>10.3f}s "
+              f"{t_ref / t_new:>7.1f}x {max_diff:>9.2e}")
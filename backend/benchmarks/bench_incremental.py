@@ -0,0 +1,68 @@
+"""
+增量模型更新基准：每次新增一个 session 时，增量更新 vs 从头训练的耗时
+在临时库里逐个加入带标注的 session（每个 ACTIONS_PER_SESSION 个动作），
+每加一个就对同一个 incremental_sgd 任务做一次增量更新，同时新建一个任务
+在全部 session 上从头训练作对照。增量更新的耗时应只随 delta 增长
+运行: python benchmarks/bench_incremental.py [session 数] [每个 session 的动作数]
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/incremental.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from db.database import SessionLocal, init_db
+from services import storage
+from services.incremental_trainer import run_incremental_update
+
+
+def add_session(db, session_id: str, n_actions: int, seed: int):
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 2, n_actions)
+    feats = rng.normal(size=(n_actions, 40)).astype(np.float32) + labels[:, None] * 0.3
+    storage.save_session(db, session_id, {"name": session_id})
+    storage.save_actions(db, session_id, [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": "good" if labels[i] else "bad", "features": feats[i]}
+        for i in range(n_actions)
+    ])
+
+
+def train(db, run_id: str, session_ids: list[str], new: bool) -> dict:
+    if new:
+        storage.create_training_run(db, run_id, {
+            "model_type": "incremental_sgd", "session_ids": session_ids,
+            "hyperparams": {"model_type": "incremental_sgd"},
+        })
+    else:
+        storage.requeue_training_run(db, run_id, session_ids)
+    return run_incremental_update(db, run_id, storage.get_training_run(db, run_id))
+
+
+if __name__ == "__main__":
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    actions_per_session = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    init_db()
+    db = SessionLocal()
+
+    print(f"{'sessions':>9} {'history':>8} {'delta':>6} {'update':>9} {'rebuild':>9} {'speedup':>8} {'preq_acc':>9}")
+    session_ids = []
+    for i in range(n_sessions):
+        session_id = f"s{i:03d}"
+        add_session(db, session_id, actions_per_session, seed=i)
+        session_ids.append(session_id)
+
+        result = train(db, "incremental", [session_id], new=(i == 0))
+        update = result["hyperparams"]["incremental"]
+        rebuild = train(db, f"rebuild-{i}", session_ids, new=True)
+        acc = update["accuracy"]
+        print(f"{len(session_ids):>9} {result['sample_count']:>8} {update['added'] + update['relabeled']:>6} "
+              f"{update['seconds']:>8.3f}s {rebuild['train_seconds']:>8.3f}s "
+              f"{rebuild['train_seconds'] / update['seconds']:>7.1f}x {acc if acc is not None else float('nan'):>9.3f}")
+    db.close()
@@ -0,0 +1,91 @@
+"""
+推理延迟基准：batch 大小 1 ~ 10k 下的 p50 / p99
+在临时库里训练几个模型，分别测
+- predict: model_registry.predict（缓存命中后的一次 predict_proba；树模型小 batch 走 .trees.npz）
+- endpoint: 经 TestClient 调 POST /api/inference/predict（请求体预先编码好，
+  计时包含服务端 JSON 解析、校验和响应序列化）
+运行: python benchmarks/bench_inference.py [训练样本数]
+"""
+import os
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/inference.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from config import settings
+from db.database import SessionLocal, init_db
+from main import app
+from services import model_registry, storage
+from services.incremental_trainer import run_incremental_update
+from services.model_trainer import run_training
+
+MODEL_TYPES = ["svm", "random_forest", "hist_gradient_boosting", "incremental_sgd"]
+BATCH_SIZES = [1, 10, 100, 1000, 10_000]
+
+
+def seed(db, n_actions: int):
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 2, n_actions)
+    feats = rng.normal(size=(n_actions, 40)).astype(np.float32) + labels[:, None] * 0.3
+    storage.save_session(db, "bench", {"name": "bench"})
+    storage.save_actions(db, "bench", [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": "good" if labels[i] else "bad", "features": feats[i]}
+        for i in range(n_actions)
+    ])
+
+
+def repeats(batch_size: int) -> int:
+    return 200 if batch_size <= 100 else 50 if batch_size <= 1000 else 20
+
+
+def percentiles(seconds: list[float]) -> str:
+    p50, p99 = np.percentile(np.array(seconds) * 1000, [50, 99])
+    return f"{p50:>9.2f} {p99:>9.2f}"
+
+
+if __name__ == "__main__":
+    n_train = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    init_db()
+    db = SessionLocal()
+    seed(db, n_train)
+
+    client = TestClient(app)
+    rng = np.random.default_rng(1)
+    print(f"{'model':>24} {'batch':>6} {'predict p50':>11} {'p99':>9} {'endpoint p50':>12} {'p99':>9}  (ms)")
+    for model_type in MODEL_TYPES:
+        run_id = f"infer-{model_type}"
+        if model_type.startswith("incremental_"):
+            storage.create_training_run(db, run_id, {
+                "model_type": model_type, "session_ids": ["bench"], "hyperparams": {"model_type": model_type},
+            })
+            run_incremental_update(db, run_id, storage.get_training_run(db, run_id))
+        else:
+            run_training(db, run_id, ["bench"], model_type=model_type, eval_mode="fast", scalable=False)
+
+        for batch_size in BATCH_SIZES:
+            # 与推理接口一样，小 batch 用编译后的树模型
+            bundle = model_registry.get_bundle(run_id, compiled=batch_size <= settings.compiled_tree_max_batch)
+            X = rng.normal(size=(batch_size, 40))
+            body = json.dumps({"run_id": run_id, "features": X.tolist()})
+            direct, endpoint = [], []
+            for _ in range(repeats(batch_size)):
+                start = time.perf_counter()
+                model_registry.predict(bundle, X)
+                direct.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                r = client.post("/api/inference/predict", content=body, headers={"Content-Type": "application/json"})
+                endpoint.append(time.perf_counter() - start)
+                assert r.status_code == 200, r.text
+            print(f"{model_type:>24} {batch_size:>6} {percentiles(direct):>21} {percentiles(endpoint):>22}")
+    db.close()
@@ -0,0 +1,57 @@
+"""
+大数据量训练基准：训练耗时 vs 准确率
+在 make_classification 生成的 40 维非线性数据上，按 80/20 划分比较
+svm / svm_approx / random_forest / hist_gradient_boosting 在 10k、100k、1M 样本下的
+训练时间和 test 准确率。超过 MAX_SAMPLES 的组合（SVC、RandomForest 太慢）跳过
+运行: python benchmarks/bench_large_dataset.py [样本数 ...]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.datasets import make_classification
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.model_trainer import build_model
+
+MODEL_TYPES = ["svm", "svm_approx", "random_forest", "hist_gradient_boosting"]
+
+# 每种模型在本基准中最多跑多少样本
+MAX_SAMPLES = {
+    "svm": 20_000,
+    "random_forest": 200_000,
+}
+
+
+def make_dataset(n: int) -> tuple[np.ndarray, np.ndarray]:
+    X, y = make_classification(
+        n_samples=n, n_features=40, n_informative=12, n_redundant=8,
+        n_clusters_per_class=4, class_sep=0.8, flip_y=0.02, random_state=0,
+    )
+    return X.astype(np.float64), y
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+
+    print(f"{'samples':>9} {'model':>24} {'fit':>9} {'predict':>9} {'accuracy':>9}")
+    for n in sizes:
+        X, y = make_dataset(n)
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+        for model_type in MODEL_TYPES:
+            if n > MAX_SAMPLES.get(model_type, n):
+                print(f"{n:>9} {model_type:>24} {'skipped':>9}")
+                continue
+            model = build_model(model_type, n_samples=len(X_train))
+            start = time.perf_counter()
+            model.fit(X_train, y_train)
+            fit_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            y_pred = model.predict(X_test)
+            predict_seconds = time.perf_counter() - start
+            print(f"{n:>9} {model_type:>24} {fit_seconds:>8.2f}s {predict_seconds:>8.2f}s "
+                  f"{accuracy_score(y_test, y_pred):>9.3f}")
@@ -0,0 +1,45 @@
+"""
+超参数搜索吞吐基准：候选数 / 秒 随 n_jobs 的变化
+在随机生成的 40 维特征上对 SVM 做网格搜索（5 折），n_jobs 取 1, 2, 4, ... 到 CPU 核数
+运行: python benchmarks/bench_search.py [样本数]
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.hyperparam_search import build_search
+
+SPACE = {"svm_c": [0.1, 0.3, 1.0, 3.0, 10.0, 30.0], "svm_kernel": ["rbf", "linear"]}
+
+
+def make_dataset(n: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    y = rng.integers(0, 2, n)
+    X = rng.normal(size=(n, 40)) + y[:, None] * 0.3
+    return X, y
+
+
+if __name__ == "__main__":
+    n_samples = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    X, y = make_dataset(n_samples)
+
+    n_jobs_list = [1]
+    while n_jobs_list[-1] * 2 <= (os.cpu_count() or 1):
+        n_jobs_list.append(n_jobs_list[-1] * 2)
+
+    print(f"{'n_jobs':>7} {'candidates':>11} {'seconds':>9} {'cand/s':>8} {'speedup':>8}")
+    baseline = None
+    for n_jobs in n_jobs_list:
+        search = build_search("svm", "grid", SPACE, cv=5, n_jobs=n_jobs)
+        start = time.perf_counter()
+        search.fit(X, y)
+        elapsed = time.perf_counter() - start
+        n_candidates = len(search.cv_results_["params"])
+        baseline = baseline or elapsed
+        print(f"{n_jobs:>7} {n_candidates:>11} {elapsed:>8.2f}s {n_candidates / elapsed:>8.2f} "
+              f"{baseline / elapsed:>7.1f}x")
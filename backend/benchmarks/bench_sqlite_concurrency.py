@@ -0,0 +1,109 @@
+"""
+SQLite 并发基准：批量写入期间读请求是否还能推进
+一个线程反复执行大批量 save_actions（模拟上传），若干线程循环 list_sessions
+（模拟 Streamlit 轮询 /api/sessions/list），分别在 rollback journal 和 WAL 下统计
+写入期间的读吞吐、延迟和 "database is locked" 错误数
+运行: python benchmarks/bench_sqlite_concurrency.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+READERS = 4
+WRITES = 3
+ACTIONS_PER_WRITE = 200_000
+
+
+def run_child():
+    sys.path.insert(0, str(BACKEND_DIR))
+    import numpy as np
+
+    from db.database import SessionLocal, init_db
+    from services import storage
+
+    init_db()
+    db = SessionLocal()
+    for i in range(20):
+        storage.save_session(db, f"s{i}", {"name": f"Session {i}"})
+    db.close()
+
+    feats = np.random.default_rng(0).normal(size=(ACTIONS_PER_WRITE, 40)).astype(np.float32)
+    actions = [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": "good" if i % 2 else "bad", "features": feats[i]}
+        for i in range(ACTIONS_PER_WRITE)
+    ]
+
+    writing = threading.Event()
+    done = threading.Event()
+    latencies: list[float] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def writer():
+        db = SessionLocal()
+        writing.set()
+        for i in range(WRITES):
+            storage.save_actions(db, f"s{i}", actions)
+        db.close()
+        done.set()
+
+    def reader():
+        db = SessionLocal()
+        writing.wait()
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                storage.list_sessions(db)
+                db.rollback()
+            except Exception:
+                db.rollback()
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        db.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(READERS)]
+    for t in threads:
+        t.start()
+    start = time.perf_counter()
+    writer()
+    elapsed = time.perf_counter() - start
+    for t in threads:
+        t.join()
+
+    lat = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    print(f"{os.environ['BENCH_CHILD']:>8} {elapsed:>8.2f}s {len(latencies):>8} "
+          f"{len(latencies) / elapsed:>9.0f} {np.percentile(lat, 50):>8.1f} "
+          f"{np.percentile(lat, 99):>8.1f} {lat.max():>9.1f} {errors[0]:>7}")
+
+
+if __name__ == "__main__":
+    if os.environ.get("BENCH_CHILD"):
+        run_child()
+        sys.exit(0)
+
+    print(f"{'journal':>8} {'write':>9} {'reads':>8} {'reads/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>9} {'errors':>7}")
+    # 旧默认配置（rollback journal + FULL + 2MB cache）对比新默认配置
+    profiles = {
+        "DELETE": {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL", "SQLITE_CACHE_SIZE_KB": "2000"},
+        "WAL": {},
+    }
+    for label, overrides in profiles.items():
+        tmp = tempfile.mkdtemp()
+        env = {
+            **os.environ,
+            **overrides,
+            "BENCH_CHILD": label,
+            "DATA_DIR": tmp,
+            "DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+        }
+        subprocess.run([sys.executable, __file__], env=env, check=True)
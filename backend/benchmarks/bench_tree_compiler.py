@@ -0,0 +1,107 @@
+"""
+编译树模型基准：.pkl（sklearn）对比 .trees.npz（tree_compiler）
+在临时库里用 run_training 训练决策树和随机森林，分别测
+- 文件大小、加载耗时（p50）、加载时分配的内存（tracemalloc 峰值）
+- batch 大小 1 ~ 10k 下 predict_proba 的 p50，并校验两者概率逐位相同
+运行: python benchmarks/bench_tree_compiler.py [训练样本数] [森林树数]
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/trees.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from db.database import SessionLocal, init_db
+from services import storage, tree_compiler
+from services.model_trainer import run_training
+
+BATCH_SIZES = [1, 10, 100, 1000, 10_000]
+
+
+def seed(db, n_actions: int):
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, 2, n_actions)
+    feats = rng.normal(size=(n_actions, 40)).astype(np.float32) + labels[:, None] * 0.3
+    storage.save_session(db, "bench", {"name": "bench"})
+    storage.save_actions(db, "bench", [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": "good" if labels[i] else "bad", "features": feats[i]}
+        for i in range(n_actions)
+    ])
+
+
+def load_pkl(path: Path) -> dict:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def measure_load(loader, path: Path, repeats: int = 20) -> tuple[float, int]:
+    """返回 (加载耗时 p50 秒, 加载时的内存分配峰值字节)"""
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        loader(path)
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    bundle = loader(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del bundle
+    return float(np.median(seconds)), peak
+
+
+def p50_ms(fn, X: np.ndarray, repeats: int) -> float:
+    fn(X)
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        seconds.append(time.perf_counter() - start)
+    return float(np.median(seconds)) * 1000
+
+
+if __name__ == "__main__":
+    n_train = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_estimators = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    init_db()
+    db = SessionLocal()
+    seed(db, n_train)
+    rng = np.random.default_rng(1)
+
+    for model_type in ["decision_tree", "random_forest"]:
+        run_id = f"trees-{model_type}"
+        run_training(db, run_id, ["bench"], model_type=model_type, n_estimators=n_estimators,
+                     eval_mode="fast", scalable=False)
+        pkl_path = storage.get_model_path(run_id, ext=".pkl")
+        npz_path = storage.get_model_path(run_id, ext=".trees.npz")
+        sk_model = load_pkl(pkl_path)["model"]
+        compiled = tree_compiler.load_bundle(npz_path)["model"]
+
+        print(f"\n== {model_type}: {compiled.n_trees} 棵树, {len(compiled.feature):,} 个节点, "
+              f"最大深度 {compiled.max_depth}")
+        print(f"{'format':>10} {'file KB':>9} {'load p50 ms':>12} {'load peak KB':>13}")
+        for name, loader, path in [("pkl", load_pkl, pkl_path), ("trees.npz", tree_compiler.load_bundle, npz_path)]:
+            seconds, peak = measure_load(loader, path)
+            print(f"{name:>10} {path.stat().st_size / 1024:>9.0f} {seconds * 1000:>12.2f} {peak / 1024:>13.0f}")
+        print(f"编译后常驻数组: {compiled.nbytes / 1024:.0f} KB")
+
+        print(f"{'batch':>6} {'sklearn p50':>12} {'compiled p50':>13} {'speedup':>8}  (ms)")
+        for batch_size in BATCH_SIZES:
+            X = rng.normal(size=(batch_size, 40)) * 1.5
+            expected = sk_model.predict_proba(X)
+            assert np.array_equal(compiled.predict_proba(X), expected), "概率与 sklearn 不一致"
+            assert np.array_equal(compiled.predict(X), sk_model.predict(X)), "标签与 sklearn 不一致"
+            repeats = 200 if batch_size <= 100 else 20
+            sk_ms = p50_ms(sk_model.predict_proba, X, repeats)
+            compiled_ms = p50_ms(compiled.predict_proba, X, repeats)
+            print(f"{batch_size:>6} {sk_ms:>12.2f} {compiled_ms:>13.2f} {sk_ms / compiled_ms:>7.1f}x")
+    db.close()
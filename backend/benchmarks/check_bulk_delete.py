@@ -0,0 +1,91 @@
+"""
+检查大批量删除 / 恢复动作时每条语句的绑定参数不超过 SQLite 旧版本的 999 个上限，且 session 计数正确
+在临时库上造一个几千个动作的 session，soft_delete_actions / restore_actions 全部 id（含重复 id），
+记录每条 SQL 的参数个数，并与 GROUP BY 重算的计数对比
+任一用例不符合时退出码为 1
+运行: python benchmarks/check_bulk_delete.py [动作数]
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/bulk_delete.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from sqlalchemy import event, select
+
+from db.database import SessionLocal, engine, init_db
+from db.models import Action
+from services import storage
+
+SQLITE_MAX_VARIABLES = 999
+
+
+def seed(db, n_actions: int):
+    rng = np.random.default_rng(0)
+    labels = rng.choice(["good", "bad", "unlabeled"], n_actions)
+    expected = {label: int(np.sum(labels == label)) for label in ("good", "bad", "unlabeled")}
+    # 与上传接口相同：计数随 session 元数据一起写入
+    storage.save_session(db, "bulk", {"name": "bulk", "action_count": n_actions,
+                                      **{f"{label}_count": n for label, n in expected.items()}})
+    storage.save_actions(db, "bulk", [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": str(labels[i]), "features": rng.normal(size=40).astype(np.float32)}
+        for i in range(n_actions)
+    ])
+    return expected
+
+
+def counts(db) -> dict:
+    db.expire_all()
+    session = storage.get_session(db, "bulk")
+    return {label: session[f"{label}_count"] for label in ("good", "bad", "unlabeled")}
+
+
+def max_parameters(fn) -> int:
+    """执行 fn 期间单条语句的最大绑定参数个数（executemany 按每组参数计）"""
+    largest = [0]
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        rows = parameters if executemany else [parameters]
+        largest[0] = max([largest[0]] + [len(row) for row in rows])
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    return largest[0]
+
+
+def check(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+if __name__ == "__main__":
+    n_actions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    init_db()
+    db = SessionLocal()
+    expected = seed(db, n_actions)
+    ids = list(db.execute(select(Action.id).where(Action.session_id == "bulk")).scalars())
+    results = [check("seeded counts", counts(db) == expected, str(counts(db)))]
+
+    # 前一半先删一次，再整体删除（含重复 id）：已删除的行不重复扣计数
+    storage.soft_delete_actions(db, ids[:len(ids) // 2])
+    largest = max_parameters(lambda: storage.soft_delete_actions(db, ids + ids[:100]))
+    results.append(check(f"soft delete {len(ids)} ids: ≤ {SQLITE_MAX_VARIABLES} parameters",
+                         largest <= SQLITE_MAX_VARIABLES, f"max {largest}"))
+    zero = {"good": 0, "bad": 0, "unlabeled": 0}
+    results.append(check("counts after delete", counts(db) == zero, str(counts(db))))
+
+    largest = max_parameters(lambda: storage.restore_actions(db, ids + ids[:100]))
+    results.append(check(f"restore {len(ids)} ids: ≤ {SQLITE_MAX_VARIABLES} parameters",
+                         largest <= SQLITE_MAX_VARIABLES, f"max {largest}"))
+    results.append(check("counts after restore", counts(db) == expected, str(counts(db))))
+    db.close()
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,112 @@
+"""
+检查手表精简导出在后台任务里执行，且报告的保真度就是导出文件的保真度
+- POST /api/training/compact-export/{run_id} 立即返回 pending 任务，GET /compact-export/jobs/{job_id} 轮询到 completed
+- 读回 models/{run_id}.compact.npz，在同一份留出样本上重新计算的保真度 / 准确率与报告一致，体积与文件大小一致
+- 参数不合法时入队前直接 400，不产生任务
+任一用例不符合时退出码为 1
+运行: python benchmarks/check_compact_export.py
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 进程池用 spawn 启动，子进程会重新导入本文件，临时目录要沿用父进程的
+_tmp = os.environ.setdefault("COMPACT_EXPORT_CHECK_DIR", tempfile.mkdtemp())
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/compact_check.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from db.database import SessionLocal
+from main import app
+from services import compact_exporter, model_registry, storage
+from services.model_trainer import run_training
+
+
+def seed(db, n_actions: int = 3000):
+    """带非线性边界的两类数据，学生模型与教师不会完全一致"""
+    rng = np.random.default_rng(0)
+    feats = rng.normal(size=(n_actions, 40)).astype(np.float32)
+    score = feats[:, 0] * feats[:, 1] + np.sin(feats[:, 2] * 2) + 0.5 * feats[:, 3] + rng.normal(0, 0.3, n_actions)
+    storage.save_session(db, "check", {"name": "check"})
+    storage.save_actions(db, "check", [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": "good" if score[i] > 0 else "bad", "features": feats[i]}
+        for i in range(n_actions)
+    ])
+
+
+def wait(client: TestClient, job_id: str, timeout: float = 300) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/training/compact-export/jobs/{job_id}").json()
+        if job["status"] not in ("pending", "running") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.2)
+
+
+def check(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    with TestClient(app) as client:
+        db = SessionLocal()
+        seed(db)
+        run_training(db, "teacher", ["check"], model_type="random_forest", n_estimators=50, eval_mode="fast")
+
+        for budget in ({"max_bytes": 4000}, {"max_nodes": 63, "student": "tree"}, {"max_bytes": 2000, "student": "linear"}):
+            start = time.perf_counter()
+            r = client.post("/api/training/compact-export/teacher", json=budget)
+            elapsed = time.perf_counter() - start
+            job = r.json()
+            results.append(check(
+                f"{budget} queued", r.status_code == 200 and job["status"] in ("pending", "running"),
+                f"{r.status_code} {job.get('status')} in {elapsed * 1000:.0f} ms",
+            ))
+            job = wait(client, job["job_id"])
+            report = job.get("report")
+            results.append(check(f"{budget} completed", job["status"] == "completed" and report is not None,
+                                 f"{job['status']} {job.get('error') or ''}"))
+            if not report:
+                continue
+
+            # 与导出流程相同的样本和拆分，只用读回的导出文件打分
+            path = storage.get_model_path("teacher", ext=".compact.npz")
+            with np.load(path, allow_pickle=False) as f:
+                exported = {name: f[name] for name in f.files}
+            teacher = model_registry.get_bundle("teacher", compiled=False)
+            _, X_val, _, t_val, y_val, labels = compact_exporter.distill_data(
+                db, storage.get_training_run(db, "teacher"), teacher,
+            )
+            predicted = exported["labels"][compact_exporter.predict_proba(exported, X_val).argmax(axis=1)]
+            fidelity = round(float(np.mean(predicted == labels[t_val])), 4)
+            accuracy = round(float(np.mean(predicted == y_val)), 4)
+            results.append(check(
+                f"{budget} fidelity measured on the saved model",
+                fidelity == report["fidelity"] and accuracy == report["accuracy"],
+                f"report {report['fidelity']:.2%} / {report['accuracy']:.2%}, file {fidelity:.2%} / {accuracy:.2%}",
+            ))
+            results.append(check(
+                f"{budget} size matches the saved file",
+                report["size_bytes"] == path.stat().st_size
+                and (budget.get("max_bytes") is None or report["size_bytes"] <= budget["max_bytes"]),
+                f"{report['size_bytes']} B",
+            ))
+            results.append(check(
+                f"{budget} stored on the training run",
+                storage.get_training_run(db, "teacher")["compact_export"] == report,
+            ))
+
+        r = client.post("/api/training/compact-export/teacher", json={"student": "linear", "max_nodes": 10})
+        results.append(check("invalid budget → 400", r.status_code == 400, f"{r.status_code} {r.json()}"))
+        r = client.post("/api/training/compact-export/missing", json={"max_bytes": 4000})
+        results.append(check("unknown run → 404", r.status_code == 404, str(r.status_code)))
+        db.close()
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,120 @@
+"""
+检查自动标注任务经 training_queue 调度：占用训练槽位、子进程崩溃时记为 failed、重启后重新执行
+- 子进程直接退出（BrokenProcessPool）：任务变为 failed 而不是一直 running，进程池重建后可继续调度
+- TRAINING_SLOTS=1 时自动标注任务运行期间，后提交的训练任务保持 pending，结束后才开始
+- 上次停在 running 的任务在 training_queue.start() 时重新入队并完成
+任一用例不符合时退出码为 1
+运行: python benchmarks/check_label_job_queue.py
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 进程池用 spawn 启动，子进程会重新导入本文件，临时目录要沿用父进程的
+_tmp = os.environ.setdefault("LABEL_QUEUE_CHECK_DIR", tempfile.mkdtemp())
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/label_queue.db"
+os.environ["TRAINING_SLOTS"] = "1"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from db.database import SessionLocal, init_db
+from services import auto_labeler, storage, training_queue
+from services.model_trainer import run_training
+
+
+def crash(job_id: str):
+    """模拟子进程被杀：不写任何状态直接退出"""
+    os._exit(1)
+
+
+def slow_label_job(job_id: str) -> str:
+    time.sleep(2)
+    return auto_labeler.run_label_job(job_id)
+
+
+def add_session(db, session_id: str, n_actions: int, labeled: bool, seed: int):
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 2, n_actions)
+    feats = rng.normal(size=(n_actions, 40)).astype(np.float32) + labels[:, None] * 0.3
+    storage.save_session(db, session_id, {"name": session_id})
+    storage.save_actions(db, session_id, [
+        {"action_index": i, "t_peak": float(i), "t_start": i - 0.45, "t_end": i + 0.45,
+         "manual_quality": ("good" if labels[i] else "bad") if labeled else "unlabeled", "features": feats[i]}
+        for i in range(n_actions)
+    ])
+
+
+def wait_label_job(db, job_id: str, timeout: float = 120) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        db.expire_all()
+        job = storage.get_label_job(db, job_id)
+        if job["status"] in ("completed", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.2)
+
+
+def wait_training_run(db, run_id: str, timeout: float = 120) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        db.expire_all()
+        run = storage.get_training_run(db, run_id)
+        if run["status"] not in ("pending", "training") or time.monotonic() > deadline:
+            return run
+        time.sleep(0.2)
+
+
+def check(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+if __name__ == "__main__":
+    init_db()
+    db = SessionLocal()
+    add_session(db, "labeled", 500, labeled=True, seed=0)
+    add_session(db, "unlabeled", 2000, labeled=False, seed=1)
+    run_training(db, "model", ["labeled"], model_type="decision_tree", eval_mode="fast")
+    job_data = {"run_id": "model", "session_ids": ["unlabeled"]}
+    results = []
+
+    training_queue.run_label_job = crash
+    training_queue.submit_label_job("crash", job_data)
+    job = wait_label_job(db, "crash")
+    results.append(check("worker crash → failed", job["status"] == "failed", f"{job['status']} {job['error']}"))
+
+    training_queue.run_label_job = slow_label_job
+    training_queue.submit_label_job("slow", job_data)
+    training_queue.submit("queued", {"model_type": "decision_tree", "session_ids": ["labeled"],
+                                     "hyperparams": {"eval_mode": "fast"}})
+    time.sleep(0.5)
+    db.expire_all()
+    label_status = storage.get_label_job(db, "slow")["status"]
+    run_status = storage.get_training_run(db, "queued")["status"]
+    results.append(check(
+        "label job holds the only slot",
+        label_status == "running" and run_status == "pending",
+        f"label {label_status}, training {run_status}",
+    ))
+    job = wait_label_job(db, "slow")
+    run = wait_training_run(db, "queued")
+    results.append(check("label job completed after pool rebuilt", job["status"] == "completed",
+                         f"{job['status']} {job['processed']}/{job['total']}"))
+    results.append(check("queued training ran after the label job", run["status"] == "completed", run["status"]))
+
+    # 模拟重启：任务停在 running，start() 把它放回队列并重新执行
+    training_queue.run_label_job = auto_labeler.run_label_job
+    storage.create_label_job(db, "interrupted", job_data)
+    storage.claim_label_job(db, "interrupted")
+    training_queue.start()
+    job = wait_label_job(db, "interrupted")
+    results.append(check("interrupted job requeued on start", job["status"] == "completed",
+                         f"{job['status']} {job['processed']}/{job['total']}"))
+
+    training_queue.stop()
+    db.close()
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,112 @@
+"""
+检查向量化的峰值检测与原先逐行扫描的实现结果完全一致
+参照实现是改写前 detect_peaks 的 iterrows 循环，逐个比较 index / time / magnitude：
+- 随机生成的 session（默认索引 / 非默认索引）
+- 空 session、没有超过阈值的点、候选点间隔正好等于 cooldown、time 乱序
+- batch_detect_peaks 与逐个 session 调用 detect_peaks 的结果相同
+任一用例不一致时退出码为 1
+运行: python benchmarks/check_peak_parity.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from services.csv_parser import batch_detect_peaks, detect_peaks
+
+THRESHOLD = 2.2
+COOLDOWN = 0.45
+
+
+def reference_detect_peaks(df: pd.DataFrame, threshold: float = THRESHOLD, cooldown: float = COOLDOWN) -> list[dict]:
+    """改写前的逐行实现（原样保留作为参照）"""
+    peaks = []
+    last_peak_time = -cooldown
+
+    for i, row in df.iterrows():
+        if row['accMag'] > threshold:
+            time_diff = row['time'] - last_peak_time
+            if time_diff >= cooldown:
+                peaks.append({
+                    'index': int(i),
+                    'time': float(row['time']),
+                    'magnitude': float(row['accMag'])
+                })
+                last_peak_time = row['time']
+
+    return peaks
+
+
+def generated_session(seed: int, n_rows: int = 5000, rate: float = 100.0) -> pd.DataFrame:
+    """模拟 100Hz 采样：大部分点低于阈值，夹杂成簇的击球峰值"""
+    rng = np.random.default_rng(seed)
+    times = np.arange(n_rows) / rate
+    acc_mag = np.abs(rng.normal(1.0, 0.5, n_rows))
+    for start in rng.integers(0, n_rows - 20, n_rows // 100):
+        acc_mag[start:start + rng.integers(1, 20)] += rng.uniform(1.5, 6.0)
+    return pd.DataFrame({'time': times, 'accMag': acc_mag})
+
+
+def cases() -> dict[str, pd.DataFrame]:
+    result = {f"generated seed={seed}": generated_session(seed) for seed in range(5)}
+
+    shifted = generated_session(10)
+    shifted.index = shifted.index * 3 + 1000
+    result["non-default index"] = shifted
+
+    permuted = generated_session(11, n_rows=2000)
+    permuted.index = np.random.default_rng(11).permutation(len(permuted)) + 7
+    result["permuted index labels"] = permuted
+
+    result["empty"] = pd.DataFrame({'time': np.array([], dtype=np.float64), 'accMag': np.array([], dtype=np.float64)})
+
+    quiet = generated_session(12, n_rows=1000)
+    quiet['accMag'] = np.minimum(quiet['accMag'], THRESHOLD)
+    result["no candidates (max == threshold)"] = quiet
+
+    # 候选点间隔正好是 cooldown（以及紧挨着 cooldown 两侧）
+    spaced_times = np.concatenate([
+        np.arange(20) * COOLDOWN,
+        10 + np.arange(20) * np.nextafter(COOLDOWN, 0),
+        20 + np.arange(20) * np.nextafter(COOLDOWN, 1),
+    ])
+    result["spaced exactly cooldown apart"] = pd.DataFrame({'time': spaced_times, 'accMag': np.full(len(spaced_times), 3.0)})
+
+    unsorted = generated_session(13, n_rows=3000)
+    unsorted['time'] = np.random.default_rng(13).permutation(unsorted['time'].to_numpy())
+    result["unsorted time"] = unsorted
+
+    backwards = generated_session(14, n_rows=3000)
+    backwards['time'] = backwards['time'].to_numpy()[::-1]
+    result["descending time"] = backwards
+    return result
+
+
+def same_peaks(expected: list[dict], actual: list[dict]) -> bool:
+    return len(expected) == len(actual) and all(
+        e['index'] == a['index'] and e['time'] == a['time'] and e['magnitude'] == a['magnitude']
+        for e, a in zip(expected, actual)
+    )
+
+
+if __name__ == "__main__":
+    failed = False
+    all_cases = cases()
+    for name, df in all_cases.items():
+        expected = reference_detect_peaks(df)
+        ok = same_peaks(expected, detect_peaks(df, THRESHOLD, COOLDOWN))
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} detect_peaks {name}: {len(expected)} peaks")
+
+    # batch 版本返回的 index 是数组内的位置，与默认 RangeIndex 下的 detect_peaks 对比
+    frames = [df.reset_index(drop=True) for df in all_cases.values()]
+    batched = batch_detect_peaks([(df['time'].to_numpy(), df['accMag'].to_numpy()) for df in frames], THRESHOLD, COOLDOWN)
+    ok = len(batched) == len(frames) and all(
+        same_peaks(detect_peaks(df, THRESHOLD, COOLDOWN), peaks) for df, peaks in zip(frames, batched)
+    )
+    failed |= not ok
+    print(f"{'✅' if ok else '❌'} batch_detect_peaks == detect_peaks per session ({len(frames)} sessions)")
+    sys.exit(1 if failed else 0)
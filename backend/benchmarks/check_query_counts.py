@@ -0,0 +1,77 @@
+"""
+检查列表接口的 SQL 语句数不随数据量增长（防止 N+1 回归）
+在临时库上分别造少量 / 大量 project、session、对话，统计 list_projects、
+get_project、list_conversations 各执行了多少条语句，两档不一致时退出码为 1
+运行: python benchmarks/check_query_counts.py
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/counts.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event
+
+from db.database import SessionLocal, engine, init_db
+from services import storage
+
+
+@contextmanager
+def count_statements():
+    counter = [0]
+
+    def on_execute(*_args):
+        counter[0] += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+
+
+def seed(db, n_projects: int, sessions_per_project: int, n_conversations: int):
+    for p in range(n_projects):
+        storage.create_project(db, f"p{n_projects}_{p}", f"Project {p}")
+        for s in range(sessions_per_project):
+            storage.save_session(db, f"s{n_projects}_{p}_{s}", {"project_id": f"p{n_projects}_{p}"})
+    for c in range(n_conversations):
+        storage.save_chat_message(db, f"c{n_conversations}_{c}", "user", f"question {c}")
+        storage.save_chat_message(db, f"c{n_conversations}_{c}", "assistant", "answer")
+
+
+def measure(db, project_id: str) -> dict:
+    result = {}
+    for name, fn in {
+        "list_projects": lambda: storage.list_projects(db),
+        "get_project": lambda: storage.get_project(db, project_id),
+        "list_conversations": lambda: storage.list_conversations(db),
+    }.items():
+        db.expire_all()
+        with count_statements() as counter:
+            fn()
+        result[name] = counter[0]
+    return result
+
+
+if __name__ == "__main__":
+    init_db()
+    db = SessionLocal()
+
+    seed(db, 2, 2, 2)
+    small = measure(db, "p2_0")
+    seed(db, 50, 10, 30)
+    large = measure(db, "p50_0")
+    db.close()
+
+    failed = False
+    for name in small:
+        ok = small[name] == large[name]
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {name}: {small[name]} → {large[name]} statements")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,114 @@
+"""
+检查热点查询的 SQLite 查询计划是否走索引
+在临时库上执行 init_db（含迁移），对每条查询跑 EXPLAIN QUERY PLAN，
+出现全表扫描（SCAN 表名）或缺少期望索引时退出码为 1
+运行: python benchmarks/check_query_plans.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/plans.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import func, select, text, tuple_
+
+from db.database import engine, init_db
+from db.models import Action, ChatMessage, Session, TrainingRun
+
+HOT_QUERIES = {
+    "list_actions": (
+        select(Action)
+        .where(Action.session_id == "s1", Action.is_deleted == False)
+        .order_by(Action.action_index),
+        "ix_actions_session_active",
+    ),
+    "training_actions": (
+        select(Action.id, Action.manual_quality, Action.features_blob)
+        .where(
+            Action.session_id.in_(["s1", "s2"]),
+            Action.is_deleted == False,
+            Action.manual_quality.in_(["good", "bad"]),
+        )
+        .order_by(Action.session_id, Action.action_index),
+        "ix_actions_session_active",
+    ),
+    "session_counts": (
+        select(Action.manual_quality, func.count())
+        .where(Action.session_id == "s1", Action.is_deleted == False)
+        .group_by(Action.manual_quality),
+        "ix_actions_session_active",
+    ),
+    "agent_quality_count": (
+        select(func.count(Action.id))
+        .where(Action.is_deleted == False, Action.manual_quality == "good"),
+        "ix_actions_quality_active",
+    ),
+    "chat_history": (
+        select(ChatMessage)
+        .where(ChatMessage.conversation_id == "c1")
+        .order_by(ChatMessage.created_at),
+        "ix_chat_messages_conversation_created",
+    ),
+    "sessions_page": (
+        select(Session)
+        .where(tuple_(Session.created_at, Session.id) > tuple_(datetime(2024, 1, 1), "s1"))
+        .order_by(Session.created_at, Session.id)
+        .limit(200),
+        "ix_sessions_created",
+    ),
+    "project_sessions_page": (
+        select(Session)
+        .where(Session.project_id == "p1")
+        .order_by(Session.created_at, Session.id)
+        .limit(200),
+        "ix_sessions_project_created",
+    ),
+    "actions_page": (
+        select(Action)
+        .where(
+            Action.session_id == "s1",
+            Action.is_deleted == False,
+            tuple_(Action.action_index, Action.id) > tuple_(10, 100),
+        )
+        .order_by(Action.action_index, Action.id)
+        .limit(200),
+        "ix_actions_session_active",
+    ),
+    "training_runs_page": (
+        select(TrainingRun)
+        .where(TrainingRun.parent_run_id.is_(None))
+        .order_by(TrainingRun.created_at, TrainingRun.id)
+        .limit(200),
+        "ix_training_runs_parent_created",
+    ),
+    "search_candidates": (
+        select(TrainingRun)
+        .where(TrainingRun.parent_run_id == "r1")
+        .order_by(TrainingRun.cv_mean.desc()),
+        "ix_training_runs_parent_created",
+    ),
+}
+
+
+def query_plan(stmt) -> list[str]:
+    sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql))]
+
+
+if __name__ == "__main__":
+    init_db()
+    failed = False
+    for name, (stmt, index) in HOT_QUERIES.items():
+        plan = query_plan(stmt)
+        ok = any(index in step for step in plan) and not any(
+            step.startswith("SCAN ") and "INDEX" not in step for step in plan
+        )
+        failed |= not ok
+        print(f"{'✅' if ok else '❌'} {name}: {' | '.join(plan)}")
+    sys.exit(1 if failed else 0)
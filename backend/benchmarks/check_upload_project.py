@@ -0,0 +1,107 @@
+"""
+检查上传到不存在的项目时返回 404，且不在 csv_files/ 和 imu/ 下留下孤儿文件
+sessions.project_id 有外键约束，未校验时 save_session 会在文件已移入 session 目录后才失败
+- POST /api/sessions/upload 带未知 project_id：404，没有 session 记录也没有文件
+- 接收文件期间项目被删除（直接调用 _ingest_upload）：同样 404，临时文件留给上传接口清理
+- 已有项目 / 不带项目：正常上传
+任一用例不符合时退出码为 1
+运行: python benchmarks/check_upload_project.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATA_DIR"] = _tmp
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/upload.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from db.database import SessionLocal
+from main import app
+from routers.sessions import _ingest_upload
+from services import storage
+
+
+def make_csvs(session_id: str, n_rows: int = 500, n_actions: int = 3) -> tuple[bytes, bytes]:
+    rng = np.random.default_rng(0)
+    times = 1708180000.0 + np.arange(n_rows) / 100
+    raw = ["session_id,session_type,time,userAccelX,userAccelY,userAccelZ,rotationRateX,rotationRateY,rotationRateZ"]
+    for t, values in zip(times, rng.normal(size=(n_rows, 6))):
+        raw.append(f"{session_id},create,{t:.6f}," + ",".join(f"{v:.6f}" for v in values))
+    feedback = ["session_id,action_index,t_peak,t_start,t_end,ml_classification,ml_quality,manual_quality"]
+    for i in range(n_actions):
+        peak = times[100 * (i + 1)]
+        feedback.append(f"{session_id},{i + 1},{peak:.6f},{peak - 0.45:.6f},{peak + 0.45:.6f},forehand,good,good")
+    return "\n".join(raw).encode(), "\n".join(feedback).encode()
+
+
+def upload(client: TestClient, session_id: str, project_id=None):
+    raw, feedback = make_csvs(session_id)
+    data = {"session_name": session_id}
+    if project_id:
+        data["project_id"] = project_id
+    return client.post(
+        "/api/sessions/upload",
+        files={"raw_csv": ("raw.csv", raw), "feedback_csv": ("feedback.csv", feedback)},
+        data=data,
+    )
+
+
+def leftovers(session_id: str) -> list[str]:
+    return [
+        str(path) for path in (
+            Path(_tmp) / "csv_files" / session_id,
+            Path(_tmp) / "imu" / session_id,
+        ) if path.exists()
+    ]
+
+
+def check(name: str, ok: bool, detail: str = "") -> bool:
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+    return ok
+
+
+if __name__ == "__main__":
+    results = []
+    with TestClient(app) as client:
+        r = upload(client, "orphan", project_id="no-such-project")
+        results.append(check("unknown project_id → 404", r.status_code == 404, f"{r.status_code} {r.json()}"))
+        db = SessionLocal()
+        results.append(check("no session row", storage.get_session(db, "orphan") is None))
+        results.append(check("no files left behind", not leftovers("orphan"), ", ".join(leftovers("orphan"))))
+
+        # 项目在接收文件期间被删除：_ingest_upload 在移动文件前发现并拒绝
+        raw, feedback = make_csvs("deleted")
+        raw_tmp, feedback_tmp = storage.new_upload_path(), storage.new_upload_path()
+        raw_tmp.write_bytes(raw)
+        feedback_tmp.write_bytes(feedback)
+        writer = storage.RawColumnWriter()
+        try:
+            _ingest_upload(db, raw_tmp, feedback_tmp, writer, "deleted-project", None)
+            status = 200
+        except HTTPException as e:
+            status = e.status_code
+        finally:
+            writer.discard()
+        results.append(check("project deleted during upload → 404", status == 404, str(status)))
+        results.append(check("temp files not moved", raw_tmp.exists() and feedback_tmp.exists()))
+        results.append(check("no files left behind", not leftovers("deleted"), ", ".join(leftovers("deleted"))))
+        raw_tmp.unlink(missing_ok=True)
+        feedback_tmp.unlink(missing_ok=True)
+
+        project_id = client.post("/api/projects/create", json={"name": "p"}).json()["project"]["id"]
+        r = upload(client, "with-project", project_id=project_id)
+        results.append(check("existing project → 200", r.status_code == 200, str(r.status_code)))
+        results.append(check(
+            "session attached to project",
+            (storage.get_session(db, "with-project") or {}).get("project_id") == project_id,
+        ))
+        r = upload(client, "no-project")
+        results.append(check("no project → 200", r.status_code == 200, str(r.status_code)))
+        db.close()
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,37 @@
+"""
+为已有的决策树 / 随机森林训练记录生成编译后的 models/{run_id}.trees.npz
+新训练的树模型在训练完成时已自动生成，只需对旧数据运行一次
+运行: python compile_tree_models.py [--force]
+"""
+import pickle
+import sys
+from pathlib import Path
+
+from config import settings
+from services import tree_compiler
+
+force = "--force" in sys.argv
+
+model_root = Path(settings.data_dir) / "models"
+pkl_files = sorted(model_root.glob("*.pkl")) if model_root.exists() else []
+
+done, skipped, failed = 0, 0, 0
+for pkl_path in pkl_files:
+    trees_path = pkl_path.with_suffix(".trees.npz")
+    if trees_path.exists() and not force:
+        skipped += 1
+        continue
+    try:
+        with open(pkl_path, "rb") as f:
+            bundle = pickle.load(f)
+        if not tree_compiler.is_compilable(bundle["model"]):
+            skipped += 1
+            continue
+        tree_compiler.save(trees_path, bundle["model"], bundle["label_encoder"], bundle["feature_count"])
+        print(f"✅ {pkl_path.stem}: {trees_path.stat().st_size / 1024:.0f} KB")
+        done += 1
+    except Exception as e:
+        print(f"❌ {pkl_path.stem}: {e}")
+        failed += 1
+
+print(f"\n完成: 编译 {done}, 跳过 {skipped}, 失败 {failed}")
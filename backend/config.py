@@ -12,9 +12,59 @@ class Settings(BaseSettings):
     # SQLite 数据库路径
     database_url: str = f"sqlite:///{Path(__file__).parent / 'storage' / 'tennis_coach.db'}"
 
+    # SQLite 连接参数（每个新连接上执行 PRAGMA，仅 sqlite:// 生效）
+    # WAL 模式下写事务不阻塞读；NORMAL 在 WAL 下仍保证崩溃一致性
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kb: int = 64 * 1024
+    sqlite_foreign_keys: bool = True
+
+    # 连接池
+    db_pool_size: int = 8
+    db_max_overflow: int = 8
+    db_pool_timeout: float = 30.0
+
+    # 列表接口分页：默认每页条数和上限
+    page_limit_default: int = 200
+    page_limit_max: int = 1000
+
     # 文件存储目录（CSV 和模型文件仍用文件系统）
     data_dir: str = str(Path(__file__).parent / "storage")
 
+    # 上传流式写盘的块大小（字节）和 raw CSV 分块解析的行数
+    upload_chunk_bytes: int = 1024 * 1024
+    raw_csv_chunk_rows: int = 100_000
+
+    # 阻塞任务执行池：同步路由 / run_in_threadpool 的线程数上限，
+    # 同时运行的训练任务数（即训练进程池大小）
+    threadpool_workers: int = 40
+    training_slots: int = 2
+
+    # 超参数搜索 / fast 评估时每个任务并行训练的进程数（-1 = 全部 CPU 核）
+    search_n_jobs: int = -1
+    train_n_jobs: int = -1
+
+    # 样本数超过该值时 svm / random_forest 自动换成 svm_approx / hist_gradient_boosting
+    large_dataset_threshold: int = 20_000
+    # svm_approx 的 Nystroem 近似维数
+    nystroem_components: int = 300
+
+    # 增量模型（incremental_sgd / incremental_nb）每批 partial_fit 的样本数
+    incremental_batch_size: int = 1000
+
+    # 推理接口在内存中缓存的模型个数（LRU）
+    inference_cache_size: int = 8
+    # 不超过这个行数的推理请求用编译后的树模型（.trees.npz），更大的 batch 用 sklearn 更快
+    compiled_tree_max_batch: int = 128
+    # 自动标注每批打分 / 写回的动作数
+    autolabel_batch_size: int = 5000
+    # 主动学习队列缓存的 (模型, session) 打分结果条数（LRU）
+    active_learning_cache_sessions: int = 256
+    # 手表精简导出：蒸馏最多用的训练样本数（超过时随机抽样，控制教师模型打分的耗时）
+    compact_distill_max_samples: int = 20_000
+
     allowed_origins: list[str] = [
         "http://localhost:8501",
         "http://localhost:3000",
@@ -1,23 +1,56 @@
 """
 数据库初始化和 session 管理
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from db.models import Base
+from db.migrations import run_migrations
 from config import settings
 
+_url = make_url(settings.database_url)
+_is_sqlite = _url.get_backend_name() == "sqlite"
+_is_sqlite_file = _is_sqlite and _url.database not in (None, "", ":memory:")
+
+# 内存库用 SingletonThreadPool，不支持设置池大小
+_engine_kwargs = {}
+if _is_sqlite_file or not _is_sqlite:
+    _engine_kwargs.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
+
 engine = create_engine(
     settings.database_url,
-    connect_args={"check_same_thread": False},  # SQLite 需要
+    connect_args={"check_same_thread": False} if _is_sqlite else {},  # SQLite 需要
     echo=False,
+    **_engine_kwargs,
 )
 
+
+if _is_sqlite:
+    @event.listens_for(engine, "connect")
+    def _apply_sqlite_pragmas(dbapi_conn, _record):
+        """每个新连接应用 SQLite 配置（journal_mode=WAL 对文件持久生效，其余为连接级）"""
+        cursor = dbapi_conn.cursor()
+        if _is_sqlite_file:
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        # 负数表示以 KiB 为单位
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kb)}")
+        cursor.execute(f"PRAGMA foreign_keys={'ON' if settings.sqlite_foreign_keys else 'OFF'}")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
 def init_db():
-    """创建所有表"""
+    """创建所有表，并执行未应用的 schema 迁移"""
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
 
 def get_db():
@@ -0,0 +1,180 @@
+"""
+轻量 schema 迁移
+
+create_all 只会建缺失的表，不会给已有表加列/索引。这里维护一个按版本号递增的
+迁移列表，启动时把 schema_migrations 里没记录的版本依次执行，每个迁移和它的
+版本记录在同一事务内提交。
+
+新增迁移：在 MIGRATIONS 末尾追加 (版本号, 名称, 函数)，函数接收 Connection。
+迁移需要兼容全新库（表已由 create_all 按最新模型建好）和旧库两种情况。
+"""
+import json
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from db.models import pack_features
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _features_to_blob(conn: Connection):
+    """actions.features (JSON) → actions.features_blob (float32 BLOB)，转换后 JSON 列置空"""
+    columns = _columns(conn, "actions")
+    if "features_blob" not in columns:
+        conn.execute(text("ALTER TABLE actions ADD COLUMN features_blob BLOB"))
+    if "features" not in columns:
+        return
+
+    while True:
+        rows = conn.execute(
+            text("SELECT id, features FROM actions WHERE features IS NOT NULL LIMIT 5000")
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            text("UPDATE actions SET features_blob = :blob, features = NULL WHERE id = :id"),
+            [
+                {"id": r.id, "blob": pack_features(json.loads(r.features)) if r.features != "null" else None}
+                for r in rows
+            ],
+        )
+
+
+def _hot_query_indexes(conn: Connection):
+    """list_actions / 训练数据 / session 计数 / agent 统计 / 聊天记录 用到的复合索引"""
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_actions_session_active "
+        "ON actions (session_id, is_deleted, action_index)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_actions_quality_active "
+        "ON actions (manual_quality, is_deleted)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_chat_messages_conversation_created "
+        "ON chat_messages (conversation_id, created_at)"
+    ))
+
+
+def _pagination_indexes(conn: Connection):
+    """列表接口 keyset 分页的排序键索引"""
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_sessions_created ON sessions (created_at, id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_sessions_project_created ON sessions (project_id, created_at, id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_training_runs_created ON training_runs (created_at, id)"
+    ))
+
+
+def _training_queue(conn: Connection):
+    """training_runs 作为持久化训练队列：错误信息、取消标记、按状态取队首的索引"""
+    columns = _columns(conn, "training_runs")
+    if "error" not in columns:
+        conn.execute(text("ALTER TABLE training_runs ADD COLUMN error TEXT"))
+    if "cancel_requested" not in columns:
+        conn.execute(text("ALTER TABLE training_runs ADD COLUMN cancel_requested BOOLEAN DEFAULT 0"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_training_runs_status_created ON training_runs (status, created_at)"
+    ))
+
+
+def _search_candidates(conn: Connection):
+    """training_runs.parent_run_id：超参数搜索的候选记录关联到搜索任务，训练历史分页只列顶层记录"""
+    if "parent_run_id" not in _columns(conn, "training_runs"):
+        conn.execute(text(
+            "ALTER TABLE training_runs ADD COLUMN parent_run_id VARCHAR "
+            "REFERENCES training_runs (id) ON DELETE CASCADE"
+        ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_training_runs_parent_created "
+        "ON training_runs (parent_run_id, created_at, id)"
+    ))
+
+
+def _dataset_snapshots(conn: Connection):
+    """sessions.label_version + training_runs.dataset_snapshot：训练数据快照"""
+    if "label_version" not in _columns(conn, "sessions"):
+        conn.execute(text("ALTER TABLE sessions ADD COLUMN label_version INTEGER DEFAULT 0"))
+    if "dataset_snapshot" not in _columns(conn, "training_runs"):
+        conn.execute(text("ALTER TABLE training_runs ADD COLUMN dataset_snapshot VARCHAR"))
+
+
+def _training_eval_mode(conn: Connection):
+    """training_runs.eval_mode / train_seconds：比较不同评估方式的耗时"""
+    columns = _columns(conn, "training_runs")
+    if "eval_mode" not in columns:
+        conn.execute(text("ALTER TABLE training_runs ADD COLUMN eval_mode VARCHAR"))
+    if "train_seconds" not in columns:
+        conn.execute(text("ALTER TABLE training_runs ADD COLUMN train_seconds FLOAT"))
+
+
+def _project_deployed_run(conn: Connection):
+    """projects.deployed_run_id：推理接口按项目使用的模型"""
+    if "deployed_run_id" not in _columns(conn, "projects"):
+        conn.execute(text("ALTER TABLE projects ADD COLUMN deployed_run_id VARCHAR"))
+
+
+def _action_ml_confidence(conn: Connection):
+    """actions.ml_confidence / ml_run_id：自动标注写入的置信度和模型（label_jobs 表由 create_all 创建）"""
+    columns = _columns(conn, "actions")
+    if "ml_confidence" not in columns:
+        conn.execute(text("ALTER TABLE actions ADD COLUMN ml_confidence FLOAT"))
+    if "ml_run_id" not in columns:
+        conn.execute(text("ALTER TABLE actions ADD COLUMN ml_run_id VARCHAR"))
+
+
+def _training_compact_export(conn: Connection):
+    """training_runs.compact_export：手表精简导出的报告"""
+    if "compact_export" not in _columns(conn, "training_runs"):
+        conn.execute(text("ALTER TABLE training_runs ADD COLUMN compact_export JSON"))
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "features_to_blob", _features_to_blob),
+    (2, "hot_query_indexes", _hot_query_indexes),
+    (3, "pagination_indexes", _pagination_indexes),
+    (4, "training_queue", _training_queue),
+    (5, "search_candidates", _search_candidates),
+    (6, "dataset_snapshots", _dataset_snapshots),
+    (7, "training_eval_mode", _training_eval_mode),
+    (8, "project_deployed_run", _project_deployed_run),
+    (9, "action_ml_confidence", _action_ml_confidence),
+    (10, "training_compact_export", _training_compact_export),
+]
+
+
+def run_migrations(engine: Engine) -> list[int]:
+    """
+    执行所有未应用的迁移
+
+    Returns:
+        本次执行的版本号列表
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at DATETIME NOT NULL)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    executed = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.utcnow()},
+            )
+        print(f"[DB] Applied migration {version}: {name}")
+        executed.append(version)
+    return executed
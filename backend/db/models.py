@@ -2,11 +2,31 @@
 SQLAlchemy ORM 模型
 """
 from datetime import datetime
+from typing import Optional
+
+import numpy as np
 from sqlalchemy import (
-    Column, String, Integer, Float, Boolean, DateTime, Text, ForeignKey, JSON
+    Column, String, Integer, Float, Boolean, DateTime, Text, ForeignKey, JSON, LargeBinary, Index
 )
 from sqlalchemy.orm import DeclarativeBase, relationship
 
+# Action 特征的二进制格式：小端 float32 连续排列（40 维 = 160 字节）
+FEATURE_DTYPE = np.dtype("<f4")
+
+
+def pack_features(features) -> Optional[bytes]:
+    """特征向量 → float32 BLOB"""
+    if features is None:
+        return None
+    return np.asarray(features, dtype=FEATURE_DTYPE).tobytes()
+
+
+def unpack_features(blob: Optional[bytes]) -> Optional[list]:
+    """float32 BLOB → 特征列表"""
+    if blob is None:
+        return None
+    return np.frombuffer(blob, dtype=FEATURE_DTYPE).tolist()
+
 
 class Base(DeclarativeBase):
     pass
@@ -19,6 +39,8 @@ class Project(Base):
     name = Column(String, nullable=False)
     description = Column(Text, default="")
     created_at = Column(DateTime, default=datetime.utcnow)
+    # 推理接口按项目默认使用的训练记录（不设外键，避免 projects / training_runs 互相引用）
+    deployed_run_id = Column(String, nullable=True)
 
     sessions = relationship("Session", back_populates="project", cascade="all, delete-orphan")
     training_runs = relationship("TrainingRun", back_populates="project", cascade="all, delete-orphan")
@@ -26,6 +48,10 @@ class Project(Base):
 
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        Index("ix_sessions_created", "created_at", "id"),
+        Index("ix_sessions_project_created", "project_id", "created_at", "id"),
+    )
 
     id = Column(String, primary_key=True)
     project_id = Column(String, ForeignKey("projects.id", ondelete="SET NULL"), nullable=True)
@@ -37,6 +63,8 @@ class Session(Base):
     good_count = Column(Integer, default=0)
     bad_count = Column(Integer, default=0)
     unlabeled_count = Column(Integer, default=0)
+    # 动作的任何修改（重新导入、标注、删除、恢复）都会 +1，训练数据快照按它定名
+    label_version = Column(Integer, default=0)
 
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -46,6 +74,10 @@ class Session(Base):
 
 class Action(Base):
     __tablename__ = "actions"
+    __table_args__ = (
+        Index("ix_actions_session_active", "session_id", "is_deleted", "action_index"),
+        Index("ix_actions_quality_active", "manual_quality", "is_deleted"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(String, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
@@ -57,10 +89,13 @@ class Action(Base):
 
     ml_classification = Column(String, default="")
     ml_quality = Column(String, default="")
+    # 自动标注写入 ml_quality 时记录模型置信度和所用训练记录；来自手机 CSV 的为空
+    ml_confidence = Column(Float, nullable=True)
+    ml_run_id = Column(String, nullable=True)
     manual_quality = Column(String, default="unlabeled")
 
-    # 40 维特征存为 JSON array
-    features = Column(JSON, nullable=True)
+    # 40 维特征存为 float32 BLOB（见 pack_features / unpack_features）
+    features_blob = Column(LargeBinary, nullable=True)
 
     is_deleted = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -70,13 +105,21 @@ class Action(Base):
 
 class TrainingRun(Base):
     __tablename__ = "training_runs"
+    __table_args__ = (
+        Index("ix_training_runs_created", "created_at", "id"),
+        Index("ix_training_runs_status_created", "status", "created_at"),
+        Index("ix_training_runs_parent_created", "parent_run_id", "created_at", "id"),
+    )
 
     id = Column(String, primary_key=True)
     project_id = Column(String, ForeignKey("projects.id", ondelete="SET NULL"), nullable=True)
+    # 超参数搜索的候选记录指向所属的搜索任务
+    parent_run_id = Column(String, ForeignKey("training_runs.id", ondelete="CASCADE"), nullable=True)
 
     model_type = Column(String, nullable=False)
     hyperparameters = Column(JSON, default=dict)
     session_ids = Column(JSON, default=list)  # list of session id strings
+    dataset_snapshot = Column(String)  # 训练所用数据快照的 id（storage/datasets/{id}.npz）
 
     sample_count = Column(Integer, default=0)
     good_count = Column(Integer, default=0)
@@ -92,8 +135,13 @@ class TrainingRun(Base):
     confusion_matrix = Column(JSON)
     labels = Column(JSON)
 
-    status = Column(String, default="pending")  # pending / training / completed / failed
+    status = Column(String, default="pending")  # pending / training / completed / failed / cancelled
+    error = Column(Text)
+    cancel_requested = Column(Boolean, default=False)
     coreml_exported = Column(Boolean, default=False)
+    eval_mode = Column(String)  # full / fast / prequential（增量模型）
+    train_seconds = Column(Float)  # 评估 + 最终训练的耗时（不含加载数据和导出）
+    compact_export = Column(JSON)  # 手表精简导出的报告（蒸馏出的学生模型、体积、保真度、单样本耗时）
 
     started_at = Column(DateTime)
     completed_at = Column(DateTime)
@@ -102,8 +150,55 @@ class TrainingRun(Base):
     project = relationship("Project", back_populates="training_runs")
 
 
+class LabelJob(Base):
+    """用训练好的模型给未标注动作批量写 ml_quality 的后台任务"""
+    __tablename__ = "label_jobs"
+    __table_args__ = (
+        Index("ix_label_jobs_status_created", "status", "created_at"),
+    )
+
+    id = Column(String, primary_key=True)
+    project_id = Column(String, ForeignKey("projects.id", ondelete="SET NULL"), nullable=True)
+    run_id = Column(String, nullable=False)  # 打分用的训练记录
+    session_ids = Column(JSON, default=list)
+
+    status = Column(String, default="pending")  # pending / running / completed / failed
+    total = Column(Integer, default=0)  # 需要打分的动作数（开始运行后写入）
+    processed = Column(Integer, default=0)
+    good_count = Column(Integer, default=0)
+    bad_count = Column(Integer, default=0)
+    error = Column(Text)
+
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ExportJob(Base):
+    """把训练记录的模型蒸馏成手表精简模型的后台任务"""
+    __tablename__ = "export_jobs"
+    __table_args__ = (
+        Index("ix_export_jobs_status_created", "status", "created_at"),
+    )
+
+    id = Column(String, primary_key=True)
+    run_id = Column(String, nullable=False)  # 作为教师的训练记录
+    budget = Column(JSON, default=dict)  # {"max_bytes", "max_nodes", "student"}
+
+    status = Column(String, default="pending")  # pending / running / completed / failed
+    report = Column(JSON)  # 完成后的导出报告（同时写入训练记录的 compact_export）
+    error = Column(Text)
+
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_conversation_created", "conversation_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     conversation_id = Column(String, nullable=False, index=True)
@@ -6,7 +6,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
 from db.database import init_db
-from routers import sessions, projects, training, visualization, agent
+from routers import sessions, projects, training, visualization, agent, inference, active_learning
+from services import training_queue, workers
 
 app = FastAPI(
     title="Tennis Coach API",
@@ -26,12 +27,21 @@ app.add_middleware(
 @app.on_event("startup")
 def on_startup():
     init_db()
+    workers.configure_threadpool()
+    training_queue.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    training_queue.stop()
 
 app.include_router(sessions.router, prefix="/api/sessions", tags=["Sessions"])
 app.include_router(projects.router, prefix="/api/projects", tags=["Projects"])
 app.include_router(training.router, prefix="/api/training", tags=["Training"])
 app.include_router(visualization.router, prefix="/api/viz", tags=["Visualization"])
 app.include_router(agent.router, prefix="/api/agent", tags=["Agent"])
+app.include_router(inference.router, prefix="/api/inference", tags=["Inference"])
+app.include_router(active_learning.router, prefix="/api/active-learning", tags=["Active Learning"])
 
 
 @app.get("/")
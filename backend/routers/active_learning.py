@@ -0,0 +1,66 @@
+"""
+主动学习标注队列路由
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query
+from pydantic import BaseModel
+from typing import Optional
+
+from sqlalchemy.orm import Session as DBSession
+from config import settings
+from db.database import get_db
+from services import active_learning, storage
+
+router = APIRouter()
+
+
+@router.get("/queue")
+def get_queue(
+    run_id: Optional[str] = None,
+    project_id: Optional[str] = None,
+    session_ids: list[str] = Query([]),
+    strategy: str = "margin",
+    limit: int = Query(50, ge=1, le=settings.page_limit_max),
+    after: Optional[str] = None,
+    db: DBSession = Depends(get_db),
+):
+    """
+    按模型不确定度排序的未标注动作，用 next_cursor 作为下一页的 after
+
+    模型默认用项目的部署模型，没有时用最近完成的训练记录；
+    session_ids 为空时取项目下全部 session。
+    """
+    if not run_id and project_id:
+        run_id = storage.get_deployed_run_id(db, project_id)
+    run_id = run_id or storage.latest_completed_run_id(db)
+    if not run_id:
+        raise HTTPException(status_code=404, detail="还没有训练完成的模型")
+
+    if not session_ids and project_id:
+        session_ids = [s["id"] for s in storage.list_sessions(db, project_id)]
+    if not session_ids:
+        raise HTTPException(status_code=400, detail="至少选择一个 session")
+
+    try:
+        queue = active_learning.get_queue(db, run_id, session_ids, strategy, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 附上动作本身（序号、峰值时间、特征等），供前端展示
+    actions = {a["id"]: a for a in storage.get_actions_by_ids(db, [item["action_id"] for item in queue["items"]])}
+    queue["items"] = [{**actions[item["action_id"]], **item} for item in queue["items"]]
+    return queue
+
+
+class QueueLabel(BaseModel):
+    action_id: int
+    manual_quality: str  # good / bad
+
+
+@router.post("/label")
+def submit_labels(labels: list[QueueLabel], db: DBSession = Depends(get_db)):
+    """提交队列中的标注：写入 manual_quality，并就地更新队列的打分缓存（不重新打分）"""
+    try:
+        updated = active_learning.submit_labels(db, [label.model_dump() for label in labels])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "updated", "updated": updated}
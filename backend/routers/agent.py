@@ -1,11 +1,12 @@
 """
 Agent 聊天路由
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
 
 from sqlalchemy.orm import Session as DBSession
+from config import settings
 from db.database import get_db
 from services import storage
 from services.agent_service import process_message
@@ -20,7 +21,7 @@ class ChatRequest(BaseModel):
 
 
 @router.post("/chat")
-async def chat(body: ChatRequest, db: DBSession = Depends(get_db)):
+def chat(body: ChatRequest, db: DBSession = Depends(get_db)):
     """同步聊天端点"""
     # 保存用户消息
     storage.save_chat_message(db, body.conversation_id, "user", body.message)
@@ -43,14 +44,27 @@ async def chat(body: ChatRequest, db: DBSession = Depends(get_db)):
 
 
 @router.get("/history/{conversation_id}")
-async def get_history(conversation_id: str, db: DBSession = Depends(get_db)):
-    """获取对话历史"""
-    messages = storage.list_chat_messages(db, conversation_id)
-    return {"conversation_id": conversation_id, "messages": messages}
+def get_history(
+    conversation_id: str,
+    limit: int = Query(settings.page_limit_default, ge=1, le=settings.page_limit_max),
+    after: Optional[str] = None,
+    db: DBSession = Depends(get_db),
+):
+    """分页获取对话历史（按时间），用 next_cursor 作为下一页的 after"""
+    try:
+        messages, next_cursor = storage.page_chat_messages(db, conversation_id, limit=limit, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "conversation_id": conversation_id,
+        "messages": messages,
+        "total": storage.count_chat_messages(db, conversation_id),
+        "next_cursor": next_cursor,
+    }
 
 
 @router.get("/conversations")
-async def get_conversations(db: DBSession = Depends(get_db)):
+def get_conversations(db: DBSession = Depends(get_db)):
     """列出最近对话"""
     conversations = storage.list_conversations(db)
     return {"conversations": conversations}
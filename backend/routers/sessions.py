@@ -1,15 +1,20 @@
 """
 Session 管理路由
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends, Query
 from typing import Optional
+import time
 import uuid
+from pathlib import Path
+import numpy as np
 import pandas as pd
-from io import StringIO
 
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
 from sqlalchemy.orm import Session as DBSession
+from config import settings
 from db.database import get_db
-from services.csv_parser import parse_raw_csv, parse_feedback_csv, validate_csv_format
+from services.csv_parser import iter_raw_csv_chunks, load_feedback_csv, validate_csv_header
 from services import storage
 
 router = APIRouter()
@@ -27,12 +32,152 @@ FEATURE_COLS = [
 ]
 
 
-def _extract_features_from_row(row: pd.Series) -> Optional[list]:
-    """从 feedback CSV 的一行提取 40 维特征"""
-    available = [c for c in FEATURE_COLS if c in row.index]
-    if len(available) < 5:
-        return None
-    return [float(row[c]) if pd.notna(row[c]) else 0.0 for c in available]
+def _actions_from_feedback(feedback_df: pd.DataFrame) -> list[dict]:
+    """按列把 feedback DataFrame 转成 actions 行（不逐行 iterrows）"""
+    n = len(feedback_df)
+
+    def text_col(name: str, default: str) -> list:
+        if name not in feedback_df.columns:
+            return [default] * n
+        return feedback_df[name].astype(str).tolist()
+
+    # 40 维特征；可用列少于 5 个时不存特征
+    available = [c for c in FEATURE_COLS if c in feedback_df.columns]
+    if len(available) >= 5:
+        features = feedback_df[available].apply(pd.to_numeric, errors='coerce').fillna(0.0).to_numpy(dtype=np.float32)
+    else:
+        features = [None] * n
+
+    columns = zip(
+        feedback_df["action_index"].astype(int).tolist(),
+        feedback_df["t_peak"].astype(float).tolist(),
+        feedback_df["t_start"].astype(float).tolist(),
+        feedback_df["t_end"].astype(float).tolist(),
+        text_col("ml_classification", ""),
+        text_col("ml_quality", ""),
+        text_col("manual_quality", "unlabeled"),
+        features,
+    )
+    return [
+        {
+            "action_index": action_index,
+            "t_peak": t_peak,
+            "t_start": t_start,
+            "t_end": t_end,
+            "ml_classification": ml_classification,
+            "ml_quality": ml_quality,
+            "manual_quality": manual_quality,
+            "features": feats,
+        }
+        for action_index, t_peak, t_start, t_end, ml_classification, ml_quality, manual_quality, feats in columns
+    ]
+
+
+async def _stream_upload(upload: UploadFile, dest: Path, csv_type: str):
+    """
+    把上传文件分块写到磁盘。
+
+    收到完整表头行后先校验列名，不合格立即 400，不再读取后续数据。
+    """
+    header_checked = False
+    head = b""
+    with open(dest, "wb") as f:
+        while True:
+            chunk = await upload.read(settings.upload_chunk_bytes)
+            if not chunk:
+                break
+            if header_checked:
+                await run_in_threadpool(f.write, chunk)
+                continue
+            head += chunk
+            if b"\n" not in head and len(head) < settings.upload_chunk_bytes:
+                continue
+            _check_header(head, csv_type)
+            header_checked = True
+            await run_in_threadpool(f.write, head)
+            head = b""
+        if not header_checked:
+            # 文件比一个块还小且没有换行
+            _check_header(head, csv_type)
+            await run_in_threadpool(f.write, head)
+
+
+def _check_header(head: bytes, csv_type: str):
+    label = "Raw" if csv_type == "raw" else "Feedback"
+    try:
+        header_line = head.split(b"\n", 1)[0].decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail=f"{label} CSV 格式错误: 不是 UTF-8 编码")
+    is_valid, error_msg = validate_csv_header(header_line, csv_type)
+    if not is_valid:
+        raise HTTPException(status_code=400, detail=f"{label} CSV 格式错误: {error_msg}")
+
+
+def _ingest_upload(
+    db: DBSession,
+    raw_tmp: Path,
+    feedback_tmp: Path,
+    column_writer: storage.RawColumnWriter,
+    project_id: Optional[str],
+    session_name: Optional[str],
+) -> dict:
+    """解析已落盘的两个 CSV 并写入存储（同步，在线程池中执行）"""
+    feedback_df = load_feedback_csv(feedback_tmp)
+
+    # 分块扫描 raw CSV：只保留行数和 session 信息，同时写列式副本
+    raw_rows = 0
+    session_id = None
+    session_type = ""
+    for chunk in iter_raw_csv_chunks(raw_tmp, settings.raw_csv_chunk_rows):
+        if session_id is None and len(chunk) > 0:
+            session_id = str(chunk['session_id'].iloc[0])
+            session_type = str(chunk['session_type'].iloc[0])
+        raw_rows += len(chunk)
+        column_writer.append(chunk)
+    if session_id is None:
+        session_id = str(uuid.uuid4())
+
+    good_count = len(feedback_df[feedback_df['manual_quality'] == 'good'])
+    bad_count = len(feedback_df[feedback_df['manual_quality'] == 'bad'])
+    unlabeled_count = len(feedback_df) - good_count - bad_count
+
+    # 移动文件前再确认一次项目存在（上传期间可能被删除），否则文件会留在 session 目录里却没有对应的记录
+    if project_id and not storage.get_project(db, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    # 保存 CSV 文件到文件系统
+    storage.store_csv_file(session_id, "raw.csv", raw_tmp)
+    storage.store_csv_file(session_id, "feedback.csv", feedback_tmp)
+    column_writer.finalize(session_id)
+
+    # 保存 session 元数据到 SQLite
+    session_data = {
+        "name": session_name or f"Session {session_id[:8]}",
+        "project_id": project_id if project_id else None,
+        "action_count": len(feedback_df),
+        "raw_rows": raw_rows,
+        "good_count": good_count,
+        "bad_count": bad_count,
+        "unlabeled_count": unlabeled_count,
+        "session_type": session_type,
+    }
+    storage.save_session(db, session_id, session_data)
+
+    # 解析 feedback 行 → actions 表
+    insert_start = time.perf_counter()
+    storage.save_actions(db, session_id, _actions_from_feedback(feedback_df))
+    insert_ms = (time.perf_counter() - insert_start) * 1000
+
+    return {
+        "status": "success",
+        "id": session_id,
+        "name": session_data["name"],
+        "action_count": len(feedback_df),
+        "good_count": good_count,
+        "bad_count": bad_count,
+        "unlabeled_count": unlabeled_count,
+        "insert_ms": round(insert_ms, 1),
+    }
 
 
 @router.post("/upload")
@@ -43,84 +188,51 @@ async def upload_session(
     session_name: Optional[str] = Form(None),
     db: DBSession = Depends(get_db),
 ):
-    """上传 session 的两个 CSV 文件"""
+    """上传 session 的两个 CSV 文件（流式写盘 + 分块解析，内存占用与文件大小无关）"""
+    # sessions.project_id 有外键约束，未知项目在接收文件之前就拒绝
+    if project_id and not storage.get_project(db, project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    raw_tmp = storage.new_upload_path()
+    feedback_tmp = storage.new_upload_path()
+    column_writer = storage.RawColumnWriter()
     try:
-        raw_content = (await raw_csv.read()).decode('utf-8')
-        feedback_content = (await feedback_csv.read()).decode('utf-8')
-
-        raw_df = parse_raw_csv(raw_content)
-        feedback_df = parse_feedback_csv(feedback_content)
-
-        is_valid, error_msg = validate_csv_format(raw_df, 'raw')
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=f"Raw CSV 格式错误: {error_msg}")
-
-        is_valid, error_msg = validate_csv_format(feedback_df, 'feedback')
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=f"Feedback CSV 格式错误: {error_msg}")
-
-        session_id = str(raw_df['session_id'].iloc[0]) if len(raw_df) > 0 else str(uuid.uuid4())
-
-        good_count = len(feedback_df[feedback_df['manual_quality'] == 'good'])
-        bad_count = len(feedback_df[feedback_df['manual_quality'] == 'bad'])
-        unlabeled_count = len(feedback_df) - good_count - bad_count
-
-        # 保存 CSV 文件到文件系统
-        storage.save_csv(session_id, "raw.csv", raw_content)
-        storage.save_csv(session_id, "feedback.csv", feedback_content)
-
-        # 保存 session 元数据到 SQLite
-        session_data = {
-            "name": session_name or f"Session {session_id[:8]}",
-            "project_id": project_id if project_id else None,
-            "action_count": len(feedback_df),
-            "raw_rows": len(raw_df),
-            "good_count": good_count,
-            "bad_count": bad_count,
-            "unlabeled_count": unlabeled_count,
-            "session_type": str(raw_df['session_type'].iloc[0]) if 'session_type' in raw_df.columns else "",
-        }
-        storage.save_session(db, session_id, session_data)
-
-        # 解析 feedback 行 → actions 表
-        actions_data = []
-        for _, row in feedback_df.iterrows():
-            actions_data.append({
-                "action_index": int(row["action_index"]),
-                "t_peak": float(row["t_peak"]),
-                "t_start": float(row["t_start"]),
-                "t_end": float(row["t_end"]),
-                "ml_classification": str(row.get("ml_classification", "")),
-                "ml_quality": str(row.get("ml_quality", "")),
-                "manual_quality": str(row.get("manual_quality", "unlabeled")),
-                "features": _extract_features_from_row(row),
-            })
-        storage.save_actions(db, session_id, actions_data)
-
-        return {
-            "status": "success",
-            "id": session_id,
-            "name": session_data["name"],
-            "action_count": len(feedback_df),
-            "good_count": good_count,
-            "bad_count": bad_count,
-            "unlabeled_count": unlabeled_count,
-        }
+        await _stream_upload(raw_csv, raw_tmp, 'raw')
+        await _stream_upload(feedback_csv, feedback_tmp, 'feedback')
+
+        return await run_in_threadpool(
+            _ingest_upload, db, raw_tmp, feedback_tmp, column_writer, project_id, session_name
+        )
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # 成功时临时文件已被移走，这里只清理失败残留
+        raw_tmp.unlink(missing_ok=True)
+        feedback_tmp.unlink(missing_ok=True)
+        column_writer.discard()
 
 
 @router.get("/list")
-async def list_sessions(project_id: Optional[str] = None, db: DBSession = Depends(get_db)):
-    sessions = storage.list_sessions(db, project_id)
-    return {"sessions": sessions, "total": len(sessions)}
+def list_sessions(
+    project_id: Optional[str] = None,
+    limit: int = Query(settings.page_limit_default, ge=1, le=settings.page_limit_max),
+    after: Optional[str] = None,
+    db: DBSession = Depends(get_db),
+):
+    """分页列出 session（按创建时间），用 next_cursor 作为下一页的 after"""
+    try:
+        sessions, next_cursor = storage.page_sessions(db, project_id, limit=limit, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total = storage.count_sessions(db, project_id)
+    return {"sessions": sessions, "total": total, "next_cursor": next_cursor}
 
 
 @router.get("/{session_id}")
-async def get_session(session_id: str, db: DBSession = Depends(get_db)):
+def get_session(session_id: str, db: DBSession = Depends(get_db)):
     session = storage.get_session(db, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -128,41 +240,66 @@ async def get_session(session_id: str, db: DBSession = Depends(get_db)):
 
 
 @router.delete("/{session_id}")
-async def delete_session(session_id: str, db: DBSession = Depends(get_db)):
+def delete_session(session_id: str, db: DBSession = Depends(get_db)):
     storage.delete_session(db, session_id)
     return {"status": "deleted", "session_id": session_id}
 
 
 @router.get("/{session_id}/actions")
-async def get_session_actions(session_id: str, include_deleted: bool = False, db: DBSession = Depends(get_db)):
-    """获取 session 的所有动作"""
-    actions = storage.list_actions(db, session_id, include_deleted=include_deleted)
-    return {"session_id": session_id, "total": len(actions), "actions": actions}
+def get_session_actions(
+    session_id: str,
+    include_deleted: bool = False,
+    limit: int = Query(settings.page_limit_default, ge=1, le=settings.page_limit_max),
+    after: Optional[str] = None,
+    db: DBSession = Depends(get_db),
+):
+    """分页获取 session 的动作（按 action_index），用 next_cursor 作为下一页的 after"""
+    try:
+        actions, next_cursor = storage.page_actions(
+            db, session_id, include_deleted=include_deleted, limit=limit, after=after
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    total = storage.count_actions(db, session_id, include_deleted=include_deleted)
+    return {"session_id": session_id, "total": total, "actions": actions, "next_cursor": next_cursor}
 
 
 @router.post("/{session_id}/actions/delete")
-async def soft_delete_actions(session_id: str, action_ids: list[int], db: DBSession = Depends(get_db)):
+def soft_delete_actions(session_id: str, action_ids: list[int], db: DBSession = Depends(get_db)):
     """软删除动作"""
     storage.soft_delete_actions(db, action_ids)
-    storage.update_session_counts(db, session_id)
     session = storage.get_session(db, session_id)
     return {"status": "deleted", "remaining": session}
 
 
 @router.post("/{session_id}/actions/restore")
-async def restore_actions(session_id: str, action_ids: list[int], db: DBSession = Depends(get_db)):
+def restore_actions(session_id: str, action_ids: list[int], db: DBSession = Depends(get_db)):
     """恢复已删除的动作"""
     storage.restore_actions(db, action_ids)
-    storage.update_session_counts(db, session_id)
     session = storage.get_session(db, session_id)
     return {"status": "restored", "remaining": session}
 
 
+class ActionChange(BaseModel):
+    action_id: int
+    manual_quality: Optional[str] = None
+    is_deleted: Optional[bool] = None
+
+
+@router.post("/{session_id}/actions/bulk-update")
+def bulk_update_actions(session_id: str, changes: list[ActionChange], db: DBSession = Depends(get_db)):
+    """批量修改标注/删除状态（一个事务），返回更新后的 session 统计"""
+    if not storage.get_session(db, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    updated = storage.bulk_update_actions(db, session_id, [c.model_dump() for c in changes])
+    session = storage.get_session(db, session_id)
+    return {"status": "updated", "updated": updated, "session": session}
+
+
 @router.put("/{session_id}/actions/{action_id}")
-async def update_action(session_id: str, action_id: int, updates: dict, db: DBSession = Depends(get_db)):
+def update_action(session_id: str, action_id: int, updates: dict, db: DBSession = Depends(get_db)):
     """更新单个动作（比如修改 manual_quality）"""
     allowed_fields = {"manual_quality", "is_deleted"}
     safe_updates = {k: v for k, v in updates.items() if k in allowed_fields}
     storage.update_action(db, action_id, safe_updates)
-    storage.update_session_counts(db, session_id)
     return {"status": "updated"}
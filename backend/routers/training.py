@@ -1,16 +1,19 @@
 """
 模型训练路由
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import Optional
 import uuid
 
 from sqlalchemy.orm import Session as DBSession
+from config import settings
 from db.database import get_db
-from services import storage
-from services.model_trainer import run_training
+from services import compact_exporter, storage, training_queue
+from services.hyperparam_search import SEARCH_PARAMS, SEARCH_STRATEGIES
+from services.incremental_trainer import INCREMENTAL_MODEL_TYPES, load_lineage
+from services.model_trainer import EVAL_MODES, MODEL_TYPES
 
 router = APIRouter()
 
@@ -25,53 +28,207 @@ class TrainingRequest(BaseModel):
     svm_kernel: str = "rbf"
     max_depth: Optional[int] = None
     n_estimators: int = 100
+    eval_mode: str = "full"  # full / fast
+    scalable: Optional[bool] = None  # None = 按样本数自动选择可扩展模型
 
 
 @router.post("/start")
-async def start_training(body: TrainingRequest, db: DBSession = Depends(get_db)):
+def start_training(body: TrainingRequest):
+    """训练任务入队，立即返回 run_id；进度通过 /status/{run_id} 查询"""
     if not body.session_ids:
         raise HTTPException(status_code=400, detail="至少选择一个 session")
+    if body.model_type not in MODEL_TYPES + INCREMENTAL_MODEL_TYPES:
+        raise HTTPException(status_code=400, detail=f"不支持的模型类型: {body.model_type}")
+    if body.eval_mode not in EVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的评估方式: {body.eval_mode}")
 
     run_id = str(uuid.uuid4())[:8]
+    training_queue.submit(run_id, {
+        "project_id": body.project_id,
+        "model_type": body.model_type,
+        "session_ids": body.session_ids,
+        "hyperparams": {
+            "model_type": body.model_type,
+            "svm_c": body.svm_c,
+            "svm_kernel": body.svm_kernel,
+            "max_depth": body.max_depth,
+            "n_estimators": body.n_estimators,
+            "eval_mode": body.eval_mode,
+            "scalable": body.scalable,
+        },
+    })
+    return {"run_id": run_id, "status": "pending"}
+
+
+class SearchRequest(BaseModel):
+    model_config = {"protected_namespaces": ()}
+
+    project_id: str = ""
+    session_ids: list[str]
+    model_type: str = "svm"
+    strategy: str = "grid"  # grid / random / halving
+    n_iter: int = 10
+    svm_c: list[float] = [0.1, 1.0, 10.0]
+    svm_kernel: list[str] = ["rbf", "linear"]
+    max_depth: list[Optional[int]] = [None, 5, 10]
+    n_estimators: list[int] = [50, 100, 200]
+    eval_mode: str = "full"  # 最优参数最终训练的评估方式
+
+
+@router.post("/search")
+def start_search(body: SearchRequest):
+    """超参数搜索任务入队，立即返回 run_id；候选结果通过 /search/{run_id} 查询"""
+    if not body.session_ids:
+        raise HTTPException(status_code=400, detail="至少选择一个 session")
+    if body.model_type not in SEARCH_PARAMS:
+        raise HTTPException(status_code=400, detail=f"不支持的模型类型: {body.model_type}")
+    if body.strategy not in SEARCH_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"不支持的搜索策略: {body.strategy}")
+    if body.eval_mode not in EVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的评估方式: {body.eval_mode}")
+
+    run_id = str(uuid.uuid4())[:8]
+    space = {name: getattr(body, name) for name in SEARCH_PARAMS[body.model_type]}
+    training_queue.submit(run_id, {
+        "project_id": body.project_id,
+        "model_type": body.model_type,
+        "session_ids": body.session_ids,
+        "hyperparams": {
+            "model_type": body.model_type,
+            "search": {
+                "strategy": body.strategy, "space": space, "n_iter": body.n_iter, "eval_mode": body.eval_mode,
+            },
+        },
+    })
+    return {"run_id": run_id, "status": "pending"}
+
+
+@router.get("/search/{run_id}")
+def get_search(run_id: str, db: DBSession = Depends(get_db)):
+    """搜索任务状态 + 全部候选（按交叉验证得分从高到低）"""
+    run = storage.get_training_run(db, run_id)
+    if not run or "search" not in run["hyperparams"]:
+        raise HTTPException(status_code=404, detail="Search not found")
+    return {"search": run, "candidates": storage.list_search_candidates(db, run_id)}
+
+
+class IncrementalUpdateRequest(BaseModel):
+    session_ids: list[str] = []  # 追加的 session；为空且任务属于项目时追加项目下全部 session
+
+
+@router.post("/incremental/{run_id}/update")
+def update_incremental(run_id: str, body: IncrementalUpdateRequest, db: DBSession = Depends(get_db)):
+    """增量模型重新入队：只训练上次更新以来新增 / 改了标注的动作"""
+    run = storage.get_training_run(db, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Training run not found")
+    if run["model_type"] not in INCREMENTAL_MODEL_TYPES:
+        raise HTTPException(status_code=400, detail=f"不是增量模型: {run['model_type']}")
+
+    session_ids = body.session_ids
+    if not session_ids and run["project_id"]:
+        session_ids = [s["id"] for s in storage.list_sessions(db, run["project_id"])]
+    missing = [sid for sid in session_ids if not storage.get_session(db, sid)]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Session 不存在: {', '.join(missing)}")
 
+    if not training_queue.resubmit(run_id, session_ids):
+        raise HTTPException(status_code=409, detail="任务正在排队或训练中")
+    return {"run_id": run_id, "status": "pending"}
+
+
+@router.get("/incremental/{run_id}/lineage")
+def get_incremental_lineage(run_id: str, db: DBSession = Depends(get_db)):
+    """增量模型的 lineage：已见动作数、各 session 的 label_version 和每次更新的摘要"""
+    run = storage.get_training_run(db, run_id)
+    if not run or run["model_type"] not in INCREMENTAL_MODEL_TYPES:
+        raise HTTPException(status_code=404, detail="Incremental model not found")
+    lineage = load_lineage(run_id)
+    return {
+        "run_id": run_id,
+        "seen_actions": int(len(lineage["action_ids"])),
+        "session_versions": lineage["session_versions"],
+        "history": lineage["history"],
+    }
+
+
+class CompactExportRequest(BaseModel):
+    max_bytes: Optional[int] = None  # 导出文件（.compact.npz）的字节数上限
+    max_nodes: Optional[int] = None  # 决策树学生的节点数上限
+    student: str = "auto"  # auto / tree / linear
+
+
+@router.post("/compact-export/{run_id}")
+def compact_export(run_id: str, body: CompactExportRequest, db: DBSession = Depends(get_db)):
+    """精简导出任务入队（与训练任务共用进程池槽位），进度和结果通过 /compact-export/jobs/{job_id} 查询"""
+    if not storage.get_training_run(db, run_id):
+        raise HTTPException(status_code=404, detail="Training run not found")
+    if (body.max_bytes is not None and body.max_bytes <= 0) or (body.max_nodes is not None and body.max_nodes <= 0):
+        raise HTTPException(status_code=400, detail="预算必须是正数")
     try:
-        result = run_training(
-            db=db,
-            run_id=run_id,
-            session_ids=body.session_ids,
-            model_type=body.model_type,
-            svm_c=body.svm_c,
-            svm_kernel=body.svm_kernel,
-            max_depth=body.max_depth,
-            n_estimators=body.n_estimators,
-        )
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        compact_exporter.check_request(db, run_id, body.max_bytes, body.max_nodes, body.student)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return training_queue.submit_export_job(str(uuid.uuid4())[:8], run_id, {
+        "max_bytes": body.max_bytes, "max_nodes": body.max_nodes, "student": body.student,
+    })
+
+
+@router.get("/compact-export/jobs/{job_id}")
+def get_compact_export_job(job_id: str, db: DBSession = Depends(get_db)):
+    """精简导出任务状态：pending / running / completed（附 report：保真度 - 体积报告和单样本推理耗时）/ failed"""
+    job = storage.get_export_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
 
 
 @router.get("/runs")
-async def list_training_runs(db: DBSession = Depends(get_db)):
-    runs = storage.list_training_runs(db)
-    return {"runs": runs}
+def list_training_runs(
+    limit: int = Query(settings.page_limit_default, ge=1, le=settings.page_limit_max),
+    after: Optional[str] = None,
+    db: DBSession = Depends(get_db),
+):
+    """分页列出训练记录（按创建时间），用 next_cursor 作为下一页的 after"""
+    try:
+        runs, next_cursor = storage.page_training_runs(db, limit=limit, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"runs": runs, "total": storage.count_training_runs(db), "next_cursor": next_cursor}
 
 
 @router.get("/status/{run_id}")
-async def get_training_status(run_id: str, db: DBSession = Depends(get_db)):
+def get_training_status(run_id: str, db: DBSession = Depends(get_db)):
+    """训练任务状态：pending（附队列位置）/ training / completed / failed / cancelled"""
     run = storage.get_training_run(db, run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Training run not found")
+    if run["status"] == "pending":
+        run["queue_position"] = storage.training_queue_position(db, run_id)
     return run
 
 
+@router.post("/cancel/{run_id}")
+def cancel_training(run_id: str):
+    """取消训练任务：排队中的立即取消，训练中的在下一个阶段检查点退出"""
+    status = training_queue.cancel(run_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Training run not found")
+    return {"run_id": run_id, "status": status}
+
+
 @router.get("/download/{run_id}")
-async def download_model(run_id: str, fmt: str = "auto"):
-    """下载模型文件。fmt: auto/mlmodel/pkl"""
+def download_model(run_id: str, fmt: str = "auto"):
+    """下载模型文件。fmt: auto/mlmodel/pkl/trees/compact（手表精简导出，优先 CoreML）"""
     # 优先 mlmodel，其次 pkl
     if fmt == "mlmodel":
         exts = [".mlmodel"]
     elif fmt == "pkl":
         exts = [".pkl"]
+    elif fmt == "trees":
+        exts = [".trees.npz"]
+    elif fmt == "compact":
+        exts = [".compact.mlmodel", ".compact.npz"]
     else:
         exts = [".mlmodel", ".pkl"]
 
@@ -1,22 +1,44 @@
 """
 数据可视化路由
-Raw CSV 数据仍从文件系统读取，feedback 数据从 SQLite 读取
+Raw 数据优先从列式 .npy 存储 mmap 读取（旧 session 回退到 CSV），feedback 数据从 SQLite 读取
 """
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Optional
+import numpy as np
 import pandas as pd
 from io import StringIO
 
 from sqlalchemy.orm import Session as DBSession
 from db.database import get_db
 from services import storage
+from services.csv_parser import TimeIndex
 
 router = APIRouter()
 
+RAW_DATA_COLS = ['time', 'userAccelX', 'userAccelY', 'userAccelZ',
+                 'rotationRateX', 'rotationRateY', 'rotationRateZ', 'accMag', 'seconds_elapsed']
+
+WINDOW_COLS = ['userAccelX', 'userAccelY', 'userAccelZ',
+               'rotationRateX', 'rotationRateY', 'rotationRateZ', 'accMag']
+
+
+def _columns_to_records(columns: dict, index) -> list[dict]:
+    """按行号（slice 或数组）从列式数据取行，转成 records"""
+    return pd.DataFrame({col: np.asarray(arr[index]) for col, arr in columns.items()}).to_dict(orient='records')
+
 
 @router.get("/raw-data/{session_id}")
-async def get_raw_data(session_id: str, sample_rate: Optional[int] = None):
+def get_raw_data(session_id: str, sample_rate: Optional[int] = None):
     """获取 raw IMU 数据用于时序图"""
+    columns = storage.load_raw_columns(session_id, RAW_DATA_COLS)
+    if columns is not None:
+        n = len(columns['time'])
+        step = 1
+        if sample_rate and sample_rate > 0 and n > sample_rate:
+            step = max(1, n // sample_rate)
+        data = _columns_to_records(columns, slice(None, None, step))
+        return {"session_id": session_id, "total_rows": len(data), "data": data}
+
     csv_content = storage.load_csv(session_id, "raw.csv")
     if not csv_content:
         raise HTTPException(status_code=404, detail="Raw CSV not found")
@@ -43,20 +65,35 @@ async def get_raw_data(session_id: str, sample_rate: Optional[int] = None):
 
 
 @router.get("/feedback-data/{session_id}")
-async def get_feedback_data(session_id: str, db: DBSession = Depends(get_db)):
+def get_feedback_data(session_id: str, db: DBSession = Depends(get_db)):
     """获取 feedback 数据（从 SQLite）"""
     actions = storage.list_actions(db, session_id, include_deleted=False)
     return {"session_id": session_id, "total_actions": len(actions), "actions": actions}
 
 
 @router.get("/action-window/{session_id}/{action_index}")
-async def get_action_window(session_id: str, action_index: int, db: DBSession = Depends(get_db)):
+def get_action_window(session_id: str, action_index: int, db: DBSession = Depends(get_db)):
     """获取单个动作的 IMU 窗口数据（用于样本级可视化）"""
     actions = storage.list_actions(db, session_id)
     action = next((a for a in actions if a["action_index"] == action_index), None)
     if not action:
         raise HTTPException(status_code=404, detail="Action not found")
 
+    t_start = action["t_start"]
+    t_end = action["t_end"]
+
+    index = storage.load_time_index(session_id)
+    if index is not None:
+        columns = {'time': index.times, **storage.load_raw_columns(session_id, WINDOW_COLS)}
+        data = _columns_to_records(columns, index.window(t_start, t_end))
+        return {
+            "session_id": session_id,
+            "action_index": action_index,
+            "action": action,
+            "total_rows": len(data),
+            "data": data,
+        }
+
     csv_content = storage.load_csv(session_id, "raw.csv")
     if not csv_content:
         raise HTTPException(status_code=404, detail="Raw CSV not found")
@@ -65,9 +102,7 @@ async def get_action_window(session_id: str, action_index: int, db: DBSession =
 
     # 用 time 列截取窗口
     time_col = "time" if "time" in df.columns else "seconds_elapsed"
-    t_start = action["t_start"]
-    t_end = action["t_end"]
-    window = df[(df[time_col] >= t_start) & (df[time_col] <= t_end)]
+    window = df.iloc[TimeIndex.from_frame(df, time_col).window(t_start, t_end)]
 
     cols = ['userAccelX', 'userAccelY', 'userAccelZ',
             'rotationRateX', 'rotationRateY', 'rotationRateZ']
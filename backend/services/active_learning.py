@@ -0,0 +1,199 @@
+"""
+主动学习标注队列
+用模型给未标注动作打分，按不确定度（margin / entropy）从高到低分页返回，
+优先标注模型最拿不准的样本。
+
+打分结果按 (run_id, 模型版本, session_id) 缓存，每条记录带打分时 session 的
+label_version：
+- 取队列时只对 label_version 变了（或没缓存）的 session 重新打分
+- 经由队列提交的标注直接从缓存里删掉这些动作并把 label_version 前移一格，
+  不触发重新打分；其他途径的修改会让版本对不上，下次取队列时只重打该 session
+"""
+import base64
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.orm import Session as DBSession
+
+from config import settings
+from services import model_registry, storage
+
+UNCERTAINTY_STRATEGIES = ("margin", "entropy")
+
+_lock = threading.Lock()
+# (run_id, 模型版本, session_id) → {"label_version", "action_ids", "proba", "classes"}
+_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+
+
+def _uncertainty(proba: np.ndarray, strategy: str) -> np.ndarray:
+    """不确定度，越大越拿不准：margin = 1 - (最大概率 - 第二大概率)，entropy = 预测分布的熵"""
+    if strategy == "margin":
+        top2 = np.sort(proba, axis=1)[:, -2:]
+        return 1.0 - (top2[:, 1] - top2[:, 0])
+    if strategy == "entropy":
+        p = np.clip(proba, 1e-12, 1.0)
+        return -np.sum(p * np.log(p), axis=1)
+    raise ValueError(f"不支持的不确定度指标: {strategy}")
+
+
+def _encode_cursor(uncertainty: float, action_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([uncertainty, action_id]).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        uncertainty, action_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(uncertainty), int(action_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _session_scores(
+    db: DBSession, run_id: str, model_version: int, bundle: dict, session_id: str, label_version: int
+) -> dict:
+    """取一个 session 的打分缓存，label_version 对不上时重新打分"""
+    key = (run_id, model_version, session_id)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry["label_version"] == label_version:
+            _cache.move_to_end(key)
+            return entry
+
+    X, action_ids = storage.load_unlabeled_matrix(db, [session_id])
+    if len(action_ids):
+        classes, proba = model_registry.score(bundle, X)
+    else:
+        classes, proba = np.array([]), np.empty((0, 0))
+    entry = {"label_version": label_version, "action_ids": action_ids, "proba": proba, "classes": classes}
+
+    with _lock:
+        _cache[key] = entry
+        _cache.move_to_end(key)
+        while len(_cache) > settings.active_learning_cache_sessions:
+            _cache.popitem(last=False)
+    return entry
+
+
+def get_queue(
+    db: DBSession,
+    run_id: str,
+    session_ids: list[str],
+    strategy: str = "margin",
+    limit: int = 50,
+    after: Optional[str] = None,
+) -> dict:
+    """
+    按不确定度从高到低取一页未标注动作
+
+    Args:
+        after: 上一页的 next_cursor（不确定度 + 动作 id 的 keyset 游标）
+
+    Returns:
+        {"run_id", "strategy", "total", "items": [{"action_id", "session_id",
+         "uncertainty", "predicted", "confidence"}], "next_cursor"}
+    """
+    if strategy not in UNCERTAINTY_STRATEGIES:
+        raise ValueError(f"不支持的不确定度指标: {strategy}")
+    loaded = model_registry.get_versioned_bundle(run_id, compiled=False)
+    if loaded is None:
+        raise ValueError(f"模型文件不存在: {run_id}")
+    model_version, bundle = loaded
+
+    versions = storage.get_label_versions(db, session_ids)
+    entries = [
+        (sid, _session_scores(db, run_id, model_version, bundle, sid, versions[sid]))
+        for sid in session_ids if sid in versions
+    ]
+    entries = [(sid, e) for sid, e in entries if len(e["action_ids"])]
+    if not entries:
+        return {"run_id": run_id, "strategy": strategy, "total": 0, "items": [], "next_cursor": None}
+
+    action_ids = np.concatenate([e["action_ids"] for _, e in entries])
+    owners = np.concatenate([np.full(len(e["action_ids"]), i) for i, (_, e) in enumerate(entries)])
+    proba = np.concatenate([e["proba"] for _, e in entries])
+    classes = entries[0][1]["classes"]
+    uncertainty = _uncertainty(proba, strategy)
+
+    candidates = np.arange(len(action_ids))
+    if after:
+        u0, id0 = _decode_cursor(after)
+        candidates = np.flatnonzero((uncertainty < u0) | ((uncertainty == u0) & (action_ids > id0)))
+    # 不确定度降序，相同时按动作 id 升序
+    order = candidates[np.lexsort((action_ids[candidates], -uncertainty[candidates]))][:limit + 1]
+    page = order[:limit]
+
+    items = [
+        {
+            "action_id": int(action_ids[i]),
+            "session_id": entries[owners[i]][0],
+            "uncertainty": float(uncertainty[i]),
+            "predicted": str(classes[proba[i].argmax()]),
+            "confidence": float(proba[i].max()),
+        }
+        for i in page
+    ]
+    next_cursor = None
+    if len(order) > limit:
+        last = page[-1]
+        next_cursor = _encode_cursor(float(uncertainty[last]), int(action_ids[last]))
+    return {
+        "run_id": run_id, "strategy": strategy, "total": int(len(action_ids)),
+        "items": items, "next_cursor": next_cursor,
+    }
+
+
+def submit_labels(db: DBSession, labels: list[dict]) -> int:
+    """
+    提交队列里的标注（good / bad），并就地更新打分缓存
+
+    Args:
+        labels: [{"action_id": 1, "manual_quality": "good"}, ...]
+
+    Returns:
+        更新的动作数
+    """
+    if any(item["manual_quality"] not in ("good", "bad") for item in labels):
+        raise ValueError("队列标注只接受 good / bad")
+    action_ids = [item["action_id"] for item in labels]
+    owners = storage.get_action_session_ids(db, action_ids)
+    missing = [i for i in action_ids if i not in owners]
+    if missing:
+        raise ValueError(f"动作不存在: {', '.join(map(str, missing[:10]))}")
+
+    by_session: dict[str, list[dict]] = {}
+    for item in labels:
+        by_session.setdefault(owners[item["action_id"]], []).append(item)
+
+    updated = 0
+    for session_id, changes in by_session.items():
+        before = storage.get_label_versions(db, [session_id])[session_id]
+        updated += storage.bulk_update_actions(db, session_id, changes)
+        after = storage.get_label_versions(db, [session_id])[session_id]
+        _apply_labels(session_id, before, after, [c["action_id"] for c in changes])
+    return updated
+
+
+def _apply_labels(session_id: str, before: int, after: int, action_ids: list[int]):
+    """
+    把刚标注的动作从该 session 的所有打分缓存中移除
+
+    只有版本正好前移一格（期间没有其他修改）且缓存是 before 版本时才能就地更新，
+    否则丢弃缓存，下次取队列时重新打分。
+    """
+    with _lock:
+        for key in [k for k in _cache if k[2] == session_id]:
+            entry = _cache[key]
+            if after != before + 1 or entry["label_version"] != before:
+                del _cache[key]
+                continue
+            keep = ~np.isin(entry["action_ids"], action_ids)
+            _cache[key] = {
+                **entry,
+                "label_version": after,
+                "action_ids": entry["action_ids"][keep],
+                "proba": entry["proba"][keep],
+            }
@@ -0,0 +1,56 @@
+"""
+自动标注服务
+用一个训练记录的模型给项目 / session 集合里所有未标注、未删除的动作打分，
+把预测标签写入 ml_quality、最大类别概率写入 ml_confidence。
+
+label_jobs 表是任务的持久化状态：提交时插入 pending 记录，由 training_queue 和训练任务
+共用槽位调度到进程池（training_queue.submit_label_job），执行时一次读出全部未标注动作的
+特征矩阵，按 autolabel_batch_size 分批 predict_proba，每批一条 executemany UPDATE 写回
+并推进 processed。服务重启时没跑完的任务重新放回 pending。
+"""
+from sqlalchemy.orm import Session as DBSession
+
+from config import settings
+from db.database import SessionLocal
+from services import model_registry, storage
+
+
+def run_label_job(job_id: str) -> str:
+    """
+    进程池入口：执行一个已被调度器置为 running 的自动标注任务
+
+    Returns:
+        任务的最终状态（任务不在 running 状态时返回 "skipped"）
+    """
+    db = SessionLocal()
+    try:
+        job = storage.get_label_job(db, job_id)
+        if not job or job["status"] != "running":
+            return "skipped"
+        try:
+            label_actions(db, job_id, job["run_id"], job["session_ids"])
+        except Exception as e:
+            db.rollback()
+            storage.finish_label_job(db, job_id, "failed", error=str(e))
+            return "failed"
+        storage.finish_label_job(db, job_id, "completed")
+        return "completed"
+    finally:
+        db.close()
+
+
+def label_actions(db: DBSession, job_id: str, run_id: str, session_ids: list[str]):
+    """读出未标注动作的特征矩阵，分批打分并写回"""
+    bundle = model_registry.get_bundle(run_id, compiled=False)
+    if bundle is None:
+        raise ValueError(f"模型文件不存在: {run_id}")
+
+    X, action_ids = storage.load_unlabeled_matrix(db, session_ids)
+    storage.set_label_job_total(db, job_id, len(action_ids))
+
+    batch_size = settings.autolabel_batch_size
+    for i in range(0, len(action_ids), batch_size):
+        classes, proba = model_registry.score(bundle, X[i:i + batch_size])
+        storage.write_ml_labels(
+            db, job_id, run_id, action_ids[i:i + batch_size], classes[proba.argmax(axis=1)], proba.max(axis=1)
+        )
@@ -0,0 +1,387 @@
+"""
+手表精简导出
+run_training 的 CoreML 导出原样转换训练出的模型，几百棵树的森林放到手表上又大又慢。
+这里把训练好的模型（教师）蒸馏成体积有上限的学生模型：
+- tree: 限制叶子数的决策树
+- linear: 少数几个特征上的逻辑回归（按 F 检验分数选特征，标准化参数一并导出）
+
+学生拟合的是教师在训练集上的预测标签。用户给出字节数和 / 或节点数预算，
+每类学生在 80% 样本上按一组从小到大的尺寸拟合候选，在留出的 20% 样本上量保真度
+（与教师预测一致的比例），选预算内保真度最高的候选原样导出（不再重新拟合），
+报告里的保真度是读回导出文件后在同一份留出样本上重新计算的：
+- models/{run_id}.compact.npz：学生模型的紧凑数组（阈值、系数都是 float32，下标是 int16），
+  体积预算按这个文件的实际字节数计算
+- models/{run_id}.compact.mlmodel：装了 coremltools 时另存一份 CoreML
+
+保真度 - 体积曲线（全部候选）和导出文件的单样本推理耗时写入训练记录的 compact_export。
+导出在后台进程池里执行（export_jobs 表，由 training_queue 和训练任务共用槽位调度）。
+"""
+import io
+import time
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from sklearn.feature_selection import f_classif
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from sqlalchemy.orm import Session as DBSession
+
+from config import settings
+from db.database import SessionLocal
+from services import model_registry, storage
+from services.feature_extractor import get_feature_names
+from services.model_trainer import load_training_data
+
+STUDENT_TYPES = ("auto", "tree", "linear")
+
+
+def _floor_float32(values: np.ndarray) -> np.ndarray:
+    """
+    不大于原值的最大 float32
+
+    特征本身是 float32，x <= t 与 x <= floor32(t) 对任意 float32 的 x 等价，
+    阈值压成 float32 后分裂结果不变
+    """
+    rounded = values.astype(np.float32)
+    too_big = rounded.astype(np.float64) > values
+    rounded[too_big] = np.nextafter(rounded[too_big], np.float32(-np.inf))
+    return rounded
+
+
+def tree_payload(model: DecisionTreeClassifier, labels: np.ndarray) -> dict:
+    """
+    决策树学生 → 紧凑数组
+
+    Args:
+        labels: 学生 classes_（教师的类别编码）对应的类别名
+
+    Returns:
+        {"feature", "threshold", "left", "right", "value", "labels"}，叶子节点 feature = left = right = -1
+    """
+    tree = model.tree_
+    index_type = np.int16 if tree.node_count < 2 ** 15 else np.int32
+    leaf = tree.children_left == -1
+    counts = tree.value[:, 0, :]
+    return {
+        "feature": np.where(leaf, -1, tree.feature).astype(index_type),
+        "threshold": _floor_float32(np.where(leaf, 0.0, tree.threshold)),
+        "left": tree.children_left.astype(index_type),
+        "right": tree.children_right.astype(index_type),
+        "value": (counts / counts.sum(axis=1, keepdims=True)).astype(np.float32),
+        "labels": np.asarray(labels).astype(str),
+    }
+
+
+def linear_payload(model: Pipeline, features: np.ndarray, labels: np.ndarray) -> dict:
+    """
+    线性学生（StandardScaler + LogisticRegression，只用 features 这几列）→ 紧凑数组
+
+    Returns:
+        {"features", "mean", "scale", "coef", "intercept", "labels"}
+    """
+    scaler, clf = model.named_steps["scale"], model.named_steps["clf"]
+    return {
+        "features": features.astype(np.int16),
+        "mean": scaler.mean_.astype(np.float32),
+        "scale": scaler.scale_.astype(np.float32),
+        "coef": clf.coef_.astype(np.float32),
+        "intercept": clf.intercept_.astype(np.float32),
+        "labels": np.asarray(labels).astype(str),
+    }
+
+
+def payload_bytes(payload: dict) -> int:
+    """导出文件（未压缩 .npz）的字节数"""
+    buffer = io.BytesIO()
+    np.savez(buffer, **payload)
+    return buffer.getbuffer().nbytes
+
+
+def predict_proba(payload: dict, X: np.ndarray) -> np.ndarray:
+    """
+    用导出的数组打分（只依赖 NumPy，等价于手表端的实现）
+
+    Returns:
+        (n, len(labels))，列按 payload["labels"] 的顺序
+    """
+    X = np.asarray(X, dtype=np.float32)
+    if "threshold" in payload:
+        feature, threshold = payload["feature"], payload["threshold"]
+        left, right = payload["left"], payload["right"]
+        node = np.zeros(len(X), dtype=np.int64)
+        rows = np.arange(len(X))
+        while len(rows):
+            current = node[rows]
+            internal = feature[current] >= 0
+            rows, current = rows[internal], current[internal]
+            go_left = X[rows, feature[current]] <= threshold[current]
+            node[rows] = np.where(go_left, left[current], right[current])
+        return payload["value"][node]
+
+    z = ((X[:, payload["features"]] - payload["mean"]) / payload["scale"]) @ payload["coef"].T + payload["intercept"]
+    if z.shape[1] == 1:
+        p = 1.0 / (1.0 + np.exp(-z[:, 0]))
+        return np.stack([1.0 - p, p], axis=1)
+    z -= z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def _predict_labels(payload: dict, X: np.ndarray) -> np.ndarray:
+    return payload["labels"][predict_proba(payload, X).argmax(axis=1)]
+
+
+def _sizes(limit: int) -> list[int]:
+    """1, 2, 4, ... 直到 limit（含 limit）"""
+    sizes = [1]
+    while sizes[-1] * 2 < limit:
+        sizes.append(sizes[-1] * 2)
+    return sorted(set(sizes + [limit]))
+
+
+def _fit_tree(X: np.ndarray, y: np.ndarray, labels: np.ndarray, leaves: int):
+    model = DecisionTreeClassifier(max_leaf_nodes=leaves, random_state=42).fit(X, y)
+    return model, tree_payload(model, labels[model.classes_]), {"max_leaf_nodes": leaves}
+
+
+def _fit_linear(X: np.ndarray, y: np.ndarray, labels: np.ndarray, features: np.ndarray):
+    model = Pipeline([
+        ("scale", StandardScaler()),
+        ("clf", LogisticRegression(max_iter=1000)),
+    ]).fit(X[:, features], y)
+    params = {"n_features": len(features), "features": features.tolist()}
+    return model, linear_payload(model, features, labels[model.named_steps["clf"].classes_]), params
+
+
+def _candidates(
+    X: np.ndarray, y: np.ndarray, labels: np.ndarray, student: str,
+    max_bytes: Optional[int], max_nodes: Optional[int],
+):
+    """
+    按尺寸从小到大扫描学生模型，超出预算即停
+
+    Yields:
+        (student, params, model, payload)
+    """
+    if student in ("auto", "tree"):
+        for leaves in _sizes(4096)[1:]:
+            model, payload, params = _fit_tree(X, y, labels, leaves)
+            # 树已经长满（叶子数没到上限），更大的 max_leaf_nodes 结果相同
+            if model.get_n_leaves() < leaves // 2 + 1:
+                break
+            if max_nodes is not None and model.tree_.node_count > max_nodes:
+                break
+            if max_bytes is not None and payload_bytes(payload) > max_bytes:
+                break
+            yield "tree", params, model, payload
+
+    # 线性模型没有节点，只受字节数预算限制；教师只预测出一个类别时没法拟合逻辑回归
+    if student in ("auto", "linear") and max_bytes is not None and len(np.unique(y)) > 1:
+        scores, _ = f_classif(X, y)
+        ranking = np.argsort(-np.nan_to_num(scores, nan=-1.0), kind="stable")
+        for k in _sizes(X.shape[1]):
+            model, payload, params = _fit_linear(X, y, labels, np.sort(ranking[:k]))
+            if payload_bytes(payload) > max_bytes:
+                break
+            yield "linear", params, model, payload
+
+
+def _single_sample_us(predict, X: np.ndarray, repeats: int = 200) -> dict:
+    """单样本推理耗时（微秒）的 p50 / p99"""
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, len(X), repeats)
+    predict(X[rows[:1]])
+    seconds = []
+    for i in rows:
+        start = time.perf_counter()
+        predict(X[i:i + 1])
+        seconds.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(np.array(seconds) * 1e6, [50, 99])
+    return {"p50": round(float(p50), 1), "p99": round(float(p99), 1)}
+
+
+def _export_coreml(run_id: str, student: str, model, params: dict, feature_count: int) -> Optional[int]:
+    """学生模型另存 CoreML，返回文件字节数；没装 coremltools 或转换失败时返回 None"""
+    path = storage.get_model_path(run_id, ext=".compact.mlmodel")
+    # 上一次导出的 CoreML 对应的是旧学生模型
+    path.unlink(missing_ok=True)
+    try:
+        import coremltools as ct
+        names = get_feature_names()[:feature_count]
+        if student == "linear":
+            names = [names[i] for i in params["features"]]
+        coreml_model = ct.converters.sklearn.convert(model, input_features=names, output_feature_names="quality")
+        coreml_model.save(str(path))
+        return path.stat().st_size
+    except Exception as e:
+        print(f"[CompactExport] CoreML export failed: {e}")
+        return None
+
+
+def check_request(
+    db: DBSession, run_id: str, max_bytes: Optional[int], max_nodes: Optional[int], student: str,
+) -> dict:
+    """
+    校验导出参数和教师模型（入队前和执行时各调用一次）
+
+    Returns:
+        训练记录
+
+    Raises:
+        ValueError: 参数不合法、训练未完成或模型文件不存在
+    """
+    if student not in STUDENT_TYPES:
+        raise ValueError(f"不支持的学生模型: {student}")
+    if max_bytes is None and max_nodes is None:
+        raise ValueError("至少指定 max_bytes 或 max_nodes 之一")
+    if student == "linear" and max_bytes is None:
+        raise ValueError("线性学生模型需要指定 max_bytes")
+
+    run = storage.get_training_run(db, run_id)
+    if not run or run["status"] != "completed":
+        raise ValueError("训练未完成或训练记录不存在")
+    if not storage.get_model_path(run_id, ext=".pkl").exists():
+        raise ValueError(f"模型文件不存在: {run_id}")
+    return run
+
+
+def distill_data(db: DBSession, run: dict, teacher: dict):
+    """
+    蒸馏用的样本和拆分（固定随机种子，同一训练记录每次结果相同）
+
+    Returns:
+        (X_fit, X_val, t_fit, t_val, y_val, labels)：t_* 是教师预测的类别编码，
+        y_val 是留出样本的人工标签，labels 是类别编码对应的类别名
+    """
+    snapshot = storage.load_snapshot(run["dataset_snapshot"]) if run.get("dataset_snapshot") else None
+    if snapshot is not None:
+        X, y = np.nan_to_num(snapshot[0].astype(np.float64), nan=0.0), snapshot[1]
+    else:
+        X, y, _ = load_training_data(db, run["session_ids"])
+    rng = np.random.default_rng(42)
+    if len(X) > settings.compact_distill_max_samples:
+        keep = np.sort(rng.choice(len(X), settings.compact_distill_max_samples, replace=False))
+        X, y = X[keep], y[keep]
+
+    # 教师的预测标签（编码后的整数）作为学生的训练目标
+    _, proba = model_registry.score(teacher, X)
+    teacher_y = teacher["model"].classes_[proba.argmax(axis=1)]
+    labels = teacher["label_encoder"].classes_
+    y = np.asarray(y).astype(str)
+
+    X_fit, X_val, t_fit, t_val, _, y_val = train_test_split(
+        X, teacher_y, y, test_size=0.2, random_state=42,
+        stratify=teacher_y if np.bincount(teacher_y).min() >= 2 else None,
+    )
+    return X_fit, X_val, t_fit, t_val, y_val, labels
+
+
+def export_compact(
+    db: DBSession,
+    run_id: str,
+    max_bytes: Optional[int] = None,
+    max_nodes: Optional[int] = None,
+    student: str = "auto",
+) -> dict:
+    """
+    把训练记录的模型蒸馏成预算内的学生模型并导出
+
+    Args:
+        max_bytes: 导出文件（.compact.npz）的字节数上限
+        max_nodes: 决策树学生的节点数上限（线性学生只受 max_bytes 限制）
+        student: auto（两类都试）/ tree / linear
+
+    Returns:
+        写入训练记录 compact_export 的报告
+    """
+    run = check_request(db, run_id, max_bytes, max_nodes, student)
+    teacher = model_registry.get_bundle(run_id, compiled=False)
+    if teacher is None:
+        raise ValueError(f"模型文件不存在: {run_id}")
+
+    start = time.perf_counter()
+    X_fit, X_val, t_fit, t_val, y_val, labels = distill_data(db, run, teacher)
+    teacher_val = labels[t_val]
+
+    candidates, best = [], None
+    for kind, params, model, payload in _candidates(X_fit, t_fit, labels, student, max_bytes, max_nodes):
+        predicted = _predict_labels(payload, X_val)
+        entry = {
+            "student": kind,
+            "params": params,
+            "size_bytes": payload_bytes(payload),
+            "nodes": int(len(payload["feature"])) if kind == "tree" else None,
+            "fidelity": round(float(np.mean(predicted == teacher_val)), 4),
+            "accuracy": round(float(np.mean(predicted == y_val)), 4),
+        }
+        candidates.append(entry)
+        if best is None or (entry["fidelity"], -entry["size_bytes"]) > (best["fidelity"], -best["size_bytes"]):
+            best, best_fit = entry, (model, payload)
+    if best is None:
+        raise ValueError("预算内放不下任何学生模型，请放宽 max_bytes / max_nodes")
+
+    # 导出的就是量过保真度的那个候选，不重新拟合
+    model, payload = best_fit
+    path = storage.get_model_path(run_id, ext=".compact.npz")
+    with open(path, "wb") as f:
+        np.savez(f, **payload)
+    X = np.concatenate([X_fit, X_val])
+    coreml_bytes = _export_coreml(run_id, best["student"], model, best["params"], X.shape[1])
+    distill_seconds = time.perf_counter() - start
+
+    # 读回导出文件：在同一份留出样本上重新量保真度，单样本耗时和教师模型（在线推理用的格式）对比
+    with np.load(path, allow_pickle=False) as f:
+        exported = {name: f[name] for name in f.files}
+    predicted = _predict_labels(exported, X_val)
+    teacher_online = model_registry.get_bundle(run_id)
+    teacher_path = storage.get_model_path(run_id, ext=".pkl")
+
+    report = {
+        **best,
+        "size_bytes": path.stat().st_size,
+        "nodes": int(len(payload["feature"])) if best["student"] == "tree" else None,
+        "fidelity": round(float(np.mean(predicted == teacher_val)), 4),
+        "accuracy": round(float(np.mean(predicted == y_val)), 4),
+        "coreml_bytes": coreml_bytes,
+        "latency_us": _single_sample_us(lambda row: predict_proba(exported, row), X),
+        "teacher_bytes": teacher_path.stat().st_size,
+        "teacher_latency_us": _single_sample_us(lambda row: model_registry.score(teacher_online, row), X),
+        "budget": {"max_bytes": max_bytes, "max_nodes": max_nodes, "student": student},
+        "distill_samples": int(len(X)),
+        "validation_samples": int(len(X_val)),
+        "distill_seconds": round(distill_seconds, 3),
+        "candidates": candidates,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    storage.save_compact_export(db, run_id, report)
+    return report
+
+
+def run_export_job(job_id: str) -> str:
+    """
+    进程池入口：执行一个已被调度器置为 running 的精简导出任务
+
+    Returns:
+        任务的最终状态（任务不在 running 状态时返回 "skipped"）
+    """
+    db = SessionLocal()
+    try:
+        job = storage.get_export_job(db, job_id)
+        if not job or job["status"] != "running":
+            return "skipped"
+        budget = job["budget"]
+        try:
+            report = export_compact(db, job["run_id"], budget.get("max_bytes"), budget.get("max_nodes"),
+                                    budget.get("student", "auto"))
+        except Exception as e:
+            db.rollback()
+            storage.finish_export_job(db, job_id, "failed", error=str(e))
+            return "failed"
+        storage.finish_export_job(db, job_id, "completed", report=report)
+        return "completed"
+    finally:
+        db.close()
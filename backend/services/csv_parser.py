@@ -2,24 +2,43 @@
 CSV 文件解析服务
 处理从 App 导出的 raw IMU 和 feedback CSV
 """
+import csv
 import pandas as pd
 import numpy as np
-from io import StringIO
-from typing import List, Dict, Optional
+from pathlib import Path
+from typing import List, Dict, Optional, Sequence, Tuple, Iterable, Iterator
 
 
-def parse_raw_csv(file_content: str) -> pd.DataFrame:
+RAW_REQUIRED_COLUMNS = [
+    'session_id', 'session_type', 'time',
+    'userAccelX', 'userAccelY', 'userAccelZ',
+    'rotationRateX', 'rotationRateY', 'rotationRateZ'
+]
+
+FEEDBACK_REQUIRED_COLUMNS = [
+    'session_id', 'action_index', 't_peak', 't_start', 't_end',
+    'ml_classification', 'ml_quality', 'manual_quality'
+]
+
+
+def iter_raw_csv_chunks(path: Path, chunk_rows: int = 100_000) -> Iterator[pd.DataFrame]:
     """
-    解析 raw IMU CSV
+    分块解析磁盘上的 raw IMU CSV，内存占用只与 chunk_rows 有关
 
     Args:
-        file_content: CSV 文件内容（字符串）
+        path: CSV 文件路径
+        chunk_rows: 每块行数
 
-    Returns:
-        包含 magnitude 的 DataFrame
+    Yields:
+        包含 magnitude 的 DataFrame 块
     """
-    df = pd.read_csv(StringIO(file_content))
+    with pd.read_csv(path, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield _add_magnitudes(chunk)
+
 
+def _add_magnitudes(df: pd.DataFrame) -> pd.DataFrame:
+    """计算 accMag / gyroMag 列"""
     # 计算加速度 magnitude
     df['accMag'] = np.sqrt(
         df['userAccelX']**2 +
@@ -37,19 +56,21 @@ def parse_raw_csv(file_content: str) -> pd.DataFrame:
     return df
 
 
-def parse_feedback_csv(file_content: str) -> pd.DataFrame:
+def load_feedback_csv(path: Path) -> pd.DataFrame:
     """
-    解析 feedback CSV
+    从磁盘读取 feedback CSV（每个动作一行，文件较小，整体读入）
 
     Args:
-        file_content: CSV 文件内容
+        path: CSV 文件路径
 
     Returns:
         Feedback DataFrame
     """
-    df = pd.read_csv(StringIO(file_content))
+    return _check_feedback_columns(pd.read_csv(path))
+
 
-    # 验证必需列
+def _check_feedback_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """验证 feedback 必需列"""
     required_cols = ['session_id', 'action_index', 't_peak', 't_start', 't_end']
     missing = [col for col in required_cols if col not in df.columns]
     if missing:
@@ -66,6 +87,9 @@ def detect_peaks(
     """
     峰值检测（复刻 Swift 逻辑）
 
+    先用阈值掩码找出候选点，再只在候选点上做冷却过滤，
+    结果与逐行扫描完全一致。
+
     Args:
         df: Raw IMU DataFrame（必须包含 'time' 和 'accMag' 列）
         threshold: 加速度阈值（m/s²）
@@ -77,27 +101,147 @@ def detect_peaks(
     if 'time' not in df.columns or 'accMag' not in df.columns:
         raise ValueError("DataFrame must contain 'time' and 'accMag' columns")
 
-    peaks = []
+    times = df['time'].to_numpy(dtype=np.float64)
+    acc_mag = df['accMag'].to_numpy(dtype=np.float64)
+
+    positions = _peak_positions(times, acc_mag, np.flatnonzero(acc_mag > threshold), cooldown)
+    labels = df.index[positions]
+
+    return [
+        {
+            'index': int(label),
+            'time': float(times[pos]),
+            'magnitude': float(acc_mag[pos]),
+        }
+        for label, pos in zip(labels, positions)
+    ]
+
+
+def batch_detect_peaks(
+    sessions: Sequence[Tuple[np.ndarray, np.ndarray]],
+    threshold: float = 2.2,
+    cooldown: float = 0.45
+) -> List[List[Dict]]:
+    """
+    一次调用对多个 session 做峰值检测
+
+    所有 session 的 accMag 拼接后只做一次阈值比较，
+    再按 session 边界拆分候选点分别做冷却过滤。
+
+    Args:
+        sessions: [(time, accMag), ...]，每个 session 一对等长数组
+        threshold: 加速度阈值（m/s²）
+        cooldown: 冷却时间（秒）
+
+    Returns:
+        与 sessions 一一对应的峰值列表，index 为数组内的位置
+    """
+    if not sessions:
+        return []
+
+    times_list = [np.asarray(t, dtype=np.float64) for t, _ in sessions]
+    mags_list = [np.asarray(m, dtype=np.float64) for _, m in sessions]
+    for t, m in zip(times_list, mags_list):
+        if t.shape != m.shape:
+            raise ValueError("time and accMag arrays must have the same length")
+
+    offsets = np.cumsum([0] + [len(m) for m in mags_list])
+    candidates = np.flatnonzero(np.concatenate(mags_list) > threshold)
+    bounds = np.searchsorted(candidates, offsets)
+
+    results = []
+    for k, (times, acc_mag) in enumerate(zip(times_list, mags_list)):
+        local = candidates[bounds[k]:bounds[k + 1]] - offsets[k]
+        positions = _peak_positions(times, acc_mag, local, cooldown)
+        results.append([
+            {
+                'index': int(pos),
+                'time': float(times[pos]),
+                'magnitude': float(acc_mag[pos]),
+            }
+            for pos in positions
+        ])
+    return results
+
+
+def _peak_positions(
+    times: np.ndarray,
+    acc_mag: np.ndarray,
+    candidates: np.ndarray,
+    cooldown: float
+) -> np.ndarray:
+    """
+    在超过阈值的候选点上做冷却过滤
+
+    冷却是贪心的（是否保留取决于上一个保留的峰），无法完全向量化，
+    但只需扫描候选点而不是整段数据。
+
+    Returns:
+        保留下来的峰值在数组中的位置
+    """
+    kept = []
     last_peak_time = -cooldown
+    for j, t in enumerate(times[candidates].tolist()):
+        if t - last_peak_time >= cooldown:
+            kept.append(j)
+            last_peak_time = t
+    return candidates[kept]
 
-    for i, row in df.iterrows():
-        if row['accMag'] > threshold:
-            time_diff = row['time'] - last_peak_time
-            if time_diff >= cooldown:
-                peaks.append({
-                    'index': int(i),
-                    'time': float(row['time']),
-                    'magnitude': float(row['accMag'])
-                })
-                last_peak_time = row['time']
 
-    return peaks
+class TimeIndex:
+    """
+    基于 time 列的窗口索引，每个 session 构建一次
+
+    time 单调不减时用 np.searchsorted 定位窗口边界（O(log n)），返回 slice，
+    对 ndarray / DataFrame.iloc 取窗口都不复制数据；否则回退为布尔掩码。
+    窗口语义与 (time >= t_start) & (time <= t_end) 完全一致。
+    """
+
+    def __init__(self, times: np.ndarray, is_sorted: Optional[bool] = None):
+        self.times = np.asarray(times)
+        if is_sorted is None:
+            is_sorted = bool(np.all(self.times[1:] >= self.times[:-1]))
+        self.is_sorted = is_sorted
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, column: str = 'time') -> "TimeIndex":
+        return cls(df[column].to_numpy(dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def window(self, t_start: float, t_end: float):
+        """
+        返回 [t_start, t_end] 内的行位置
+
+        Returns:
+            slice（有序时）或行号数组（无序时），可直接用于 arr[...] / df.iloc[...]
+        """
+        if self.is_sorted:
+            lo = int(np.searchsorted(self.times, t_start, side='left'))
+            hi = int(np.searchsorted(self.times, t_end, side='right'))
+            return slice(lo, max(lo, hi))
+        return np.flatnonzero((self.times >= t_start) & (self.times <= t_end))
+
+    def bounds(self, t_starts: np.ndarray, t_ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        批量计算多个窗口的 [lo, hi) 行边界（要求 time 有序）
+
+        Returns:
+            (lo, hi) 两个整数数组
+        """
+        if not self.is_sorted:
+            raise ValueError("TimeIndex.bounds requires a monotonic time column")
+        lo = np.searchsorted(self.times, t_starts, side='left')
+        hi = np.searchsorted(self.times, t_ends, side='right')
+        return lo, np.maximum(lo, hi)
 
 
 def segment_window(
     df: pd.DataFrame,
     peak_time: float,
-    window_size: float
+    window_size: float,
+    index: Optional[TimeIndex] = None
 ) -> pd.DataFrame:
     """
     提取峰值前后的时间窗口
@@ -106,6 +250,7 @@ def segment_window(
         df: Raw IMU DataFrame
         peak_time: 峰值时间
         window_size: 窗口半径（秒）
+        index: 预先构建的 TimeIndex（同一 session 多次截取时复用）
 
     Returns:
         窗口内的 DataFrame
@@ -113,37 +258,50 @@ def segment_window(
     t_start = peak_time - window_size
     t_end = peak_time + window_size
 
-    window = df[(df['time'] >= t_start) & (df['time'] <= t_end)].copy()
+    if index is None:
+        index = TimeIndex.from_frame(df)
+
+    window = df.iloc[index.window(t_start, t_end)].copy()
 
     return window
 
 
-def validate_csv_format(df: pd.DataFrame, csv_type: str) -> tuple[bool, Optional[str]]:
+def validate_csv_header(header_line: str, csv_type: str) -> tuple[bool, Optional[str]]:
+    """
+    只根据表头行验证 CSV 格式（用于流式上传，在读取数据行之前拒绝错误文件）
+
+    Args:
+        header_line: CSV 第一行
+        csv_type: 'raw' 或 'feedback'
+
+    Returns:
+        (是否有效, 错误信息)
+    """
+    # pandas 读取时会去掉 UTF-8 BOM，这里保持一致
+    columns = next(csv.reader([header_line.lstrip('\ufeff').strip()]), [])
+    return validate_csv_columns(columns, csv_type)
+
+
+def validate_csv_columns(columns: Iterable[str], csv_type: str) -> tuple[bool, Optional[str]]:
     """
-    验证 CSV 格式是否正确
+    验证列名是否包含所需列
 
     Args:
-        df: DataFrame
+        columns: 列名
         csv_type: 'raw' 或 'feedback'
 
     Returns:
         (是否有效, 错误信息)
     """
     if csv_type == 'raw':
-        required = [
-            'session_id', 'session_type', 'time',
-            'userAccelX', 'userAccelY', 'userAccelZ',
-            'rotationRateX', 'rotationRateY', 'rotationRateZ'
-        ]
+        required = RAW_REQUIRED_COLUMNS
     elif csv_type == 'feedback':
-        required = [
-            'session_id', 'action_index', 't_peak', 't_start', 't_end',
-            'ml_classification', 'ml_quality', 'manual_quality'
-        ]
+        required = FEEDBACK_REQUIRED_COLUMNS
     else:
         return False, f"Unknown CSV type: {csv_type}"
 
-    missing = [col for col in required if col not in df.columns]
+    columns = set(columns)
+    missing = [col for col in required if col not in columns]
     if missing:
         return False, f"Missing columns: {', '.join(missing)}"
 
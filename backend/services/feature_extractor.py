@@ -4,7 +4,16 @@
 """
 import numpy as np
 import pandas as pd
-from typing import List
+from typing import List, Mapping
+
+# 特征顺序：前 4 列加速度、后 4 列陀螺仪，每列 5 个统计量
+FEATURE_COLUMNS = [
+    'userAccelX', 'userAccelY', 'userAccelZ', 'accMag',
+    'rotationRateX', 'rotationRateY', 'rotationRateZ', 'gyroMag',
+]
+
+# 窗口至少需要的采样点数
+MIN_WINDOW_SAMPLES = 10
 
 
 def extract_features(window: pd.DataFrame) -> np.ndarray:
@@ -70,6 +79,68 @@ def _compute_stats(data: np.ndarray) -> List[float]:
     ]
 
 
+def window_features(
+    columns: Mapping[str, np.ndarray],
+    lo: np.ndarray,
+    hi: np.ndarray
+) -> np.ndarray:
+    """
+    一次性计算一个 session 所有窗口的 40 维特征（与 extract_features 逐窗口结果一致）
+
+    对每个通道在整段数据上做一次前缀和：
+    - sum(x)、sum(x²) 的前缀和 → mean / std / RMS
+    - 相邻符号变化的前缀和 → 过零次数
+    - max|x| 用 np.maximum.reduceat 按窗口归约
+    总耗时 O(n + k)（max 为 O(窗口总长)，在 C 层完成），不为每个窗口构造 DataFrame。
+
+    Args:
+        columns: 通道名 → 整段数据（DataFrame 或 {列名: ndarray}，可以是 mmap），
+                 需为有限值（NaN 会沿前缀和传播到后续所有窗口）
+        lo: 每个窗口起始行（含）
+        hi: 每个窗口结束行（不含），要求 hi > lo
+
+    Returns:
+        (n_windows, 40) float32 特征矩阵
+    """
+    lo = np.asarray(lo, dtype=np.int64)
+    hi = np.asarray(hi, dtype=np.int64)
+    n = (hi - lo).astype(np.float64)
+    out = np.empty((len(lo), 5 * len(FEATURE_COLUMNS)), dtype=np.float32)
+    if len(lo) == 0:
+        return out
+
+    # reduceat 的下标序列 [lo0, hi0, lo1, hi1, ...]，取偶数位结果即为每个窗口的归约值
+    pairs = np.column_stack([lo, hi]).ravel()
+
+    for c, col in enumerate(FEATURE_COLUMNS):
+        if col not in columns:
+            raise ValueError(f"Column '{col}' not found in window")
+        x = np.asarray(columns[col], dtype=np.float64)
+
+        # 先减去全局均值再累加，减小前缀和相减时的舍入误差（方差对平移不变）
+        shift = x.mean()
+        xc = x - shift
+        s1 = np.concatenate(([0.0], np.cumsum(xc)))
+        s2 = np.concatenate(([0.0], np.cumsum(xc * xc)))
+        zc = np.concatenate(([0], np.cumsum(np.diff(np.sign(x)) != 0)))
+
+        mean_c = (s1[hi] - s1[lo]) / n
+        var = np.maximum((s2[hi] - s2[lo]) / n - mean_c * mean_c, 0.0)
+        mean = mean_c + shift
+
+        # 末尾补一个哨兵，使 hi == len(x) 时 reduceat 下标仍合法
+        abs_x = np.append(np.abs(x), 0.0)
+        peak = np.maximum.reduceat(abs_x, pairs)[::2]
+
+        out[:, 5 * c + 0] = mean
+        out[:, 5 * c + 1] = np.sqrt(var)
+        out[:, 5 * c + 2] = peak
+        out[:, 5 * c + 3] = np.sqrt(var + mean * mean)
+        out[:, 5 * c + 4] = zc[hi - 1] - zc[lo]
+
+    return out
+
+
 def batch_extract_features(
     raw_df: pd.DataFrame,
     peaks: List[dict],
@@ -78,6 +149,9 @@ def batch_extract_features(
     """
     批量提取特征
 
+    time 有序且数据不含 NaN/inf 时走 window_features 的前缀和路径，
+    否则回退到逐窗口 extract_features。
+
     Args:
         raw_df: Raw IMU DataFrame
         peaks: 峰值列表
@@ -88,16 +162,42 @@ def batch_extract_features(
         - features_matrix: (n_actions, 40)
         - valid_peaks: 有效的峰值列表（过滤掉窗口数据不足的）
     """
-    from .csv_parser import segment_window
+    from .csv_parser import TimeIndex
+
+    index = TimeIndex.from_frame(raw_df)
+    missing = [col for col in FEATURE_COLUMNS if col not in raw_df.columns]
+    finite = not missing and bool(np.isfinite(raw_df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)).all())
+
+    if not (index.is_sorted and finite):
+        return _batch_extract_features_per_window(raw_df, peaks, window_size, index)
+
+    peak_times = np.array([p['time'] for p in peaks], dtype=np.float64)
+    lo, hi = index.bounds(peak_times - window_size, peak_times + window_size)
 
+    # 确保窗口有足够数据（至少 10 个采样点）
+    keep = np.flatnonzero(hi - lo >= MIN_WINDOW_SAMPLES)
+    if len(keep) == 0:
+        return np.array([]), []
+
+    features = window_features(raw_df, lo[keep], hi[keep])
+    return features, [peaks[i] for i in keep]
+
+
+def _batch_extract_features_per_window(
+    raw_df: pd.DataFrame,
+    peaks: List[dict],
+    window_size: float,
+    index
+) -> tuple[np.ndarray, List[dict]]:
+    """逐窗口提取特征（time 无序或数据含 NaN 时使用）"""
     features_list = []
     valid_peaks = []
 
     for peak in peaks:
-        window = segment_window(raw_df, peak['time'], window_size)
+        window = raw_df.iloc[index.window(peak['time'] - window_size, peak['time'] + window_size)]
 
         # 确保窗口有足够数据（至少 10 个采样点）
-        if len(window) >= 10:
+        if len(window) >= MIN_WINDOW_SAMPLES:
             try:
                 features = extract_features(window)
                 features_list.append(features)
@@ -0,0 +1,163 @@
+"""
+超参数搜索服务
+在一个训练任务里只加载一次数据，用 sklearn 的 GridSearchCV / RandomizedSearchCV /
+HalvingRandomSearchCV 以 n_jobs 把候选参数分摊到多个核上做交叉验证，
+每个候选写一条 TrainingRun（parent_run_id 指向搜索任务），最后用最优参数按
+run_training 的流程在搜索任务自身的 run_id 下训练、评估并保存模型。
+"""
+import time
+from typing import Callable, Optional
+
+import numpy as np
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GridSearchCV, HalvingRandomSearchCV, RandomizedSearchCV
+from sklearn.preprocessing import LabelEncoder
+
+from sqlalchemy.orm import Session as DBSession
+
+from config import settings
+from services import storage
+from services.model_trainer import build_model, load_training_data, run_training
+
+SEARCH_STRATEGIES = ("grid", "random", "halving")
+
+# 每种模型可搜索的参数：接口参数名 → sklearn 估计器参数名
+SEARCH_PARAMS = {
+    "svm": {"svm_c": "C", "svm_kernel": "kernel"},
+    "decision_tree": {"max_depth": "max_depth"},
+    "random_forest": {"max_depth": "max_depth", "n_estimators": "n_estimators"},
+    "svm_approx": {"svm_kernel": "kernel__kernel"},
+    "hist_gradient_boosting": {"max_depth": "clf__max_depth", "n_estimators": "clf__max_iter"},
+}
+
+DEFAULT_HYPERPARAMS = {"svm_c": 1.0, "svm_kernel": "rbf", "max_depth": None, "n_estimators": 100}
+
+
+def build_search(
+    model_type: str,
+    strategy: str,
+    space: dict,
+    n_iter: int = 10,
+    cv: int = 5,
+    n_jobs: int = -1,
+    n_samples: Optional[int] = None,
+):
+    """
+    创建 sklearn 搜索对象（只打分不 refit，最终模型由 run_training 训练）
+
+    Args:
+        space: {"svm_c": [0.1, 1, 10], "svm_kernel": ["rbf", "linear"], ...}，
+               不适用于该模型类型的参数忽略
+        n_iter: random 的采样数 / halving 的初始候选数
+        n_samples: 训练样本数，见 build_model
+    """
+    if model_type not in SEARCH_PARAMS:
+        raise ValueError(f"不支持的模型类型: {model_type}")
+    names = SEARCH_PARAMS[model_type]
+    grid = {names[k]: list(v) for k, v in space.items() if k in names and v}
+    if not grid:
+        raise ValueError(f"搜索空间为空，{model_type} 可搜索的参数: {', '.join(names)}")
+
+    # 搜索阶段只比较准确率，SVM 不需要概率校准
+    estimator = build_model(model_type, probability=False, n_samples=n_samples)
+    common = {"cv": cv, "scoring": "accuracy", "n_jobs": n_jobs, "refit": False}
+    if strategy == "grid":
+        return GridSearchCV(estimator, grid, **common)
+    if strategy == "random":
+        return RandomizedSearchCV(estimator, grid, n_iter=n_iter, random_state=42, **common)
+    if strategy == "halving":
+        return HalvingRandomSearchCV(estimator, grid, n_candidates=n_iter, factor=3, random_state=42, **common)
+    raise ValueError(f"不支持的搜索策略: {strategy}")
+
+
+def _candidate_hyperparams(model_type: str, sk_params: dict) -> dict:
+    """sklearn 参数 → 与 run_training 相同格式的 hyperparams"""
+    hyperparams = {"model_type": model_type, **DEFAULT_HYPERPARAMS}
+    for name, sk_name in SEARCH_PARAMS[model_type].items():
+        if sk_name in sk_params:
+            value = sk_params[sk_name]
+            hyperparams[name] = value.item() if isinstance(value, np.generic) else value
+    return hyperparams
+
+
+def run_search(db: DBSession, run_id: str, run: dict, checkpoint: Callable[[], None]) -> dict:
+    """
+    执行一个超参数搜索任务
+
+    Args:
+        run: 搜索任务的训练记录，
+             hyperparams["search"] = {"strategy", "space", "n_iter", "eval_mode"}
+        checkpoint: 同 run_training，搜索开始前和最终训练前各检查一次
+
+    Returns:
+        最优参数的训练结果（同 run_training）
+    """
+    model_type = run["model_type"]
+    search = run["hyperparams"]["search"]
+
+    checkpoint()
+    X, y, snapshot_id = load_training_data(db, run["session_ids"])
+    y_encoded = LabelEncoder().fit_transform(y)
+
+    cv_folds = min(5, len(X))
+    if cv_folds < 2:
+        raise ValueError("样本太少，无法进行交叉验证搜索")
+
+    search_cv = build_search(
+        model_type, search["strategy"], search["space"], search.get("n_iter", 10),
+        cv=cv_folds, n_jobs=settings.search_n_jobs, n_samples=len(X),
+    )
+    checkpoint()
+    start = time.perf_counter()
+    search_cv.fit(X, y_encoded)
+    search_seconds = time.perf_counter() - start
+
+    results = search_cv.cv_results_
+    n_resources = results.get("n_resources")
+    candidates = []
+    for i, sk_params in enumerate(results["params"]):
+        mean, std = results["mean_test_score"][i], results["std_test_score"][i]
+        hyperparams = _candidate_hyperparams(model_type, sk_params)
+        if "iter" in results:
+            hyperparams["halving_iter"] = int(results["iter"][i])
+        candidates.append({
+            "run_id": f"{run_id}-{i:03d}",
+            "model_type": model_type,
+            "hyperparams": hyperparams,
+            "sample_count": int(n_resources[i]) if n_resources is not None else len(X),
+            "cv_mean": None if np.isnan(mean) else float(mean),
+            "cv_std": None if np.isnan(std) else float(std),
+            "dataset_snapshot": snapshot_id,
+        })
+    storage.save_search_candidates(db, run_id, candidates)
+
+    best = _candidate_hyperparams(model_type, search_cv.best_params_)
+    result = run_training(
+        db=db,
+        run_id=run_id,
+        session_ids=run["session_ids"],
+        model_type=model_type,
+        svm_c=best["svm_c"],
+        svm_kernel=best["svm_kernel"],
+        max_depth=best["max_depth"],
+        n_estimators=best["n_estimators"],
+        checkpoint=checkpoint,
+        dataset=(X, y, snapshot_id),
+        eval_mode=search.get("eval_mode", "full"),
+        scalable=False,  # 搜索的就是这个模型类型，不再按样本数切换
+    )
+
+    # 最终记录的超参数 = 最优参数 + 搜索配置和摘要
+    result["hyperparams"] = {
+        **result["hyperparams"],
+        "search": {
+            **search,
+            "n_candidates": len(candidates),
+            "best_candidate_run_id": candidates[search_cv.best_index_]["run_id"],
+            "best_cv_score": float(search_cv.best_score_),
+            "search_seconds": round(search_seconds, 3),
+            "n_jobs": settings.search_n_jobs,
+        },
+    }
+    storage.update_training_run_hyperparams(db, run_id, result["hyperparams"])
+    return result
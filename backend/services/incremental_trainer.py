@@ -0,0 +1,322 @@
+"""
+增量训练服务
+incremental_sgd / incremental_nb 两种模型用 partial_fit 在已有模型上继续训练，
+每次更新只读取上次以来新增或改了标注的动作，不重新扫描全部历史。
+
+模型本体仍是 get_model_path(run_id, ".pkl") 里的 bundle，旁边的
+get_model_path(run_id, ".lineage.npz") 记录模型见过的动作（id / session / 标签 /
+第几次更新训练的）和各 session 训练时的 label_version。更新时：
+1. label_version 没变的 session 直接跳过
+2. 变了的 session 只读 id 和标签，与 lineage 比对出新增 / 改标的动作
+3. 只为这些动作读特征，先预测（prequential 评估）再 partial_fit
+已删除的动作无法从模型里撤销，只在 lineage 的更新历史里记数。
+"""
+import json
+import os
+import pickle
+import time
+import uuid
+from typing import Callable, Optional
+
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score, precision_score, recall_score
+from sklearn.naive_bayes import GaussianNB
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from sqlalchemy.orm import Session as DBSession
+
+from config import settings
+from services import storage
+
+INCREMENTAL_MODEL_TYPES = ("incremental_sgd", "incremental_nb")
+
+# 增量模型的类别必须在第一次 partial_fit 时给全，不能从数据里推断
+CLASSES = np.array(["bad", "good"])
+
+LINEAGE_FORMAT = 1
+
+
+def build_incremental_model(model_type: str) -> Pipeline:
+    """创建支持 partial_fit 的模型（Pipeline 的每一步都支持 partial_fit）"""
+    if model_type == "incremental_sgd":
+        return Pipeline([
+            ("scale", StandardScaler()),
+            ("clf", SGDClassifier(loss="log_loss", alpha=1e-4, random_state=42)),
+        ])
+    if model_type == "incremental_nb":
+        return Pipeline([("clf", GaussianNB())])
+    raise ValueError(f"不支持的增量模型类型: {model_type}")
+
+
+def _partial_fit(model: Pipeline, X: np.ndarray, y: np.ndarray):
+    """逐步 partial_fit：前面的变换先更新统计量再 transform，最后一步更新分类器"""
+    for _, step in model.steps[:-1]:
+        step.partial_fit(X)
+        X = step.transform(X)
+    model.steps[-1][1].partial_fit(X, y, classes=np.arange(len(CLASSES)))
+
+
+def get_lineage_path(run_id: str):
+    return storage.get_model_path(run_id, ext=".lineage.npz")
+
+
+def load_lineage(run_id: str) -> dict:
+    """
+    读取增量模型的 lineage，不存在时返回空记录
+
+    Returns:
+        {"action_ids", "session_ids", "labels", "versions", "session_versions",
+         "history", "confusion"}
+        - versions: 每个动作最近一次参与训练的更新序号（从 1 开始）
+        - session_versions: {session_id: 训练时的 label_version}
+        - history: 每次更新的 {"version", "added", "relabeled", "removed", "seconds", ...}
+        - confusion: 累计的 prequential 混淆矩阵
+    """
+    path = get_lineage_path(run_id)
+    if not path.exists():
+        return {
+            "action_ids": np.empty(0, dtype=np.int64),
+            "session_ids": np.empty(0, dtype=str),
+            "labels": np.empty(0, dtype=str),
+            "versions": np.empty(0, dtype=np.int32),
+            "session_versions": {},
+            "history": [],
+            "confusion": [[0, 0], [0, 0]],
+        }
+    with np.load(path, allow_pickle=False) as f:
+        meta = json.loads(str(f["meta"]))
+        return {
+            "action_ids": f["action_ids"],
+            "session_ids": f["session_ids"],
+            "labels": f["labels"],
+            "versions": f["versions"],
+            **meta,
+        }
+
+
+def _save_lineage(run_id: str, lineage: dict):
+    meta = {k: lineage[k] for k in ("session_versions", "history", "confusion")}
+    path = get_lineage_path(run_id)
+    tmp = path.with_suffix(f".{uuid.uuid4().hex}.part")
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            action_ids=lineage["action_ids"],
+            session_ids=lineage["session_ids"].astype(str),
+            labels=lineage["labels"].astype(str),
+            versions=lineage["versions"],
+            meta=np.array(json.dumps({"format": LINEAGE_FORMAT, **meta})),
+        )
+    os.replace(tmp, path)
+
+
+def _load_bundle(run_id: str, model_type: str) -> dict:
+    path = storage.get_model_path(run_id, ext=".pkl")
+    if path.exists():
+        with open(path, "rb") as f:
+            bundle = pickle.load(f)
+        if "incremental" in bundle:
+            return bundle
+    return {
+        "model": build_incremental_model(model_type),
+        "label_encoder": LabelEncoder().fit(CLASSES),
+        "feature_count": None,
+        "incremental": {"version": 0, "sample_count": 0},
+    }
+
+
+def _save_bundle(run_id: str, bundle: dict):
+    path = storage.get_model_path(run_id, ext=".pkl")
+    tmp = path.with_suffix(f".{uuid.uuid4().hex}.part")
+    with open(tmp, "wb") as f:
+        pickle.dump(bundle, f)
+    os.replace(tmp, path)
+
+
+def compute_delta(db: DBSession, session_ids: list[str], lineage: dict) -> dict:
+    """
+    对比当前标注与 lineage，找出需要训练的动作
+
+    Returns:
+        {"session_versions", "changed_sessions", "train_ids", "train_labels",
+         "relabeled", "removed_ids"}
+        train_ids 包含新增和改标的动作；removed_ids 为 lineage 里有、
+        但现在已删除或取消标注的动作
+    """
+    # 先读版本号再读标注：中间如有修改，记下的是旧版本号，下次更新会再比对一次
+    current_versions = storage.get_label_versions(db, session_ids)
+    seen_versions = lineage["session_versions"]
+    changed = [sid for sid in session_ids
+               if sid in current_versions and seen_versions.get(sid) != current_versions[sid]]
+
+    empty_ids = np.empty(0, dtype=np.int64)
+    if not changed:
+        return {
+            "session_versions": current_versions, "changed_sessions": [],
+            "train_ids": empty_ids, "train_session_ids": np.empty(0, dtype=str),
+            "train_labels": np.empty(0, dtype=str), "relabeled": 0, "removed_ids": empty_ids,
+        }
+
+    action_ids, action_sids, labels = storage.load_training_labels(db, changed)
+
+    # lineage 中属于这些 session 的动作
+    in_changed = np.isin(lineage["session_ids"], changed)
+    old_ids = lineage["action_ids"][in_changed]
+    old_labels = lineage["labels"][in_changed]
+
+    order = np.argsort(old_ids)
+    old_ids, old_labels = old_ids[order], old_labels[order]
+    pos = np.clip(np.searchsorted(old_ids, action_ids), 0, max(len(old_ids) - 1, 0))
+    seen = (old_ids[pos] == action_ids) if len(old_ids) else np.zeros(len(action_ids), dtype=bool)
+    relabeled = seen & (old_labels[pos] != labels) if len(old_ids) else seen
+    train = ~seen | relabeled
+
+    return {
+        "session_versions": current_versions,
+        "changed_sessions": changed,
+        "train_ids": action_ids[train],
+        "train_session_ids": action_sids[train],
+        "train_labels": labels[train],
+        "relabeled": int(relabeled.sum()),
+        "removed_ids": np.setdiff1d(old_ids, action_ids),
+    }
+
+
+def _merge_lineage(lineage: dict, delta: dict, version: int) -> dict:
+    """把本次训练的动作并入 lineage（改标的动作覆盖标签和版本），去掉已删除的动作"""
+    keep = ~np.isin(lineage["action_ids"], delta["train_ids"]) & ~np.isin(lineage["action_ids"], delta["removed_ids"])
+    return {
+        **lineage,
+        "action_ids": np.concatenate([lineage["action_ids"][keep], delta["train_ids"]]),
+        "session_ids": np.concatenate([lineage["session_ids"][keep].astype(str), delta["train_session_ids"]]),
+        "labels": np.concatenate([lineage["labels"][keep].astype(str), delta["train_labels"]]),
+        "versions": np.concatenate([
+            lineage["versions"][keep],
+            np.full(len(delta["train_ids"]), version, dtype=np.int32),
+        ]),
+    }
+
+
+def run_incremental_update(
+    db: DBSession,
+    run_id: str,
+    run: dict,
+    checkpoint: Optional[Callable[[], None]] = None,
+) -> dict:
+    """
+    执行一次增量更新（首次执行即从空模型开始训练）
+
+    delta 按 incremental_batch_size 分批：每批先用当前模型预测（模型已训练过时），
+    记入 prequential 混淆矩阵，再 partial_fit。记录里的指标是累计的 prequential
+    结果，cv_mean / cv_std 是各次更新的 prequential 准确率。
+
+    Args:
+        run: 训练记录，session_ids 为模型覆盖的全部 session
+        checkpoint: 同 run_training，计算 delta 后和每批训练前检查
+
+    Returns:
+        训练结果（同 run_training），hyperparams["incremental"] 为本次更新摘要
+    """
+    checkpoint = checkpoint or (lambda: None)
+    model_type = run["model_type"]
+    session_ids = run["session_ids"]
+
+    checkpoint()
+    start = time.perf_counter()
+    bundle = _load_bundle(run_id, model_type)
+    lineage = load_lineage(run_id)
+    delta = compute_delta(db, session_ids, lineage)
+
+    n_train = len(delta["train_ids"])
+    if n_train == 0 and bundle["incremental"]["version"] == 0:
+        raise ValueError("没有找到带特征的训练数据。请确保至少有一个 session 包含标注数据。")
+
+    model = bundle["model"]
+    le = bundle["label_encoder"]
+    confusion = np.array(lineage["confusion"], dtype=np.int64)
+    update_confusion = np.zeros_like(confusion)
+    fitted = bundle["incremental"]["version"] > 0
+
+    batch_size = settings.incremental_batch_size
+    for i in range(0, n_train, batch_size):
+        checkpoint()
+        X = storage.load_action_features(db, delta["train_ids"][i:i + batch_size]).astype(np.float64)
+        X = np.nan_to_num(X, nan=0.0)
+        if bundle["feature_count"] is None:
+            bundle["feature_count"] = X.shape[1]
+        elif X.shape[1] != bundle["feature_count"]:
+            raise ValueError(
+                f"特征维度与模型不一致: 模型 {bundle['feature_count']} 维，新数据 {X.shape[1]} 维"
+            )
+        y = le.transform(delta["train_labels"][i:i + batch_size])
+        if fitted:
+            update_confusion += confusion_matrix(y, model.predict(X), labels=np.arange(len(CLASSES)))
+        _partial_fit(model, X, y)
+        fitted = True
+
+    version = bundle["incremental"]["version"] + 1
+    lineage = _merge_lineage(lineage, delta, version)
+    confusion += update_confusion
+    evaluated = int(update_confusion.sum())
+    update_seconds = time.perf_counter() - start
+
+    lineage["session_versions"] = {
+        **lineage["session_versions"],
+        **{sid: delta["session_versions"][sid] for sid in delta["changed_sessions"]},
+    }
+    lineage["confusion"] = confusion.tolist()
+    lineage["history"] = lineage["history"] + [{
+        "version": version,
+        "changed_sessions": delta["changed_sessions"],
+        "added": n_train - delta["relabeled"],
+        "relabeled": delta["relabeled"],
+        "removed": int(len(delta["removed_ids"])),
+        "evaluated": evaluated,
+        "accuracy": float(np.trace(update_confusion) / evaluated) if evaluated else None,
+        "seconds": round(update_seconds, 3),
+    }]
+
+    bundle["incremental"] = {"version": version, "sample_count": int(len(lineage["action_ids"]))}
+    # 先写模型再写 lineage：中途失败时 lineage 落后于模型，下次更新最多重复训练一次 delta
+    checkpoint()
+    _save_bundle(run_id, bundle)
+    _save_lineage(run_id, lineage)
+
+    # 累计的 prequential 指标：把混淆矩阵还原成 (y_true, y_pred) 再算
+    y_true = np.repeat([0, 0, 1, 1], confusion.ravel())
+    y_pred = np.repeat([0, 1, 0, 1], confusion.ravel())
+    update_accs = [h["accuracy"] for h in lineage["history"] if h["accuracy"] is not None]
+    labels = lineage["labels"]
+
+    result = {
+        "run_id": run_id,
+        "status": "completed",
+        "model_type": model_type,
+        "session_ids": session_ids,
+        "dataset_snapshot": None,
+        "sample_count": int(len(labels)),
+        "good_count": int(np.sum(labels == "good")),
+        "bad_count": int(np.sum(labels == "bad")),
+        "feature_count": bundle["feature_count"],
+        "accuracy": float(accuracy_score(y_true, y_pred)) if len(y_true) else None,
+        "precision": float(precision_score(y_true, y_pred, average="weighted", zero_division=0)) if len(y_true) else None,
+        "recall": float(recall_score(y_true, y_pred, average="weighted", zero_division=0)) if len(y_true) else None,
+        "f1_score": float(f1_score(y_true, y_pred, average="weighted", zero_division=0)) if len(y_true) else None,
+        "cv_mean": float(np.mean(update_accs)) if update_accs else None,
+        "cv_std": float(np.std(update_accs)) if update_accs else None,
+        "confusion_matrix": confusion.tolist(),
+        "labels": le.classes_.tolist(),
+        "coreml_exported": False,
+        "eval_mode": "prequential",
+        "train_seconds": round(update_seconds, 3),
+        "hyperparams": {
+            **{k: v for k, v in run["hyperparams"].items() if k != "incremental"},
+            "model_type": model_type,
+            "eval_mode": "prequential",
+            "incremental": lineage["history"][-1],
+        },
+    }
+    storage.save_training_run(db, run_id, result)
+    return result
@@ -0,0 +1,124 @@
+"""
+模型注册表
+按 run_id 懒加载 models/{run_id}.pkl 里的 {model, label_encoder, feature_count} bundle，
+放进容量为 inference_cache_size 的 LRU；.pkl 被重写（增量模型更新）后按 mtime 自动重新加载。
+树模型另有编译好的 .trees.npz（见 tree_compiler），加载快、占内存少、小 batch 延迟低，
+在线推理默认用它；自动标注 / 主动学习这类大批量打分传 compiled=False 用 .pkl。
+每个项目可以部署一个训练记录，推理接口不指定 run_id 时使用项目的部署模型。
+"""
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from config import settings
+from services import storage, tree_compiler
+
+_lock = threading.Lock()
+# (run_id, 文件扩展名) → (模型文件的 mtime_ns, bundle)，最近使用的在末尾
+_cache: "OrderedDict[tuple[str, str], tuple[int, dict]]" = OrderedDict()
+
+
+def get_bundle(run_id: str, compiled: bool = True) -> Optional[dict]:
+    """
+    取模型 bundle（命中缓存直接返回，否则从模型文件加载并淘汰最久未用的）
+
+    Args:
+        compiled: 有 .trees.npz 时优先用编译后的树模型
+
+    Returns:
+        bundle，模型文件不存在时返回 None
+    """
+    loaded = get_versioned_bundle(run_id, compiled)
+    return loaded[1] if loaded else None
+
+
+def get_versioned_bundle(run_id: str, compiled: bool = True) -> Optional[tuple[int, dict]]:
+    """
+    同 get_bundle，同时返回模型版本（模型文件的 mtime_ns，增量更新重写后会变）
+
+    Returns:
+        (version, bundle)，模型文件不存在时返回 None
+    """
+    for ext in ((".trees.npz", ".pkl") if compiled else (".pkl",)):
+        path = storage.get_model_path(run_id, ext=ext)
+        try:
+            mtime = path.stat().st_mtime_ns
+            break
+        except FileNotFoundError:
+            continue
+    else:
+        return None
+
+    key = (run_id, ext)
+    with _lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == mtime:
+            _cache.move_to_end(key)
+            return cached
+
+    # 反序列化放在锁外，加载大模型时不阻塞其他模型的推理
+    if ext == ".trees.npz":
+        bundle = tree_compiler.load_bundle(path)
+    else:
+        with open(path, "rb") as f:
+            bundle = pickle.load(f)
+
+    with _lock:
+        _cache[key] = (mtime, bundle)
+        _cache.move_to_end(key)
+        while len(_cache) > settings.inference_cache_size:
+            _cache.popitem(last=False)
+    return mtime, bundle
+
+
+def cache_info() -> dict:
+    with _lock:
+        return {
+            "size": len(_cache),
+            "max_size": settings.inference_cache_size,
+            "run_ids": list(dict.fromkeys(run_id for run_id, _ in _cache)),
+            "entries": [{"run_id": run_id, "format": ext.lstrip(".")} for run_id, ext in _cache],
+        }
+
+
+def score(bundle: dict, X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    一次 predict_proba 对整个 batch 打分
+
+    Args:
+        X: (n, feature_count) 特征矩阵
+
+    Returns:
+        (classes, probabilities)，probabilities 为 (n, len(classes))，列按 classes 的顺序
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim != 2 or len(X) == 0:
+        raise ValueError("特征必须是非空的二维矩阵")
+    feature_count = bundle.get("feature_count")
+    if feature_count is not None and X.shape[1] != feature_count:
+        raise ValueError(f"特征维度与模型不一致: 模型 {feature_count} 维，输入 {X.shape[1]} 维")
+    X = np.nan_to_num(X, nan=0.0)
+
+    model = bundle["model"]
+    proba = model.predict_proba(X)
+    # 模型的类别是 LabelEncoder 编码后的整数，predict_proba 的列与 model.classes_ 对应
+    classes = bundle["label_encoder"].inverse_transform(model.classes_)
+    return classes, proba
+
+
+def predict(bundle: dict, X: np.ndarray) -> dict:
+    """
+    score 的 JSON 友好版本
+
+    Returns:
+        {"classes", "labels", "probabilities"}
+    """
+    classes, proba = score(bundle, X)
+    return {
+        "classes": classes.tolist(),
+        "labels": classes[proba.argmax(axis=1)].tolist(),
+        "probabilities": proba.tolist(),
+    }
@@ -2,99 +2,220 @@
 模型训练服务
 从 SQLite 加载数据，训练 sklearn 模型并导出 CoreML
 """
+import time
 import numpy as np
-from typing import Optional
+from typing import Callable, Optional
 from sklearn.svm import SVC
 from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import cross_val_score, StratifiedShuffleSplit
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.kernel_approximation import Nystroem
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.base import clone
+from sklearn.model_selection import cross_val_predict, cross_val_score, StratifiedKFold, StratifiedShuffleSplit
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
 from sklearn.preprocessing import LabelEncoder
 import pickle
 
 from sqlalchemy.orm import Session as DBSession
 
-from services import storage
+from config import settings
+from db.database import SessionLocal
+from services import storage, tree_compiler
 from services.feature_extractor import get_feature_names
 
 
-def _load_training_data(db: DBSession, session_ids: list[str]) -> tuple[np.ndarray, np.ndarray]:
-    """从 SQLite 加载训练数据"""
-    actions = storage.get_training_actions(db, session_ids)
+class TrainingCancelled(Exception):
+    """训练任务在阶段检查点发现已被请求取消"""
 
-    if not actions:
-        raise ValueError("没有找到可用的训练数据。请确保至少有一个 session 包含标注数据。")
 
-    all_features = []
-    all_labels = []
+def load_training_data(db: DBSession, session_ids: list[str]) -> tuple[np.ndarray, np.ndarray, str]:
+    """
+    加载训练数据（经由数据快照，session 和标注未变时直接读 .npz）
 
-    for a in actions:
-        features = a.get("features")
-        if not features or len(features) < 5:
-            continue
-        all_features.append(features)
-        all_labels.append(a["manual_quality"])
+    Returns:
+        (X, y, snapshot_id)
+    """
+    snapshot_id, X, y, _ = storage.load_training_snapshot(db, session_ids)
 
-    if not all_features:
-        raise ValueError("没有找到带特征的训练数据。")
-
-    X = np.array(all_features, dtype=np.float64)
-    y = np.array(all_labels)
+    if len(X) == 0:
+        raise ValueError("没有找到带特征的训练数据。请确保至少有一个 session 包含标注数据。")
 
+    X = X.astype(np.float64)
     X = np.nan_to_num(X, nan=0.0)
 
-    return X, y
+    return X, y, snapshot_id
 
 
-def run_training(
-    db: DBSession,
-    run_id: str,
-    session_ids: list[str],
-    model_type: str = "svm",
+# 大数据量下的替代模型：RBF SVC 的训练耗时随样本数超平方增长，RandomForest 随样本数线性增长
+# 但常数大，超过 large_dataset_threshold 时自动换成对应的可扩展模型
+SCALABLE_MODEL_TYPES = {
+    "svm": "svm_approx",
+    "random_forest": "hist_gradient_boosting",
+}
+
+
+def resolve_model_type(model_type: str, n_samples: int, scalable: Optional[bool] = None) -> str:
+    """
+    决定实际训练的模型类型
+
+    Args:
+        scalable: None = 样本数超过 settings.large_dataset_threshold 时自动切换；
+                  True = 总是切换；False = 不切换
+    """
+    if scalable is None:
+        scalable = n_samples > settings.large_dataset_threshold
+    return SCALABLE_MODEL_TYPES.get(model_type, model_type) if scalable else model_type
+
+
+# build_model 支持的模型类型（增量模型见 incremental_trainer.INCREMENTAL_MODEL_TYPES）
+MODEL_TYPES = ("svm", "decision_tree", "random_forest", "svm_approx", "hist_gradient_boosting")
+
+
+def build_model(
+    model_type: str,
     svm_c: float = 1.0,
     svm_kernel: str = "rbf",
     max_depth: Optional[int] = None,
     n_estimators: int = 100,
-) -> dict:
-    """执行训练，使用 train/test split"""
+    probability: bool = True,
+    n_samples: Optional[int] = None,
+):
+    """
+    按模型类型和超参数创建未训练的 sklearn 模型
 
-    X, y = _load_training_data(db, session_ids)
+    Args:
+        probability: SVM 是否开启概率输出（内部额外做一次 5 折校准，只算准确率时可关闭）
+        n_samples: 训练样本数，svm_approx 用它把 C 换算成 SGD 的 alpha = 1 / (C * n)
+    """
+    if model_type == "svm":
+        return SVC(C=svm_c, kernel=svm_kernel, probability=probability)
+    if model_type == "decision_tree":
+        return DecisionTreeClassifier(max_depth=max_depth)
+    if model_type == "random_forest":
+        return RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth)
+    if model_type == "svm_approx":
+        # Nystroem 近似核映射 + 线性 SVM（modified_huber 损失，可输出概率），训练耗时随样本数线性增长
+        alpha = 1.0 / (svm_c * n_samples) if n_samples else 1e-4
+        n_components = min(settings.nystroem_components, n_samples or settings.nystroem_components)
+        return Pipeline([
+            ("scale", StandardScaler()),
+            ("kernel", Nystroem(kernel=svm_kernel, n_components=n_components, random_state=42)),
+            ("clf", SGDClassifier(loss="modified_huber", alpha=alpha, early_stopping=True, random_state=42)),
+        ])
+    if model_type == "hist_gradient_boosting":
+        # 特征分箱后的梯度提升树，n_estimators 对应迭代轮数
+        return Pipeline([
+            ("clf", HistGradientBoostingClassifier(max_depth=max_depth, max_iter=n_estimators, random_state=42)),
+        ])
+    raise ValueError(f"不支持的模型类型: {model_type}")
 
-    le = LabelEncoder()
-    y_encoded = le.fit_transform(y)
 
-    # 创建模型
-    if model_type == "svm":
-        model = SVC(C=svm_c, kernel=svm_kernel, probability=True)
-    elif model_type == "decision_tree":
-        model = DecisionTreeClassifier(max_depth=max_depth)
-    elif model_type == "random_forest":
-        model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth)
-    else:
-        raise ValueError(f"不支持的模型类型: {model_type}")
+EVAL_MODES = ("full", "fast")
+
+
+def _evaluate_holdout(model, X: np.ndarray, y: np.ndarray, checkpoint: Callable[[], None]):
+    """
+    full 模式：k 折交叉验证打分 + 80/20 划分上训练并在 test set 上预测
 
-    # 交叉验证
+    Returns:
+        (cv_scores, y_true, y_pred)
+    """
+    checkpoint()
     cv_folds = min(5, len(X))
     if cv_folds >= 2:
-        cv_scores = cross_val_score(model, X, y_encoded, cv=cv_folds, scoring='accuracy')
+        cv_scores = cross_val_score(model, X, y, cv=cv_folds, scoring='accuracy')
     else:
         cv_scores = np.array([0.0])
 
     # Train/Test split (80/20)
     if len(X) >= 10:
         sss = StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
-        train_idx, test_idx = next(sss.split(X, y_encoded))
+        train_idx, test_idx = next(sss.split(X, y))
         X_train, X_test = X[train_idx], X[test_idx]
-        y_train, y_test = y_encoded[train_idx], y_encoded[test_idx]
+        y_train, y_test = y[train_idx], y[test_idx]
     else:
         X_train, X_test = X, X
-        y_train, y_test = y_encoded, y_encoded
+        y_train, y_test = y, y
 
-    # 训练
-    model.fit(X_train, y_train)
+    checkpoint()
+    holdout = clone(model).fit(X_train, y_train)
+    return cv_scores, y_test, holdout.predict(X_test)
+
+
+def _evaluate_out_of_fold(model, X: np.ndarray, y: np.ndarray, checkpoint: Callable[[], None]):
+    """
+    fast 模式：k 折并行训练，每个样本由没见过它的那一折模型预测（out-of-fold），
+    所有指标都从这一组预测得出，不再单独做 80/20 训练
+
+    Returns:
+        (cv_scores, y_true, y_pred)，cv_scores 为每一折的准确率
+    """
+    checkpoint()
+    cv_folds = min(5, len(X))
+    if cv_folds < 2:
+        fitted = clone(model).fit(X, y)
+        return np.array([0.0]), y, fitted.predict(X)
+
+    skf = StratifiedKFold(n_splits=cv_folds)
+    y_pred = cross_val_predict(model, X, y, cv=skf, n_jobs=settings.train_n_jobs)
+    cv_scores = np.array([accuracy_score(y[test], y_pred[test]) for _, test in skf.split(X, y)])
+    return cv_scores, y, y_pred
+
+
+def run_training(
+    db: DBSession,
+    run_id: str,
+    session_ids: list[str],
+    model_type: str = "svm",
+    svm_c: float = 1.0,
+    svm_kernel: str = "rbf",
+    max_depth: Optional[int] = None,
+    n_estimators: int = 100,
+    checkpoint: Optional[Callable[[], None]] = None,
+    dataset: Optional[tuple[np.ndarray, np.ndarray, str]] = None,
+    eval_mode: str = "full",
+    scalable: Optional[bool] = None,
+) -> dict:
+    """
+    执行训练：评估 + 全量数据训练最终模型
+
+    Args:
+        eval_mode: full = 交叉验证 + 80/20 划分评估（原流程）；
+                   fast = 交叉验证的 out-of-fold 预测算全部指标（n_jobs 并行），
+                   之后只做一次全量训练
+        scalable: 是否换成可扩展模型，见 resolve_model_type；实际训练的类型记在结果的 model_type
+        checkpoint: 每个阶段（加载、交叉验证、训练、全量重训）开始前调用，
+                    抛出 TrainingCancelled 即中止，不写模型文件和训练记录
+        dataset: 已加载好的 (X, y, snapshot_id)，不传时按 session_ids 加载
+    """
+    checkpoint = checkpoint or (lambda: None)
+
+    checkpoint()
+    X, y, snapshot_id = dataset if dataset is not None else load_training_data(db, session_ids)
+
+    le = LabelEncoder()
+    y_encoded = le.fit_transform(y)
+
+    # 创建模型
+    requested_model_type = model_type
+    model_type = resolve_model_type(model_type, len(X), scalable)
+    model = build_model(model_type, svm_c, svm_kernel, max_depth, n_estimators, n_samples=len(X))
+
+    # 评估
+    start = time.perf_counter()
+    if eval_mode == "full":
+        cv_scores, y_test, y_pred = _evaluate_holdout(model, X, y_encoded, checkpoint)
+    elif eval_mode == "fast":
+        # 评估用的折内模型只需要 predict，SVM 关闭概率校准（否则每折内部再做 5 折）
+        cv_model = build_model(
+            model_type, svm_c, svm_kernel, max_depth, n_estimators, probability=False, n_samples=len(X)
+        )
+        cv_scores, y_test, y_pred = _evaluate_out_of_fold(cv_model, X, y_encoded, checkpoint)
+    else:
+        raise ValueError(f"不支持的评估方式: {eval_mode}")
 
-    # 在 test set 上评估
-    y_pred = model.predict(X_test)
     acc = float(accuracy_score(y_test, y_pred))
     prec = float(precision_score(y_test, y_pred, average='weighted', zero_division=0))
     rec = float(recall_score(y_test, y_pred, average='weighted', zero_division=0))
@@ -102,12 +223,20 @@ def run_training(
     cm = confusion_matrix(y_test, y_pred).tolist()
 
     # 用全量数据重新训练最终模型（用于导出）
+    checkpoint()
     model.fit(X, y_encoded)
+    train_seconds = time.perf_counter() - start
 
     # 保存 sklearn 模型 (pickle)
     pkl_path = storage.get_model_path(run_id, ext=".pkl")
     with open(pkl_path, 'wb') as f:
         pickle.dump({"model": model, "label_encoder": le, "feature_count": X.shape[1]}, f)
+    # 树模型另存一份展平后的数组，在线推理用（见 tree_compiler）
+    trees_path = storage.get_model_path(run_id, ext=".trees.npz")
+    if tree_compiler.is_compilable(model):
+        tree_compiler.save(trees_path, model, le, X.shape[1])
+    else:
+        trees_path.unlink(missing_ok=True)
 
     # 尝试导出 CoreML
     coreml_exported = False
@@ -130,6 +259,7 @@ def run_training(
         "status": "completed",
         "model_type": model_type,
         "session_ids": session_ids,
+        "dataset_snapshot": snapshot_id,
         "sample_count": len(X),
         "good_count": int(np.sum(y == 'good')),
         "bad_count": int(np.sum(y == 'bad')),
@@ -143,14 +273,73 @@ def run_training(
         "confusion_matrix": cm,
         "labels": le.classes_.tolist(),
         "coreml_exported": coreml_exported,
+        "eval_mode": eval_mode,
+        "train_seconds": round(train_seconds, 3),
         "hyperparams": {
             "model_type": model_type,
             "svm_c": svm_c,
             "svm_kernel": svm_kernel,
             "max_depth": max_depth,
             "n_estimators": n_estimators,
+            "eval_mode": eval_mode,
+            "requested_model_type": requested_model_type,
+            "scalable": scalable,
         }
     }
     storage.save_training_run(db, run_id, result)
 
     return result
+
+
+def run_training_job(run_id: str) -> str:
+    """
+    进程池入口：按训练记录里的参数执行一个排队中的训练任务
+
+    在子进程里自建数据库 session，结束时把 completed / failed / cancelled
+    写回 training_runs。
+
+    Returns:
+        任务的最终状态
+    """
+    db = SessionLocal()
+    try:
+        run = storage.get_training_run(db, run_id)
+        params = run["hyperparams"]
+
+        def checkpoint():
+            if storage.is_training_cancel_requested(db, run_id):
+                raise TrainingCancelled(run_id)
+
+        try:
+            if "search" in params:
+                # 超参数搜索任务（延迟导入，hyperparam_search 依赖本模块）
+                from services.hyperparam_search import run_search
+                run_search(db, run_id, run, checkpoint)
+            elif run["model_type"].startswith("incremental_"):
+                from services.incremental_trainer import run_incremental_update
+                run_incremental_update(db, run_id, run, checkpoint)
+            else:
+                run_training(
+                    db=db,
+                    run_id=run_id,
+                    session_ids=run["session_ids"],
+                    model_type=run["model_type"],
+                    svm_c=params.get("svm_c", 1.0),
+                    svm_kernel=params.get("svm_kernel", "rbf"),
+                    max_depth=params.get("max_depth"),
+                    n_estimators=params.get("n_estimators", 100),
+                    checkpoint=checkpoint,
+                    eval_mode=params.get("eval_mode", "full"),
+                    scalable=params.get("scalable"),
+                )
+            return "completed"
+        except TrainingCancelled:
+            db.rollback()
+            storage.finish_training_run(db, run_id, "cancelled")
+            return "cancelled"
+        except Exception as e:
+            db.rollback()
+            storage.finish_training_run(db, run_id, "failed", error=str(e))
+            return "failed"
+    finally:
+        db.close()
@@ -2,15 +2,26 @@
 存储服务 - SQLite + 文件系统
 结构化数据用 SQLite，CSV/模型文件用文件系统
 """
+import base64
+import hashlib
+import json
+import os
 import shutil
+import uuid
+from collections import Counter
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 from typing import Optional
 
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, delete, func, insert, or_, select, tuple_, update
 from sqlalchemy.orm import Session as DBSession
 
 from config import settings
-from db.models import Project, Session, Action, TrainingRun
+from db.models import Project, Session, Action, TrainingRun, LabelJob, ExportJob, FEATURE_DTYPE, pack_features, unpack_features
+from services.csv_parser import TimeIndex
 
 
 def _ensure_file_dirs():
@@ -18,34 +29,94 @@ def _ensure_file_dirs():
     base = Path(settings.data_dir)
     (base / "csv_files").mkdir(parents=True, exist_ok=True)
     (base / "models").mkdir(parents=True, exist_ok=True)
+    (base / "uploads").mkdir(parents=True, exist_ok=True)
+    (base / "imu").mkdir(parents=True, exist_ok=True)
+    (base / "datasets").mkdir(parents=True, exist_ok=True)
+
+
+# ---- Keyset 分页 ----
+# 游标是上一页最后一行排序键的编码（base64url JSON），下一页从该键之后开始，
+# 配合排序列上的索引，翻到第几页都只扫描 limit 行。
+
+def _encode_cursor(values: list) -> str:
+    plain = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(plain).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, order_cols: list) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(order_cols):
+            raise ValueError
+        return [
+            datetime.fromisoformat(v) if col.type.python_type is datetime else v
+            for v, col in zip(values, order_cols)
+        ]
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _keyset_page(query, order_cols: list, limit: int, after: Optional[str]) -> tuple[list, Optional[str]]:
+    """
+    按 order_cols 升序取一页
+
+    Returns:
+        (ORM 对象列表, 下一页游标；没有下一页时为 None)
+    """
+    if after:
+        query = query.filter(tuple_(*order_cols) > tuple_(*_decode_cursor(after, order_cols)))
+    rows = query.order_by(*order_cols).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, _encode_cursor([getattr(last, col.key) for col in order_cols])
 
 
 # ---- Projects ----
 
 def list_projects(db: DBSession) -> list[dict]:
-    projects = db.query(Project).order_by(Project.created_at).all()
-    result = []
-    for p in projects:
-        result.append({
-            "id": p.id,
-            "name": p.name,
-            "description": p.description,
-            "created_at": p.created_at.isoformat() if p.created_at else "",
-            "session_count": len(p.sessions),
-        })
-    return result
+    counts = _session_counts_subquery()
+    rows = (
+        db.query(Project, func.coalesce(counts.c.session_count, 0))
+        .outerjoin(counts, counts.c.project_id == Project.id)
+        .order_by(Project.created_at)
+        .all()
+    )
+    return [_project_to_dict(p, session_count) for p, session_count in rows]
 
 
 def get_project(db: DBSession, project_id: str) -> Optional[dict]:
-    p = db.query(Project).filter(Project.id == project_id).first()
-    if not p:
+    counts = _session_counts_subquery()
+    row = (
+        db.query(Project, func.coalesce(counts.c.session_count, 0))
+        .outerjoin(counts, counts.c.project_id == Project.id)
+        .filter(Project.id == project_id)
+        .first()
+    )
+    if not row:
         return None
+    return _project_to_dict(*row)
+
+
+def _session_counts_subquery():
+    """每个 project 的 session 数（一次 GROUP BY，避免逐个 lazy-load p.sessions）"""
+    return (
+        select(Session.project_id, func.count(Session.id).label("session_count"))
+        .group_by(Session.project_id)
+        .subquery()
+    )
+
+
+def _project_to_dict(p: Project, session_count: int) -> dict:
     return {
         "id": p.id,
         "name": p.name,
         "description": p.description,
         "created_at": p.created_at.isoformat() if p.created_at else "",
-        "session_count": len(p.sessions),
+        "session_count": session_count,
+        "deployed_run_id": p.deployed_run_id,
     }
 
 
@@ -62,6 +133,19 @@ def create_project(db: DBSession, project_id: str, name: str, description: str =
     }
 
 
+def set_deployed_run(db: DBSession, project_id: str, run_id: Optional[str]) -> bool:
+    """设置项目的部署模型（None 为取消部署），项目不存在时返回 False"""
+    updated = db.execute(
+        update(Project).where(Project.id == project_id).values(deployed_run_id=run_id)
+    ).rowcount
+    db.commit()
+    return bool(updated)
+
+
+def get_deployed_run_id(db: DBSession, project_id: str) -> Optional[str]:
+    return db.execute(select(Project.deployed_run_id).where(Project.id == project_id)).scalar()
+
+
 def delete_project(db: DBSession, project_id: str) -> bool:
     p = db.query(Project).filter(Project.id == project_id).first()
     if p:
@@ -74,11 +158,31 @@ def delete_project(db: DBSession, project_id: str) -> bool:
 # ---- Sessions ----
 
 def list_sessions(db: DBSession, project_id: Optional[str] = None) -> list[dict]:
+    sessions = _sessions_query(db, project_id).order_by(Session.created_at, Session.id).all()
+    return [_session_to_dict(s) for s in sessions]
+
+
+def page_sessions(
+    db: DBSession, project_id: Optional[str] = None, limit: int = 200, after: Optional[str] = None
+) -> tuple[list[dict], Optional[str]]:
+    sessions, next_cursor = _keyset_page(
+        _sessions_query(db, project_id), [Session.created_at, Session.id], limit, after
+    )
+    return [_session_to_dict(s) for s in sessions], next_cursor
+
+
+def count_sessions(db: DBSession, project_id: Optional[str] = None) -> int:
+    query = db.query(func.count(Session.id))
+    if project_id:
+        query = query.filter(Session.project_id == project_id)
+    return query.scalar() or 0
+
+
+def _sessions_query(db: DBSession, project_id: Optional[str]):
     query = db.query(Session)
     if project_id:
         query = query.filter(Session.project_id == project_id)
-    sessions = query.order_by(Session.created_at).all()
-    return [_session_to_dict(s) for s in sessions]
+    return query
 
 
 def get_session(db: DBSession, session_id: str) -> Optional[dict]:
@@ -120,6 +224,9 @@ def delete_session(db: DBSession, session_id: str) -> bool:
     csv_dir = Path(settings.data_dir) / "csv_files" / session_id
     if csv_dir.exists():
         shutil.rmtree(csv_dir)
+    imu_dir = Path(settings.data_dir) / "imu" / session_id
+    if imu_dir.exists():
+        shutil.rmtree(imu_dir)
     return True
 
 
@@ -134,6 +241,7 @@ def _session_to_dict(s: Session) -> dict:
         "good_count": s.good_count,
         "bad_count": s.bad_count,
         "unlabeled_count": s.unlabeled_count,
+        "label_version": s.label_version or 0,
         "created_at": s.created_at.isoformat() if s.created_at else "",
     }
 
@@ -141,87 +249,391 @@ def _session_to_dict(s: Session) -> dict:
 # ---- Actions ----
 
 def save_actions(db: DBSession, session_id: str, actions_data: list[dict]):
-    """批量保存动作数据（从 feedback CSV 解析）"""
+    """
+    批量保存动作数据（从 feedback CSV 解析）
+
+    删除旧 actions 和插入新 actions 在同一事务内完成，插入用一条
+    Core insert() 走 executemany，不为每行构造 ORM 对象。
+    """
+    rows = [
+        {
+            "session_id": session_id,
+            "action_index": a["action_index"],
+            "t_peak": a["t_peak"],
+            "t_start": a["t_start"],
+            "t_end": a["t_end"],
+            "ml_classification": a.get("ml_classification", ""),
+            "ml_quality": a.get("ml_quality", ""),
+            "manual_quality": a.get("manual_quality", "unlabeled"),
+            "features_blob": pack_features(a.get("features")),
+            "is_deleted": False,
+        }
+        for a in actions_data
+    ]
+
     # 先删除该 session 的旧 actions
-    db.query(Action).filter(Action.session_id == session_id).delete()
-
-    for a in actions_data:
-        action = Action(
-            session_id=session_id,
-            action_index=a["action_index"],
-            t_peak=a["t_peak"],
-            t_start=a["t_start"],
-            t_end=a["t_end"],
-            ml_classification=a.get("ml_classification", ""),
-            ml_quality=a.get("ml_quality", ""),
-            manual_quality=a.get("manual_quality", "unlabeled"),
-            features=a.get("features"),
-            is_deleted=False,
-        )
-        db.add(action)
+    db.execute(delete(Action).where(Action.session_id == session_id))
+    if rows:
+        db.execute(insert(Action.__table__), rows)
+    _bump_label_versions(db, [session_id])
     db.commit()
 
 
 def list_actions(db: DBSession, session_id: str, include_deleted: bool = False) -> list[dict]:
+    actions = _actions_query(db, session_id, include_deleted).order_by(Action.action_index, Action.id).all()
+    return [_action_to_dict(a) for a in actions]
+
+
+def page_actions(
+    db: DBSession, session_id: str, include_deleted: bool = False,
+    limit: int = 200, after: Optional[str] = None,
+) -> tuple[list[dict], Optional[str]]:
+    actions, next_cursor = _keyset_page(
+        _actions_query(db, session_id, include_deleted), [Action.action_index, Action.id], limit, after
+    )
+    return [_action_to_dict(a) for a in actions], next_cursor
+
+
+def count_actions(db: DBSession, session_id: str, include_deleted: bool = False) -> int:
+    query = db.query(func.count(Action.id)).filter(Action.session_id == session_id)
+    if not include_deleted:
+        query = query.filter(Action.is_deleted == False)
+    return query.scalar() or 0
+
+
+def _actions_query(db: DBSession, session_id: str, include_deleted: bool):
     query = db.query(Action).filter(Action.session_id == session_id)
     if not include_deleted:
         query = query.filter(Action.is_deleted == False)
-    actions = query.order_by(Action.action_index).all()
-    return [_action_to_dict(a) for a in actions]
+    return query
+
+
+def get_actions_by_ids(db: DBSession, action_ids: list[int]) -> list[dict]:
+    """按给定顺序取一批动作，不存在的跳过"""
+    actions = {}
+    for i in range(0, len(action_ids), 900):
+        actions.update((a.id, a) for a in db.query(Action).filter(Action.id.in_(action_ids[i:i + 900])).all())
+    return [_action_to_dict(actions[i]) for i in action_ids if i in actions]
+
+
+def get_action_session_ids(db: DBSession, action_ids: list[int]) -> dict[int, str]:
+    """{action_id: session_id}，不存在的动作不出现在结果里"""
+    result = {}
+    for i in range(0, len(action_ids), 900):
+        result.update(db.execute(
+            select(Action.id, Action.session_id).where(Action.id.in_(action_ids[i:i + 900]))
+        ).all())
+    return result
 
 
 def update_action(db: DBSession, action_id: int, updates: dict):
-    a = db.query(Action).filter(Action.id == action_id).first()
+    """更新单个动作，session 计数按增量在同一事务内调整"""
+    a = db.get(Action, action_id)
     if a:
+        old_bucket = _count_bucket(a.manual_quality, a.is_deleted)
         for key, val in updates.items():
             if hasattr(a, key):
                 setattr(a, key, val)
+        new_bucket = _count_bucket(a.manual_quality, a.is_deleted)
+        if old_bucket != new_bucket:
+            delta = Counter()
+            delta[old_bucket] -= 1
+            delta[new_bucket] += 1
+            _apply_count_deltas(db, {a.session_id: delta})
+        _bump_label_versions(db, [a.session_id])
         db.commit()
 
 
 def soft_delete_actions(db: DBSession, action_ids: list[int]):
-    db.query(Action).filter(Action.id.in_(action_ids)).update(
-        {"is_deleted": True}, synchronize_session="fetch"
-    )
-    db.commit()
+    _set_deleted(db, action_ids, True)
 
 
 def restore_actions(db: DBSession, action_ids: list[int]):
-    db.query(Action).filter(Action.id.in_(action_ids)).update(
-        {"is_deleted": False}, synchronize_session="fetch"
-    )
+    _set_deleted(db, action_ids, False)
+
+
+def _set_deleted(db: DBSession, action_ids: list[int], is_deleted: bool):
+    """批量删除/恢复：只统计状态真正改变的行，把差量加到各 session 的计数上"""
+    # 去重后分块：重复 id 跨块会被重复计数；SQLite 旧版本单条语句最多 999 个参数
+    action_ids = list(dict.fromkeys(action_ids))
+    deltas: dict[str, Counter] = {}
+    sign = -1 if is_deleted else 1
+    for i in range(0, len(action_ids), 900):
+        changed = db.execute(
+            select(Action.session_id, Action.manual_quality, func.count())
+            .where(Action.id.in_(action_ids[i:i + 900]), Action.is_deleted == (not is_deleted))
+            .group_by(Action.session_id, Action.manual_quality)
+        ).all()
+        for session_id, quality, n in changed:
+            deltas.setdefault(session_id, Counter())[_count_bucket(quality, False)] += sign * n
+
+    for i in range(0, len(action_ids), 900):
+        db.query(Action).filter(Action.id.in_(action_ids[i:i + 900])).update(
+            {"is_deleted": is_deleted}, synchronize_session="fetch"
+        )
+    _apply_count_deltas(db, deltas)
+    _bump_label_versions(db, list(deltas))
+    db.commit()
+
+
+def bulk_update_actions(db: DBSession, session_id: str, changes: list[dict]) -> int:
+    """
+    批量修改一个 session 内动作的 manual_quality / is_deleted
+
+    按目标值分组，每个取值一条 UPDATE ... WHERE id IN (...)，全部改完后重算一次
+    session 计数，整个过程一个事务。
+
+    Args:
+        changes: [{"action_id": 1, "manual_quality": "good", "is_deleted": False}, ...]，
+                 两个字段都可省略（None 表示不改）
+
+    Returns:
+        涉及的动作数
+    """
+    by_field: dict[str, dict] = {"manual_quality": {}, "is_deleted": {}}
+    touched = set()
+    for change in changes:
+        for field, groups in by_field.items():
+            value = change.get(field)
+            if value is not None:
+                groups.setdefault(value, []).append(change["action_id"])
+                touched.add(change["action_id"])
+
+    for field, groups in by_field.items():
+        for value, ids in groups.items():
+            # SQLite 旧版本单条语句最多 999 个参数
+            for i in range(0, len(ids), 900):
+                db.execute(
+                    update(Action)
+                    .where(Action.session_id == session_id, Action.id.in_(ids[i:i + 900]))
+                    .values({field: value})
+                )
+
+    _recount_session(db, session_id)
+    if touched:
+        _bump_label_versions(db, [session_id])
     db.commit()
+    return len(touched)
 
 
-def get_training_actions(db: DBSession, session_ids: list[str]) -> list[dict]:
-    """获取训练用的 actions（排除 deleted 和 unlabeled）"""
-    actions = (
-        db.query(Action)
-        .filter(
+def _count_bucket(manual_quality: Optional[str], is_deleted: bool) -> Optional[str]:
+    """动作计入 session 的哪个计数：good / bad / unlabeled，已删除的不计"""
+    if is_deleted:
+        return None
+    return manual_quality if manual_quality in ("good", "bad") else "unlabeled"
+
+
+def _apply_count_deltas(db: DBSession, deltas: dict[str, Counter]):
+    """把 {session_id: {bucket: 差量}} 以 col = col + n 的形式写回 sessions（不提交）"""
+    for session_id, delta in deltas.items():
+        values = {}
+        active = sum(n for bucket, n in delta.items() if bucket is not None)
+        if active:
+            values["action_count"] = Session.action_count + active
+        for bucket, n in delta.items():
+            if bucket is not None and n:
+                col = f"{bucket}_count"
+                values[col] = getattr(Session, col) + n
+        if values:
+            db.execute(update(Session).where(Session.id == session_id).values(**values))
+
+
+def _bump_label_versions(db: DBSession, session_ids: list[str]):
+    """动作有修改的 session，label_version + 1（不提交）"""
+    if session_ids:
+        db.execute(
+            update(Session)
+            .where(Session.id.in_(session_ids))
+            .values(label_version=Session.label_version + 1)
+        )
+
+
+def load_training_matrix(
+    db: DBSession, session_ids: list[str], min_features: int = 5
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    一条 Core SELECT 直接把训练数据读成 ndarray，不经过 ORM 对象和 dict
+
+    只取未删除、manual_quality 为 good / bad、带特征的动作，按 session、action_index 排序；
+    特征少于 min_features 维的行跳过。
+
+    Returns:
+        (X, y, action_ids)
+        - X: (n, d) float32，由 BLOB 拼接后 np.frombuffer 得到
+        - y: (n,) manual_quality 字符串
+        - action_ids: (n,) int64
+    """
+    stmt = (
+        select(Action.id, Action.manual_quality, Action.features_blob)
+        .where(
             Action.session_id.in_(session_ids),
             Action.is_deleted == False,
             Action.manual_quality.in_(["good", "bad"]),
         )
         .order_by(Action.session_id, Action.action_index)
-        .all()
     )
-    return [_action_to_dict(a) for a in actions]
+    rows = db.execute(stmt).all()
+
+    min_bytes = min_features * FEATURE_DTYPE.itemsize
+    rows = [r for r in rows if r.features_blob is not None and len(r.features_blob) >= min_bytes]
+    if not rows:
+        return (
+            np.empty((0, 0), dtype=FEATURE_DTYPE),
+            np.empty(0, dtype=object),
+            np.empty(0, dtype=np.int64),
+        )
 
+    width = len(rows[0].features_blob)
+    if any(len(r.features_blob) != width for r in rows):
+        raise ValueError("训练数据的特征维度不一致，请检查上传的 feedback CSV。")
 
-def update_session_counts(db: DBSession, session_id: str):
-    """重新计算 session 的 good/bad/unlabeled 数量"""
-    s = db.query(Session).filter(Session.id == session_id).first()
-    if not s:
-        return
-    active_actions = db.query(Action).filter(
-        Action.session_id == session_id,
-        Action.is_deleted == False,
+    X = np.frombuffer(b"".join(r.features_blob for r in rows), dtype=FEATURE_DTYPE)
+    X = X.reshape(len(rows), width // FEATURE_DTYPE.itemsize)
+    y = np.array([r.manual_quality for r in rows])
+    action_ids = np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows))
+    return X, y, action_ids
+
+
+# ---- 训练数据快照 ----
+# 快照按 (session_id, label_version) 列表的哈希定名，写入后不再修改：
+# session 选择和标注都没变时，重复训练/搜索直接读同一个 .npz，不再查询 actions。
+
+SNAPSHOT_FORMAT = 1
+
+
+def get_label_versions(db: DBSession, session_ids: list[str]) -> dict[str, int]:
+    """{session_id: label_version}，不存在的 session 不出现在结果里"""
+    return dict(db.execute(
+        select(Session.id, Session.label_version).where(Session.id.in_(session_ids))
+    ).all())
+
+
+def _label_versions(db: DBSession, session_ids: list[str]) -> list[list]:
+    versions = get_label_versions(db, session_ids)
+    return [[sid, versions.get(sid)] for sid in sorted(set(session_ids))]
+
+
+def _snapshot_id(label_versions: list[list]) -> str:
+    payload = json.dumps({"format": SNAPSHOT_FORMAT, "sessions": label_versions})
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def get_snapshot_path(snapshot_id: str) -> Path:
+    _ensure_file_dirs()
+    return Path(settings.data_dir) / "datasets" / f"{snapshot_id}.npz"
+
+
+def load_training_snapshot(
+    db: DBSession, session_ids: list[str]
+) -> tuple[str, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    读取（不存在则生成）训练数据快照
+
+    生成时先后读取 label_version 和训练矩阵，两次之间如有标注修改则重读，
+    保证快照内容与它的 id 对应。
+
+    Returns:
+        (snapshot_id, X, y, action_ids)，X / y / action_ids 同 load_training_matrix
+    """
+    versions = _label_versions(db, session_ids)
+    path = get_snapshot_path(_snapshot_id(versions))
+    while not path.exists():
+        X, y, action_ids = load_training_matrix(db, session_ids)
+        current = _label_versions(db, session_ids)
+        if current != versions:
+            versions = current
+            path = get_snapshot_path(_snapshot_id(versions))
+            continue
+        tmp = path.with_suffix(f".{uuid.uuid4().hex}.part")
+        with open(tmp, "wb") as f:
+            np.savez(f, X=X, y=y.astype(str), action_ids=action_ids)
+        os.replace(tmp, path)
+        return path.stem, X, y, action_ids
+
+    with np.load(path, allow_pickle=False) as f:
+        return path.stem, f["X"], f["y"].astype(object), f["action_ids"]
+
+
+def load_snapshot(snapshot_id: str) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """
+    按 id 读取已有的数据快照
+
+    Returns:
+        (X, y)，快照不存在时返回 None
+    """
+    path = get_snapshot_path(snapshot_id)
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as f:
+        return f["X"], f["y"].astype(object)
+
+
+def load_training_labels(
+    db: DBSession, session_ids: list[str], min_features: int = 5
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    只读训练样本的 id / session / 标签，不读特征（筛选条件同 load_training_matrix）
+
+    Returns:
+        (action_ids, action_session_ids, y)
+    """
+    rows = db.execute(
+        select(Action.id, Action.session_id, Action.manual_quality)
+        .where(
+            Action.session_id.in_(session_ids),
+            Action.is_deleted == False,
+            Action.manual_quality.in_(["good", "bad"]),
+            func.length(Action.features_blob) >= min_features * FEATURE_DTYPE.itemsize,
+        )
+        .order_by(Action.session_id, Action.action_index)
     ).all()
-    s.action_count = len(active_actions)
-    s.good_count = sum(1 for a in active_actions if a.manual_quality == "good")
-    s.bad_count = sum(1 for a in active_actions if a.manual_quality == "bad")
-    s.unlabeled_count = sum(1 for a in active_actions if a.manual_quality not in ("good", "bad"))
-    db.commit()
+    action_ids = np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows))
+    return action_ids, np.array([r.session_id for r in rows], dtype=str), np.array([r.manual_quality for r in rows])
+
+
+def load_action_features(db: DBSession, action_ids) -> np.ndarray:
+    """
+    按给定顺序读取一批动作的特征
+
+    Returns:
+        (len(action_ids), d) float32
+    """
+    blobs = {}
+    ids = [int(i) for i in action_ids]
+    # SQLite 旧版本单条语句最多 999 个参数
+    for i in range(0, len(ids), 900):
+        blobs.update(db.execute(
+            select(Action.id, Action.features_blob).where(Action.id.in_(ids[i:i + 900]))
+        ).all())
+    missing = [i for i in ids if blobs.get(i) is None]
+    if missing:
+        raise ValueError(f"动作不存在或没有特征: {', '.join(map(str, missing[:10]))}")
+    if not ids:
+        return np.empty((0, 0), dtype=FEATURE_DTYPE)
+    X = np.frombuffer(b"".join(blobs[i] for i in ids), dtype=FEATURE_DTYPE)
+    return X.reshape(len(ids), -1)
+
+
+def _recount_session(db: DBSession, session_id: str):
+    """用 GROUP BY 聚合重算 session 计数（不提交）"""
+    rows = db.execute(
+        select(Action.manual_quality, func.count())
+        .where(Action.session_id == session_id, Action.is_deleted == False)
+        .group_by(Action.manual_quality)
+    ).all()
+    counts = Counter()
+    for quality, n in rows:
+        counts[_count_bucket(quality, False)] += n
+    db.execute(
+        update(Session)
+        .where(Session.id == session_id)
+        .values(
+            action_count=sum(counts.values()),
+            good_count=counts["good"],
+            bad_count=counts["bad"],
+            unlabeled_count=counts["unlabeled"],
+        )
+    )
 
 
 def _action_to_dict(a: Action) -> dict:
@@ -234,41 +646,186 @@ def _action_to_dict(a: Action) -> dict:
         "t_end": a.t_end,
         "ml_classification": a.ml_classification or "",
         "ml_quality": a.ml_quality or "",
+        "ml_confidence": a.ml_confidence,
         "manual_quality": a.manual_quality or "unlabeled",
-        "features": a.features,
+        "features": unpack_features(a.features_blob),
         "is_deleted": a.is_deleted,
     }
 
 
 # ---- Training Runs ----
 
-def save_training_run(db: DBSession, run_id: str, data: dict):
-    run = TrainingRun(
+def create_training_run(db: DBSession, run_id: str, data: dict):
+    """
+    新建一条 pending 训练记录（进入训练队列）
+
+    Args:
+        data: {"project_id", "model_type", "session_ids", "hyperparams"}
+    """
+    db.add(TrainingRun(
         id=run_id,
         project_id=data.get("project_id") or None,
         model_type=data["model_type"],
         hyperparameters=data.get("hyperparams", {}),
         session_ids=data.get("session_ids", []),
-        sample_count=data.get("sample_count", 0),
-        good_count=data.get("good_count", 0),
-        bad_count=data.get("bad_count", 0),
-        feature_count=data.get("feature_count", 40),
-        accuracy=data.get("accuracy"),
-        precision=data.get("precision"),
-        recall=data.get("recall"),
-        f1_score=data.get("f1_score"),
-        cv_mean=data.get("cv_mean"),
-        cv_std=data.get("cv_std"),
-        confusion_matrix=data.get("confusion_matrix"),
-        labels=data.get("labels"),
-        status=data.get("status", "completed"),
-        coreml_exported=data.get("coreml_exported", False),
-        completed_at=datetime.utcnow(),
-    )
+        status="pending",
+    ))
+    db.commit()
+
+
+def save_training_run(db: DBSession, run_id: str, data: dict):
+    """写入训练结果；记录已存在（队列中的任务）时原地更新"""
+    run = db.get(TrainingRun, run_id) or TrainingRun(id=run_id)
+    run.project_id = data.get("project_id") or run.project_id
+    run.model_type = data["model_type"]
+    run.hyperparameters = data.get("hyperparams", {})
+    run.session_ids = data.get("session_ids", [])
+    run.sample_count = data.get("sample_count", 0)
+    run.good_count = data.get("good_count", 0)
+    run.bad_count = data.get("bad_count", 0)
+    run.feature_count = data.get("feature_count", 40)
+    run.accuracy = data.get("accuracy")
+    run.precision = data.get("precision")
+    run.recall = data.get("recall")
+    run.f1_score = data.get("f1_score")
+    run.cv_mean = data.get("cv_mean")
+    run.cv_std = data.get("cv_std")
+    run.confusion_matrix = data.get("confusion_matrix")
+    run.labels = data.get("labels")
+    run.dataset_snapshot = data.get("dataset_snapshot")
+    run.status = data.get("status", "completed")
+    run.coreml_exported = data.get("coreml_exported", False)
+    run.eval_mode = data.get("eval_mode")
+    run.train_seconds = data.get("train_seconds")
+    run.completed_at = datetime.utcnow()
     db.add(run)
     db.commit()
 
 
+def claim_next_training_run(db: DBSession) -> Optional[str]:
+    """
+    取队首的 pending 任务并置为 training
+
+    用带状态条件的 UPDATE 抢占，多个调度方同时取也不会重复执行。
+
+    Returns:
+        抢到的 run_id，队列为空时返回 None
+    """
+    while True:
+        run_id = db.execute(
+            select(TrainingRun.id)
+            .where(TrainingRun.status == "pending")
+            .order_by(TrainingRun.created_at, TrainingRun.id)
+            .limit(1)
+        ).scalar()
+        if run_id is None:
+            return None
+        claimed = db.execute(
+            update(TrainingRun)
+            .where(TrainingRun.id == run_id, TrainingRun.status == "pending")
+            .values(status="training", started_at=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        if claimed:
+            return run_id
+
+
+def finish_training_run(db: DBSession, run_id: str, status: str, error: Optional[str] = None):
+    """把训练任务标记为结束状态（failed / cancelled），completed 由 save_training_run 写入"""
+    db.execute(
+        update(TrainingRun)
+        .where(TrainingRun.id == run_id)
+        .values(status=status, error=error, completed_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+def cancel_training_run(db: DBSession, run_id: str) -> Optional[str]:
+    """
+    取消训练任务
+
+    pending 任务直接置为 cancelled；training 任务只打取消标记，由训练进程在
+    阶段之间检查后自行退出。
+
+    Returns:
+        取消后的状态，任务不存在时返回 None
+    """
+    cancelled = db.execute(
+        update(TrainingRun)
+        .where(TrainingRun.id == run_id, TrainingRun.status == "pending")
+        .values(status="cancelled", cancel_requested=True, completed_at=datetime.utcnow())
+    ).rowcount
+    if not cancelled:
+        db.execute(
+            update(TrainingRun)
+            .where(TrainingRun.id == run_id, TrainingRun.status == "training")
+            .values(cancel_requested=True)
+        )
+    db.commit()
+    run = db.get(TrainingRun, run_id)
+    if run is None:
+        return None
+    db.refresh(run)
+    return run.status
+
+
+def is_training_cancel_requested(db: DBSession, run_id: str) -> bool:
+    return bool(db.execute(
+        select(TrainingRun.cancel_requested).where(TrainingRun.id == run_id)
+    ).scalar())
+
+
+def requeue_interrupted_training_runs(db: DBSession) -> int:
+    """
+    服务重启后把上次未跑完的 training 任务放回队列（已请求取消的直接置为 cancelled）
+
+    Returns:
+        重新入队的任务数
+    """
+    now = datetime.utcnow()
+    db.execute(
+        update(TrainingRun)
+        .where(TrainingRun.status == "training", TrainingRun.cancel_requested == True)
+        .values(status="cancelled", completed_at=now)
+    )
+    requeued = db.execute(
+        update(TrainingRun)
+        .where(TrainingRun.status == "training")
+        .values(status="pending", started_at=None)
+    ).rowcount
+    db.commit()
+    return requeued
+
+
+def oldest_pending_jobs(db: DBSession) -> dict[str, Optional[datetime]]:
+    """
+    训练、自动标注、精简导出任务各自队首的创建时间（共用进程池槽位时按先到先得调度）
+
+    Returns:
+        {"training": created_at 或 None, "label": ..., "export": ...}
+    """
+    return {
+        "training": db.execute(select(func.min(TrainingRun.created_at)).where(TrainingRun.status == "pending")).scalar(),
+        "label": db.execute(select(func.min(LabelJob.created_at)).where(LabelJob.status == "pending")).scalar(),
+        "export": db.execute(select(func.min(ExportJob.created_at)).where(ExportJob.status == "pending")).scalar(),
+    }
+
+
+def training_queue_position(db: DBSession, run_id: str) -> Optional[int]:
+    """pending 任务前面还有几个 pending 任务（从 0 开始），非 pending 返回 None"""
+    run = db.get(TrainingRun, run_id)
+    if run is None or run.status != "pending":
+        return None
+    return db.execute(
+        select(func.count())
+        .select_from(TrainingRun)
+        .where(
+            TrainingRun.status == "pending",
+            tuple_(TrainingRun.created_at, TrainingRun.id) < tuple_(run.created_at, run.id),
+        )
+    ).scalar()
+
+
 def get_training_run(db: DBSession, run_id: str) -> Optional[dict]:
     r = db.query(TrainingRun).filter(TrainingRun.id == run_id).first()
     if not r:
@@ -276,18 +833,112 @@ def get_training_run(db: DBSession, run_id: str) -> Optional[dict]:
     return _run_to_dict(r)
 
 
-def list_training_runs(db: DBSession) -> list[dict]:
-    runs = db.query(TrainingRun).order_by(TrainingRun.created_at).all()
+def page_training_runs(
+    db: DBSession, limit: int = 200, after: Optional[str] = None
+) -> tuple[list[dict], Optional[str]]:
+    runs, next_cursor = _keyset_page(
+        db.query(TrainingRun).filter(TrainingRun.parent_run_id.is_(None)),
+        [TrainingRun.created_at, TrainingRun.id], limit, after,
+    )
+    return [_run_to_dict(r) for r in runs], next_cursor
+
+
+def latest_completed_run_id(db: DBSession) -> Optional[str]:
+    """最近完成的顶层训练记录"""
+    return db.execute(
+        select(TrainingRun.id)
+        .where(TrainingRun.status == "completed", TrainingRun.parent_run_id.is_(None))
+        .order_by(TrainingRun.completed_at.desc(), TrainingRun.id.desc())
+        .limit(1)
+    ).scalar()
+
+
+def count_training_runs(db: DBSession) -> int:
+    return db.query(func.count(TrainingRun.id)).filter(TrainingRun.parent_run_id.is_(None)).scalar() or 0
+
+
+def save_search_candidates(db: DBSession, parent_run_id: str, candidates: list[dict]):
+    """
+    批量写入超参数搜索的候选记录
+
+    Args:
+        candidates: [{"run_id", "model_type", "hyperparams", "sample_count", "cv_mean", "cv_std"}, ...]
+    """
+    parent = db.get(TrainingRun, parent_run_id)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": c["run_id"],
+            "project_id": parent.project_id,
+            "parent_run_id": parent_run_id,
+            "model_type": c["model_type"],
+            "hyperparameters": c["hyperparams"],
+            "session_ids": parent.session_ids,
+            "dataset_snapshot": c.get("dataset_snapshot"),
+            "sample_count": c["sample_count"],
+            "cv_mean": c["cv_mean"],
+            "cv_std": c["cv_std"],
+            "status": "completed",
+            "started_at": parent.started_at,
+            "completed_at": now,
+            "created_at": now,
+        }
+        for c in candidates
+    ]
+    if rows:
+        db.execute(insert(TrainingRun.__table__), rows)
+    db.commit()
+
+
+def list_search_candidates(db: DBSession, parent_run_id: str) -> list[dict]:
+    """搜索任务的全部候选记录，按交叉验证得分从高到低"""
+    runs = (
+        db.query(TrainingRun)
+        .filter(TrainingRun.parent_run_id == parent_run_id)
+        .order_by(TrainingRun.cv_mean.desc(), TrainingRun.id)
+        .all()
+    )
     return [_run_to_dict(r) for r in runs]
 
 
+def requeue_training_run(db: DBSession, run_id: str, session_ids: Optional[list[str]] = None) -> bool:
+    """
+    已结束的训练任务重新入队（增量模型更新用），可同时追加 session
+
+    Returns:
+        是否入队成功（pending / training 中的任务不能重复入队）
+    """
+    run = db.get(TrainingRun, run_id)
+    if run is None or run.status in ("pending", "training"):
+        return False
+    run.session_ids = list(dict.fromkeys((run.session_ids or []) + (session_ids or [])))
+    run.status = "pending"
+    run.error = None
+    run.cancel_requested = False
+    run.created_at = datetime.utcnow()
+    db.commit()
+    return True
+
+
+def update_training_run_hyperparams(db: DBSession, run_id: str, hyperparams: dict):
+    db.execute(update(TrainingRun).where(TrainingRun.id == run_id).values(hyperparameters=hyperparams))
+    db.commit()
+
+
+def save_compact_export(db: DBSession, run_id: str, report: dict):
+    db.execute(update(TrainingRun).where(TrainingRun.id == run_id).values(compact_export=report))
+    db.commit()
+
+
 def _run_to_dict(r: TrainingRun) -> dict:
     return {
         "run_id": r.id,
         "project_id": r.project_id or "",
+        "parent_run_id": r.parent_run_id,
         "status": r.status,
         "model_type": r.model_type,
         "session_ids": r.session_ids or [],
+        "dataset_snapshot": r.dataset_snapshot,
         "sample_count": r.sample_count,
         "good_count": r.good_count,
         "bad_count": r.bad_count,
@@ -301,18 +952,299 @@ def _run_to_dict(r: TrainingRun) -> dict:
         "confusion_matrix": r.confusion_matrix,
         "labels": r.labels,
         "coreml_exported": r.coreml_exported,
+        "eval_mode": r.eval_mode,
+        "train_seconds": r.train_seconds,
+        "compact_export": r.compact_export,
         "hyperparams": r.hyperparameters or {},
+        "error": r.error,
         "created_at": r.created_at.isoformat() if r.created_at else "",
+        "started_at": r.started_at.isoformat() if r.started_at else "",
+        "completed_at": r.completed_at.isoformat() if r.completed_at else "",
+    }
+
+
+# ---- 自动标注任务 ----
+
+def _unlabeled_filter(session_ids: list[str]):
+    return (
+        Action.session_id.in_(session_ids),
+        Action.is_deleted == False,
+        or_(Action.manual_quality.is_(None), Action.manual_quality.not_in(["good", "bad"])),
+    )
+
+
+def load_unlabeled_matrix(
+    db: DBSession, session_ids: list[str], min_features: int = 5, chunk_rows: int = 50_000
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    把未标注、未删除动作的特征读成一个矩阵（特征少于 min_features 维的跳过）
+
+    按 chunk_rows 分批取行，BLOB 直接追加到一个 bytearray，不构造 ORM 对象，
+    几十万行时内存里只多一份原始字节。
+
+    Returns:
+        (X, action_ids)，X 为 (n, d) float32
+    """
+    stmt = (
+        select(Action.id, Action.features_blob)
+        .where(
+            *_unlabeled_filter(session_ids),
+            func.length(Action.features_blob) >= min_features * FEATURE_DTYPE.itemsize,
+        )
+        .order_by(Action.id)
+        .execution_options(yield_per=chunk_rows)
+    )
+    buf = bytearray()
+    ids = []
+    width = None
+    for partition in db.execute(stmt).partitions():
+        for action_id, blob in partition:
+            if width is None:
+                width = len(blob)
+            elif len(blob) != width:
+                raise ValueError("未标注动作的特征维度不一致，请检查上传的 feedback CSV。")
+            buf += blob
+            ids.append(action_id)
+    if not ids:
+        return np.empty((0, 0), dtype=FEATURE_DTYPE), np.empty(0, dtype=np.int64)
+    X = np.frombuffer(bytes(buf), dtype=FEATURE_DTYPE).reshape(len(ids), width // FEATURE_DTYPE.itemsize)
+    return X, np.array(ids, dtype=np.int64)
+
+
+def create_label_job(db: DBSession, job_id: str, data: dict) -> dict:
+    """
+    新建一条 pending 自动标注任务
+
+    Args:
+        data: {"project_id", "run_id", "session_ids"}
+    """
+    job = LabelJob(
+        id=job_id,
+        project_id=data.get("project_id") or None,
+        run_id=data["run_id"],
+        session_ids=data.get("session_ids", []),
+        status="pending",
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return _label_job_to_dict(job)
+
+
+def claim_label_job(db: DBSession, job_id: str) -> bool:
+    """pending → running，已被其他进程领取或不存在时返回 False"""
+    claimed = db.execute(
+        update(LabelJob)
+        .where(LabelJob.id == job_id, LabelJob.status == "pending")
+        .values(status="running", started_at=datetime.utcnow(), processed=0, good_count=0, bad_count=0)
+    ).rowcount
+    db.commit()
+    return bool(claimed)
+
+
+def set_label_job_total(db: DBSession, job_id: str, total: int):
+    db.execute(update(LabelJob).where(LabelJob.id == job_id).values(total=total))
+    db.commit()
+
+
+def write_ml_labels(
+    db: DBSession, job_id: str, run_id: str, action_ids, labels, confidences
+):
+    """
+    写回一批自动标注结果并推进任务进度（同一个事务）
+
+    一条 UPDATE ... WHERE id = ? 用 executemany 执行整批参数，SQLite 只编译一次语句。
+    """
+    table = Action.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(ml_quality=bindparam("b_quality"), ml_confidence=bindparam("b_confidence"), ml_run_id=run_id),
+        [
+            {"b_id": int(i), "b_quality": str(q), "b_confidence": float(c)}
+            for i, q, c in zip(action_ids, labels, confidences)
+        ],
+    )
+    labels = np.asarray(labels)
+    db.execute(
+        update(LabelJob)
+        .where(LabelJob.id == job_id)
+        .values(
+            processed=LabelJob.processed + len(labels),
+            good_count=LabelJob.good_count + int(np.sum(labels == "good")),
+            bad_count=LabelJob.bad_count + int(np.sum(labels == "bad")),
+        )
+    )
+    db.commit()
+
+
+def finish_label_job(db: DBSession, job_id: str, status: str, error: Optional[str] = None):
+    db.execute(
+        update(LabelJob)
+        .where(LabelJob.id == job_id)
+        .values(status=status, error=error, completed_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+def claim_next_label_job(db: DBSession) -> Optional[str]:
+    """
+    取最早的 pending 自动标注任务并置为 running（抢占方式同 claim_next_training_run）
+
+    Returns:
+        抢到的 job_id，没有 pending 任务时返回 None
+    """
+    while True:
+        job_id = db.execute(
+            select(LabelJob.id)
+            .where(LabelJob.status == "pending")
+            .order_by(LabelJob.created_at, LabelJob.id)
+            .limit(1)
+        ).scalar()
+        if job_id is None:
+            return None
+        if claim_label_job(db, job_id):
+            return job_id
+
+
+def requeue_interrupted_label_jobs(db: DBSession) -> int:
+    """
+    服务重启后把上次没跑完的 running 任务放回 pending（已写回的批次重跑时会被覆盖）
+
+    Returns:
+        重新入队的任务数
+    """
+    requeued = db.execute(
+        update(LabelJob).where(LabelJob.status == "running").values(status="pending", started_at=None)
+    ).rowcount
+    db.commit()
+    return requeued
+
+
+def get_label_job(db: DBSession, job_id: str) -> Optional[dict]:
+    job = db.get(LabelJob, job_id)
+    return _label_job_to_dict(job) if job else None
+
+
+def _label_job_to_dict(job: LabelJob) -> dict:
+    return {
+        "job_id": job.id,
+        "project_id": job.project_id or "",
+        "run_id": job.run_id,
+        "session_ids": job.session_ids or [],
+        "status": job.status,
+        "total": job.total or 0,
+        "processed": job.processed or 0,
+        "progress": (job.processed or 0) / job.total if job.total else (1.0 if job.status == "completed" else 0.0),
+        "good_count": job.good_count or 0,
+        "bad_count": job.bad_count or 0,
+        "error": job.error,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "created_at": job.created_at.isoformat() if job.created_at else "",
+    }
+
+
+def create_export_job(db: DBSession, job_id: str, run_id: str, budget: dict) -> dict:
+    """
+    新建一条 pending 精简导出任务
+
+    Args:
+        budget: {"max_bytes", "max_nodes", "student"}
+    """
+    job = ExportJob(id=job_id, run_id=run_id, budget=budget, status="pending")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return _export_job_to_dict(job)
+
+
+def claim_next_export_job(db: DBSession) -> Optional[str]:
+    """
+    取最早的 pending 精简导出任务并置为 running（抢占方式同 claim_next_training_run）
+
+    Returns:
+        抢到的 job_id，没有 pending 任务时返回 None
+    """
+    while True:
+        job_id = db.execute(
+            select(ExportJob.id)
+            .where(ExportJob.status == "pending")
+            .order_by(ExportJob.created_at, ExportJob.id)
+            .limit(1)
+        ).scalar()
+        if job_id is None:
+            return None
+        claimed = db.execute(
+            update(ExportJob)
+            .where(ExportJob.id == job_id, ExportJob.status == "pending")
+            .values(status="running", started_at=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        if claimed:
+            return job_id
+
+
+def finish_export_job(
+    db: DBSession, job_id: str, status: str, error: Optional[str] = None, report: Optional[dict] = None,
+):
+    db.execute(
+        update(ExportJob)
+        .where(ExportJob.id == job_id)
+        .values(status=status, error=error, report=report, completed_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+def requeue_interrupted_export_jobs(db: DBSession) -> int:
+    """
+    服务重启后把上次没跑完的 running 任务放回 pending（重跑时覆盖导出文件）
+
+    Returns:
+        重新入队的任务数
+    """
+    requeued = db.execute(
+        update(ExportJob).where(ExportJob.status == "running").values(status="pending", started_at=None)
+    ).rowcount
+    db.commit()
+    return requeued
+
+
+def get_export_job(db: DBSession, job_id: str) -> Optional[dict]:
+    job = db.get(ExportJob, job_id)
+    return _export_job_to_dict(job) if job else None
+
+
+def _export_job_to_dict(job: ExportJob) -> dict:
+    return {
+        "job_id": job.id,
+        "run_id": job.run_id,
+        "budget": job.budget or {},
+        "status": job.status,
+        "report": job.report,
+        "error": job.error,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "created_at": job.created_at.isoformat() if job.created_at else "",
     }
 
 
 # ---- CSV 文件操作（仍用文件系统）----
 
-def save_csv(session_id: str, filename: str, content: str):
+def new_upload_path(suffix: str = ".csv") -> Path:
+    """上传过程中的临时文件路径，解析完成后用 store_csv_file 移到 session 目录"""
+    _ensure_file_dirs()
+    return Path(settings.data_dir) / "uploads" / f"{uuid.uuid4().hex}{suffix}"
+
+
+def store_csv_file(session_id: str, filename: str, src: Path) -> Path:
+    """把已写好的 CSV 文件移动到 session 目录（同一文件系统内为原子 rename）"""
     _ensure_file_dirs()
     csv_dir = Path(settings.data_dir) / "csv_files" / session_id
     csv_dir.mkdir(parents=True, exist_ok=True)
-    (csv_dir / filename).write_text(content, encoding="utf-8")
+    dest = csv_dir / filename
+    os.replace(src, dest)
+    return dest
 
 
 def load_csv(session_id: str, filename: str) -> Optional[str]:
@@ -322,6 +1254,125 @@ def load_csv(session_id: str, filename: str) -> Optional[str]:
     return None
 
 
+# ---- Raw IMU 列式存储（每列一个 .npy）----
+
+# 时间列保留 float64（unix 时间戳用 float32 只有百秒级精度），传感器通道用 float32
+RAW_TIME_COLUMNS = ["time", "seconds_elapsed"]
+RAW_SENSOR_COLUMNS = [
+    "userAccelX", "userAccelY", "userAccelZ",
+    "rotationRateX", "rotationRateY", "rotationRateZ",
+    "accMag", "gyroMag",
+]
+
+
+class RawColumnWriter:
+    """
+    把分块解析的 raw IMU 数据逐块追加成列式文件。
+
+    每列先追加写到 .part 文件，finalize 时补上 .npy 头并移到 imu/{session_id}/，
+    整个过程内存占用只和单个块有关。
+    """
+
+    def __init__(self):
+        self.tmp_dir = new_upload_path(suffix=".imu")
+        self.tmp_dir.mkdir(parents=True)
+        self.rows = 0
+        self.dtypes: dict[str, np.dtype] = {}
+
+    def append(self, chunk: pd.DataFrame):
+        if not self.dtypes:
+            for col in RAW_TIME_COLUMNS:
+                if col in chunk.columns:
+                    self.dtypes[col] = np.dtype(np.float64)
+            for col in RAW_SENSOR_COLUMNS:
+                if col in chunk.columns:
+                    self.dtypes[col] = np.dtype(np.float32)
+        for col, dtype in self.dtypes.items():
+            with open(self.tmp_dir / f"{col}.part", "ab") as f:
+                f.write(chunk[col].to_numpy(dtype=dtype).tobytes())
+        self.rows += len(chunk)
+
+    def finalize(self, session_id: str) -> Path:
+        for col, dtype in self.dtypes.items():
+            part = self.tmp_dir / f"{col}.part"
+            with open(self.tmp_dir / f"{col}.npy", "wb") as out:
+                np.lib.format.write_array_header_1_0(out, {
+                    "descr": np.lib.format.dtype_to_descr(dtype),
+                    "fortran_order": False,
+                    "shape": (self.rows,),
+                })
+                with open(part, "rb") as src:
+                    shutil.copyfileobj(src, out)
+            part.unlink()
+
+        dest = Path(settings.data_dir) / "imu" / session_id
+        if dest.exists():
+            shutil.rmtree(dest)
+        os.replace(self.tmp_dir, dest)
+        return dest
+
+    def discard(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def has_raw_columns(session_id: str) -> bool:
+    return (Path(settings.data_dir) / "imu" / session_id / "time.npy").exists()
+
+
+def load_raw_columns(session_id: str, columns: Optional[list[str]] = None) -> Optional[dict[str, np.ndarray]]:
+    """
+    以 mmap 方式读取 raw IMU 列，只有实际访问到的页才会从磁盘读入
+
+    Args:
+        session_id: session ID
+        columns: 需要的列，None 表示全部
+
+    Returns:
+        {列名: 只读 ndarray}，该 session 没有列式数据时返回 None
+    """
+    imu_dir = Path(settings.data_dir) / "imu" / session_id
+    if not (imu_dir / "time.npy").exists():
+        return None
+    if columns is None:
+        columns = [p.stem for p in sorted(imu_dir.glob("*.npy"))]
+    return {
+        col: np.load(imu_dir / f"{col}.npy", mmap_mode="r")
+        for col in columns
+        if (imu_dir / f"{col}.npy").exists()
+    }
+
+
+def load_time_index(session_id: str) -> Optional[TimeIndex]:
+    """
+    获取 session 的 TimeIndex（基于 mmap 的 time 列）
+
+    按 (session_id, 文件 mtime) 缓存，同一 session 只检查一次有序性，
+    重新上传后 mtime 变化会自动重建。
+    """
+    path = Path(settings.data_dir) / "imu" / session_id / "time.npy"
+    if not path.exists():
+        return None
+    return _cached_time_index(str(path), path.stat().st_mtime_ns)
+
+
+@lru_cache(maxsize=64)
+def _cached_time_index(path: str, mtime_ns: int) -> TimeIndex:
+    return TimeIndex(np.load(path, mmap_mode="r"))
+
+
+def write_raw_columns(session_id: str, chunks) -> int:
+    """从 raw CSV 块迭代器生成列式数据（用于回填已有 session），返回行数"""
+    writer = RawColumnWriter()
+    try:
+        for chunk in chunks:
+            writer.append(chunk)
+        writer.finalize(session_id)
+    except Exception:
+        writer.discard()
+        raise
+    return writer.rows
+
+
 # ---- 模型文件操作（仍用文件系统）----
 
 def get_model_path(run_id: str, ext: str = ".mlmodel") -> Path:
@@ -348,20 +1399,28 @@ def save_chat_message(db: DBSession, conversation_id: str, role: str, content: s
     return _chat_message_to_dict(msg)
 
 
-def list_chat_messages(db: DBSession, conversation_id: str) -> list[dict]:
-    messages = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.conversation_id == conversation_id)
-        .order_by(ChatMessage.created_at)
-        .all()
+def page_chat_messages(
+    db: DBSession, conversation_id: str, limit: int = 200, after: Optional[str] = None
+) -> tuple[list[dict], Optional[str]]:
+    messages, next_cursor = _keyset_page(
+        db.query(ChatMessage).filter(ChatMessage.conversation_id == conversation_id),
+        [ChatMessage.created_at, ChatMessage.id], limit, after,
     )
-    return [_chat_message_to_dict(m) for m in messages]
+    return [_chat_message_to_dict(m) for m in messages], next_cursor
+
+
+def count_chat_messages(db: DBSession, conversation_id: str) -> int:
+    return (
+        db.query(func.count(ChatMessage.id))
+        .filter(ChatMessage.conversation_id == conversation_id)
+        .scalar()
+    ) or 0
 
 
 def list_conversations(db: DBSession, limit: int = 20) -> list[dict]:
-    from sqlalchemy import func
-    results = (
-        db.query(
+    """最近的对话列表，标题取每个对话的第一条用户消息（一条查询完成）"""
+    recent = (
+        select(
             ChatMessage.conversation_id,
             func.max(ChatMessage.created_at).label("last_active"),
             func.count(ChatMessage.id).label("message_count"),
@@ -369,27 +1428,40 @@ def list_conversations(db: DBSession, limit: int = 20) -> list[dict]:
         .group_by(ChatMessage.conversation_id)
         .order_by(func.max(ChatMessage.created_at).desc())
         .limit(limit)
-        .all()
+        .subquery()
     )
-    convs = []
-    for r in results:
-        # 获取该对话的第一条用户消息作为标题
-        first_user_msg = (
-            db.query(ChatMessage.content)
-            .filter(
-                ChatMessage.conversation_id == r.conversation_id,
-                ChatMessage.role == "user",
-            )
-            .order_by(ChatMessage.created_at)
-            .first()
+    # id 自增且与 created_at 同序，最小 id 即第一条用户消息
+    first_user = (
+        select(
+            ChatMessage.conversation_id,
+            func.min(ChatMessage.id).label("first_id"),
+        )
+        .where(ChatMessage.role == "user")
+        .group_by(ChatMessage.conversation_id)
+        .subquery()
+    )
+    results = db.execute(
+        select(
+            recent.c.conversation_id,
+            recent.c.last_active,
+            recent.c.message_count,
+            ChatMessage.content,
         )
-        convs.append({
+        .select_from(recent)
+        .outerjoin(first_user, first_user.c.conversation_id == recent.c.conversation_id)
+        .outerjoin(ChatMessage, ChatMessage.id == first_user.c.first_id)
+        .order_by(recent.c.last_active.desc())
+    ).all()
+
+    return [
+        {
             "conversation_id": r.conversation_id,
             "last_active": r.last_active.isoformat() if r.last_active else "",
             "message_count": r.message_count,
-            "first_message": first_user_msg[0] if first_user_msg else "",
-        })
-    return convs
+            "first_message": r.content or "",
+        }
+        for r in results
+    ]
 
 
 def _chat_message_to_dict(m: ChatMessage) -> dict:
@@ -0,0 +1,220 @@
+"""
+后台训练任务调度
+
+training_runs 表就是持久化队列：/api/training/start 只插入一条 pending 记录，
+调度器按创建时间把 pending 任务交给进程池执行，同时运行的任务数不超过
+settings.training_slots。任务结束后由训练进程把状态写回数据库，调度器再取下一个。
+服务重启时上次没跑完的 training 任务会重新放回队列。
+
+自动标注任务（label_jobs 表）和手表精简导出任务（export_jobs 表）也是 CPU 密集的，
+与训练任务共用同一个进程池和同一组槽位，几个队列按创建时间先到先得；
+子进程异常退出时由完成回调把任务记为 failed。
+"""
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Optional
+
+from config import settings
+from db.database import SessionLocal
+from services import storage, workers
+from services.auto_labeler import run_label_job
+from services.compact_exporter import run_export_job
+from services.model_trainer import run_training_job
+
+# 调度和完成回调可能在不同线程，完成回调里还会再次调度，用可重入锁
+_lock = threading.RLock()
+_running: dict[str, Future] = {}
+_running_label_jobs: dict[str, Future] = {}
+_running_export_jobs: dict[str, Future] = {}
+_stopping = False
+
+
+def start():
+    """应用启动时调用：恢复中断的任务并开始调度"""
+    global _stopping
+    _stopping = False
+    db = SessionLocal()
+    try:
+        requeued = storage.requeue_interrupted_training_runs(db)
+        requeued_label_jobs = storage.requeue_interrupted_label_jobs(db)
+        requeued_export_jobs = storage.requeue_interrupted_export_jobs(db)
+    finally:
+        db.close()
+    if requeued:
+        print(f"[Training] Requeued {requeued} interrupted run(s)")
+    if requeued_label_jobs:
+        print(f"[AutoLabel] Requeued {requeued_label_jobs} interrupted job(s)")
+    if requeued_export_jobs:
+        print(f"[CompactExport] Requeued {requeued_export_jobs} interrupted job(s)")
+    dispatch()
+
+
+def stop():
+    """应用退出时调用：停止调度，运行中的任务下次启动时重新入队"""
+    global _stopping
+    _stopping = True
+    workers.shutdown()
+
+
+def submit(run_id: str, data: dict):
+    """
+    新任务入队并尝试立即调度
+
+    Args:
+        data: 训练参数，见 storage.create_training_run
+    """
+    db = SessionLocal()
+    try:
+        storage.create_training_run(db, run_id, data)
+    finally:
+        db.close()
+    dispatch()
+
+
+def submit_label_job(job_id: str, data: dict) -> dict:
+    """
+    自动标注任务入队并尝试立即调度
+
+    Args:
+        data: 见 storage.create_label_job
+    """
+    db = SessionLocal()
+    try:
+        job = storage.create_label_job(db, job_id, data)
+    finally:
+        db.close()
+    dispatch()
+    return job
+
+
+def submit_export_job(job_id: str, run_id: str, budget: dict) -> dict:
+    """
+    精简导出任务入队并尝试立即调度
+
+    Args:
+        budget: {"max_bytes", "max_nodes", "student"}，见 compact_exporter.export_compact
+    """
+    db = SessionLocal()
+    try:
+        job = storage.create_export_job(db, job_id, run_id, budget)
+    finally:
+        db.close()
+    dispatch()
+    return job
+
+
+def resubmit(run_id: str, session_ids: Optional[list[str]] = None) -> bool:
+    """
+    已结束的任务重新入队（增量模型更新），可追加 session
+
+    Returns:
+        是否入队成功，任务仍在排队或训练中时返回 False
+    """
+    db = SessionLocal()
+    try:
+        requeued = storage.requeue_training_run(db, run_id, session_ids)
+    finally:
+        db.close()
+    if requeued:
+        dispatch()
+    return requeued
+
+
+def cancel(run_id: str) -> Optional[str]:
+    """
+    取消任务（pending 立即取消，training 在下一个阶段检查点退出）
+
+    Returns:
+        取消后的状态，任务不存在时返回 None
+    """
+    db = SessionLocal()
+    try:
+        return storage.cancel_training_run(db, run_id)
+    finally:
+        db.close()
+
+
+def running_run_ids() -> list[str]:
+    with _lock:
+        return list(_running)
+
+
+def _running_count() -> int:
+    return len(_running) + len(_running_label_jobs) + len(_running_export_jobs)
+
+
+def dispatch():
+    """在空闲槽位上启动队首的 pending 任务（训练、自动标注、精简导出按创建时间先到先得）"""
+    with _lock:
+        if _stopping:
+            return
+        db = SessionLocal()
+        try:
+            while _running_count() < settings.training_slots:
+                heads = storage.oldest_pending_jobs(db)
+                pending = [kind for kind, created in heads.items() if created is not None]
+                if not pending:
+                    break
+                kind = min(pending, key=lambda k: heads[k])
+                if kind == "training":
+                    claim, target, running, on_done = storage.claim_next_training_run, run_training_job, _running, _on_done
+                elif kind == "label":
+                    claim, target, running, on_done = (
+                        storage.claim_next_label_job, run_label_job, _running_label_jobs, _on_label_job_done
+                    )
+                else:
+                    claim, target, running, on_done = (
+                        storage.claim_next_export_job, run_export_job, _running_export_jobs, _on_export_job_done
+                    )
+                job_id = claim(db)
+                if job_id is None:
+                    continue
+                future = workers.get_process_pool().submit(target, job_id)
+                running[job_id] = future
+                future.add_done_callback(partial(on_done, job_id))
+        finally:
+            db.close()
+
+
+def _failure(future: Future) -> Optional[BaseException]:
+    """子进程里没接住的异常（含进程池损坏）；进程池损坏时重建"""
+    exc = None if future.cancelled() else future.exception()
+    if isinstance(exc, BrokenProcessPool):
+        workers.shutdown()
+    return exc
+
+
+def _finish(running: dict[str, Future], finish, job_id: str, future: Future):
+    """
+    任务结束：释放槽位；子进程异常退出时任务入口来不及写状态，这里补记为 failed，再调度下一个
+
+    Args:
+        finish: storage.finish_training_run / finish_label_job / finish_export_job
+    """
+    with _lock:
+        running.pop(job_id, None)
+    if _stopping:
+        return
+
+    exc = _failure(future)
+    if exc is not None:
+        db = SessionLocal()
+        try:
+            finish(db, job_id, "failed", error=str(exc) or type(exc).__name__)
+        finally:
+            db.close()
+    dispatch()
+
+
+def _on_done(run_id: str, future: Future):
+    _finish(_running, storage.finish_training_run, run_id, future)
+
+
+def _on_label_job_done(job_id: str, future: Future):
+    _finish(_running_label_jobs, storage.finish_label_job, job_id, future)
+
+
+def _on_export_job_done(job_id: str, future: Future):
+    _finish(_running_export_jobs, storage.finish_export_job, job_id, future)
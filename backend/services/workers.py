@@ -0,0 +1,41 @@
+"""
+阻塞任务的执行池
+
+路由里的同步 SQLAlchemy / pandas 调用交给 FastAPI 的线程池（普通 def 路由或
+run_in_threadpool），这里只负责设置线程池上限；CPU 密集的训练放到独立的进程池
+（由 services/training_queue.py 调度），避免占住 GIL 拖慢同一个 uvicorn worker
+上的其他请求。
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import anyio.to_thread
+
+from config import settings
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def configure_threadpool():
+    """设置 run_in_threadpool / 同步路由共用的线程数上限"""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_workers
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """懒创建 CPU 任务进程池（spawn 启动，不继承父进程的数据库连接）"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.training_slots,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+def shutdown():
+    """关闭进程池（应用退出时调用）"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
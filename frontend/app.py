@@ -30,6 +30,21 @@ def api_get(path):
         return None
 
 
+def api_get_all(path, key):
+    """按 next_cursor 翻页取回完整列表，返回结构与单页相同"""
+    items, after = [], None
+    while True:
+        sep = "&" if "?" in path else "?"
+        page = api_get(f"{path}{sep}limit=1000" + (f"&after={after}" if after else ""))
+        if page is None:
+            return None
+        items.extend(page.get(key, []))
+        after = page.get("next_cursor")
+        if not after:
+            page[key] = items
+            return page
+
+
 # 检查后端连接
 health = api_get("/health")
 if health:
@@ -54,7 +69,7 @@ with col1:
 
 with col2:
     st.subheader(t("sessions"))
-    sessions_data = api_get("/api/sessions/list")
+    sessions_data = api_get_all("/api/sessions/list", "sessions")
     if sessions_data and sessions_data.get("sessions"):
         for s in sessions_data["sessions"]:
             with st.container(border=True):
@@ -41,6 +41,12 @@ TRANSLATIONS = {
     "existing_projects": {"zh": "现有项目", "en": "Existing Projects"},
     "no_projects_create": {"zh": "还没有项目，在上面创建一个吧！", "en": "No projects yet. Create one above!"},
     "view_sessions": {"zh": "查看 Sessions", "en": "View Sessions"},
+    "deployed_model": {"zh": "部署模型", "en": "Deployed model"},
+    "not_deployed": {"zh": "未部署", "en": "Not deployed"},
+    "deploy_model": {"zh": "设置部署模型", "en": "Set deployed model"},
+    "deploy_btn": {"zh": "保存", "en": "Save"},
+    "auto_label_btn": {"zh": "用部署模型自动标注未标注动作", "en": "Auto-label unlabeled actions with deployed model"},
+    "auto_label_done": {"zh": "自动标注完成：Good {good}，Bad {bad}", "en": "Auto-labeling done: Good {good}, Bad {bad}"},
 
     # ---- DataPipeline ----
     "pipeline_title": {"zh": "📤 数据准备 Pipeline", "en": "📤 Data Preparation Pipeline"},
@@ -74,6 +80,12 @@ TRANSLATIONS = {
     "peak_time": {"zh": "峰值时间", "en": "Peak Time"},
     "quality": {"zh": "质量", "en": "Quality"},
     "ml_pred": {"zh": "ML预测", "en": "ML Pred"},
+    "al_queue": {"zh": "主动学习标注队列（按模型不确定度排序）", "en": "Active-learning queue (ranked by model uncertainty)"},
+    "al_strategy": {"zh": "不确定度指标", "en": "Uncertainty"},
+    "al_no_model": {"zh": "还没有训练完成的模型", "en": "No trained model yet"},
+    "al_empty": {"zh": "没有未标注的动作", "en": "No unlabeled actions"},
+    "al_remaining": {"zh": "剩余未标注", "en": "Unlabeled remaining"},
+    "al_uncertainty": {"zh": "不确定度", "en": "Uncertainty"},
     "status_col": {"zh": "状态", "en": "Status"},
     "valid": {"zh": "有效", "en": "Active"},
     "deleted": {"zh": "已删除", "en": "Deleted"},
@@ -126,6 +138,12 @@ TRANSLATIONS = {
     "svm_name": {"zh": "SVM (支持向量机)", "en": "SVM (Support Vector Machine)"},
     "dt_name": {"zh": "决策树", "en": "Decision Tree"},
     "rf_name": {"zh": "随机森林", "en": "Random Forest"},
+    "svm_approx_name": {"zh": "SVM 近似核（大数据量）", "en": "Approximate-kernel SVM (large data)"},
+    "hgb_name": {"zh": "直方图梯度提升（大数据量）", "en": "Histogram Gradient Boosting (large data)"},
+    "incremental_sgd_name": {"zh": "增量 SGD（逻辑回归）", "en": "Incremental SGD (logistic regression)"},
+    "incremental_nb_name": {"zh": "增量朴素贝叶斯", "en": "Incremental Naive Bayes"},
+    "incremental_hint": {"zh": "增量模型在训练历史中点击「增量更新」，只训练新增或改过标注的动作", "en": "Use \"Incremental update\" in the training history to train only new or relabeled actions"},
+    "incremental_update": {"zh": "增量更新", "en": "Incremental update"},
     "regularization": {"zh": "C (正则化)", "en": "C (Regularization)"},
     "tree_count": {"zh": "树数量", "en": "Number of Trees"},
     "max_depth_label": {"zh": "Max Depth (0=无限)", "en": "Max Depth (0=unlimited)"},
@@ -134,6 +152,20 @@ TRANSLATIONS = {
     "training_progress": {"zh": "训练中...", "en": "Training..."},
     "training_complete": {"zh": "训练完成！", "en": "Training complete!"},
     "training_failed": {"zh": "训练失败", "en": "Training failed"},
+    "training_queued": {"zh": "已加入训练队列", "en": "Queued for training"},
+    "training_cancelled": {"zh": "训练已取消", "en": "Training cancelled"},
+    "cancel_training": {"zh": "取消", "en": "Cancel"},
+    "eval_mode": {"zh": "评估方式", "en": "Evaluation"},
+    "eval_full": {"zh": "完整（交叉验证 + 80/20 划分）", "en": "Full (CV + 80/20 split)"},
+    "eval_fast": {"zh": "快速（交叉验证 out-of-fold 预测）", "en": "Fast (out-of-fold CV predictions)"},
+    "eval_prequential": {"zh": "Prequential（先预测再训练）", "en": "Prequential (test-then-train)"},
+    "train_seconds": {"zh": "训练耗时", "en": "Training time"},
+    "hyperparam_search": {"zh": "🔍 超参数搜索", "en": "🔍 Hyperparameter Search"},
+    "search_strategy": {"zh": "搜索策略", "en": "Search Strategy"},
+    "search_candidates_n": {"zh": "候选数（random / halving）", "en": "Candidates (random / halving)"},
+    "start_search": {"zh": "开始搜索", "en": "Start Search"},
+    "search_progress": {"zh": "搜索中...", "en": "Searching..."},
+    "search_complete": {"zh": "搜索完成，已用最优参数训练模型", "en": "Search complete, best configuration trained"},
     "results_section": {"zh": "4. 训练结果", "en": "4. Training Results"},
     "accuracy": {"zh": "准确率", "en": "Accuracy"},
     "precision": {"zh": "精确率", "en": "Precision"},
@@ -149,6 +181,20 @@ TRANSLATIONS = {
     "download_pkl": {"zh": "下载 Pickle 模型", "en": "Download Pickle Model"},
     "click_download": {"zh": "点击下载", "en": "Click to download"},
     "coreml_not_exported": {"zh": "CoreML 未导出（需要 coremltools）", "en": "CoreML not exported (requires coremltools)"},
+    "compact_export": {"zh": "⌚ 手表精简导出", "en": "⌚ Compact watch export"},
+    "compact_export_hint": {"zh": "把模型蒸馏成预算内的小决策树或少量特征的线性模型，预算填 0 表示不限制（至少填一项）", "en": "Distill the model into a small decision tree or a linear model on a few features within the budget; 0 means no limit (set at least one)"},
+    "compact_max_kb": {"zh": "体积上限 (KB)", "en": "Size budget (KB)"},
+    "compact_max_nodes": {"zh": "节点数上限", "en": "Node budget"},
+    "compact_student": {"zh": "学生模型", "en": "Student model"},
+    "compact_export_button": {"zh": "蒸馏并导出", "en": "Distill and export"},
+    "compact_exporting": {"zh": "正在蒸馏...", "en": "Distilling..."},
+    "compact_export_failed": {"zh": "精简导出失败", "en": "Compact export failed"},
+    "compact_size": {"zh": "体积", "en": "Size"},
+    "compact_nodes": {"zh": "节点", "en": "nodes"},
+    "compact_units": {"zh": "节点 / 特征数", "en": "Nodes / features"},
+    "compact_fidelity": {"zh": "保真度", "en": "Fidelity"},
+    "compact_latency": {"zh": "单样本耗时", "en": "Single-sample latency"},
+    "compact_teacher_hint": {"zh": "灰色数字为原模型的体积和单样本耗时；保真度 = 在留出样本上与原模型预测一致的比例", "en": "Grey numbers are the original model's size and latency; fidelity = agreement with the original model on held-out samples"},
     "training_history": {"zh": "训练历史", "en": "Training History"},
     "no_training_history": {"zh": "还没有训练记录", "en": "No training records yet"},
     "model_label": {"zh": "模型", "en": "Model"},
@@ -3,6 +3,7 @@
 """
 import streamlit as st
 import requests
+import time
 from i18n import language_selector, t
 
 API_URL = "http://localhost:8000"
@@ -21,6 +22,21 @@ def api_get(path):
         return None
 
 
+def api_get_all(path, key):
+    """按 next_cursor 翻页取回完整列表，返回结构与单页相同"""
+    items, after = [], None
+    while True:
+        sep = "&" if "?" in path else "?"
+        page = api_get(f"{path}{sep}limit=1000" + (f"&after={after}" if after else ""))
+        if page is None:
+            return None
+        items.extend(page.get(key, []))
+        after = page.get("next_cursor")
+        if not after:
+            page[key] = items
+            return page
+
+
 def api_post(path, json_data=None):
     try:
         r = requests.post(f"{API_URL}{path}", json=json_data, timeout=5)
@@ -60,6 +76,9 @@ st.markdown("---")
 # ---- 项目列表 ----
 st.subheader(t("existing_projects"))
 data = api_get("/api/projects/list")
+# 已完成的训练记录，用于选择项目的部署模型
+runs_data = api_get_all("/api/training/runs", "runs")
+completed_runs = [r for r in (runs_data or {}).get("runs", []) if r["status"] == "completed"]
 if data and data.get("projects"):
     for proj in data["projects"]:
         with st.container(border=True):
@@ -67,6 +86,7 @@ if data and data.get("projects"):
             with col1:
                 st.markdown(f"### {proj['name']}")
                 st.caption(f"ID: {proj['id']} | {proj.get('description', '')}")
+                st.caption(f"{t('deployed_model')}: {proj.get('deployed_run_id') or t('not_deployed')}")
             with col2:
                 st.metric("Sessions", proj.get('session_count', 0))
             with col3:
@@ -74,6 +94,34 @@ if data and data.get("projects"):
                     api_delete(f"/api/projects/{proj['id']}")
                     st.rerun()
 
+        # 部署模型：推理接口 /api/inference/predict 只传 project_id 时使用
+        run_options = [None] + [r["run_id"] for r in completed_runs if r["project_id"] in ("", proj["id"])]
+        with st.expander(f"{t('deploy_model')} - {proj['name']}"):
+            current = proj.get("deployed_run_id")
+            choice = st.selectbox(
+                t("deployed_model"), run_options,
+                index=run_options.index(current) if current in run_options else 0,
+                format_func=lambda x: x or t("not_deployed"),
+                key=f"deploy_run_{proj['id']}",
+            )
+            if st.button(t("deploy_btn"), key=f"deploy_{proj['id']}"):
+                api_post("/api/inference/deploy", {"project_id": proj["id"], "run_id": choice})
+                st.rerun()
+
+            # 用部署模型给项目里未标注的动作写 ml_quality
+            if current and st.button(t("auto_label_btn"), key=f"auto_label_{proj['id']}"):
+                job = api_post("/api/inference/auto-label", {"project_id": proj["id"]})
+                progress = st.progress(0.0)
+                while job and job["status"] in ("pending", "running"):
+                    time.sleep(1)
+                    job = api_get(f"/api/inference/auto-label/{job['job_id']}")
+                    if job:
+                        progress.progress(job["progress"], text=f"{job['processed']} / {job['total']}")
+                if job and job["status"] == "completed":
+                    st.success(t("auto_label_done").format(good=job["good_count"], bad=job["bad_count"]))
+                elif job:
+                    st.error(f"{t('request_failed')}: {job.get('error')}")
+
         # 显示关联的 sessions
         proj_detail = api_get(f"/api/projects/{proj['id']}")
         if proj_detail and proj_detail.get("sessions"):
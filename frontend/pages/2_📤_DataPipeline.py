@@ -24,6 +24,21 @@ def api_get(path, timeout=10):
         return None
 
 
+def api_get_all(path, key):
+    """按 next_cursor 翻页取回完整列表，返回结构与单页相同"""
+    items, after = [], None
+    while True:
+        sep = "&" if "?" in path else "?"
+        page = api_get(f"{path}{sep}limit=1000" + (f"&after={after}" if after else ""))
+        if page is None:
+            return None
+        items.extend(page.get(key, []))
+        after = page.get("next_cursor")
+        if not after:
+            page[key] = items
+            return page
+
+
 def api_post(path, json_data=None, files=None, data=None, timeout=30):
     try:
         r = requests.post(f"{API_URL}{path}", json=json_data, files=files, data=data, timeout=timeout)
@@ -105,7 +120,7 @@ st.markdown("---")
 # ============================================================
 st.subheader(t("step2_title"))
 
-sessions_data = api_get("/api/sessions/list")
+sessions_data = api_get_all("/api/sessions/list", "sessions")
 if not sessions_data or not sessions_data.get("sessions"):
     st.info(t("no_data_upload"))
     st.stop()
@@ -129,7 +144,7 @@ selected_session_label = st.selectbox(
 session_id = session_options[selected_session_label]
 
 # 加载动作列表
-actions_data = api_get(f"/api/sessions/{session_id}/actions?include_deleted=true")
+actions_data = api_get_all(f"/api/sessions/{session_id}/actions?include_deleted=true", "actions")
 if not actions_data or not actions_data.get("actions"):
     st.warning(t("no_action_data"))
     st.stop()
@@ -213,14 +228,40 @@ with btn_col3:
             quality_changes.append((row["ID"], row[t("quality")]))
 
     if st.button(f"{t('save_labels')} ({len(quality_changes)})", disabled=len(quality_changes) == 0):
-        for action_id, new_quality in quality_changes:
-            requests.put(
-                f"{API_URL}/api/sessions/{session_id}/actions/{action_id}",
-                json={"manual_quality": new_quality},
-                timeout=5,
-            )
-        st.success(f"{t('updated_n')} {len(quality_changes)}")
-        st.rerun()
+        # 所有改动一次提交，后端单事务写入
+        result = api_post(
+            f"/api/sessions/{session_id}/actions/bulk-update",
+            json_data=[
+                {"action_id": int(action_id), "manual_quality": new_quality}
+                for action_id, new_quality in quality_changes
+            ],
+        )
+        if result:
+            st.success(f"{t('updated_n')} {result['updated']}")
+            st.rerun()
+
+# 主动学习队列：模型最拿不准的未标注动作排在前面，逐个标注
+with st.expander(t("al_queue")):
+    strategy = st.radio(t("al_strategy"), ["margin", "entropy"], horizontal=True)
+    queue = api_get(f"/api/active-learning/queue?session_ids={session_id}&strategy={strategy}&limit=10")
+    if not queue:
+        st.info(t("al_no_model"))
+    elif not queue["items"]:
+        st.info(t("al_empty"))
+    else:
+        st.caption(f"{t('al_remaining')}: {queue['total']} | {t('model_label')}: {queue['run_id']}")
+        for item in queue["items"]:
+            q1, q2, q3, q4, q5 = st.columns([1, 1, 2, 1, 1])
+            q1.write(f"#{item['action_index']}")
+            q2.write(f"{item['t_peak']:.3f}s")
+            q3.write(f"{t('ml_pred')}: {item['predicted']} ({item['confidence']:.0%}) | "
+                     f"{t('al_uncertainty')}: {item['uncertainty']:.3f}")
+            for col, quality in ((q4, "good"), (q5, "bad")):
+                if col.button(quality, key=f"al_{quality}_{item['action_id']}"):
+                    api_post("/api/active-learning/label", json_data=[
+                        {"action_id": item["action_id"], "manual_quality": quality}
+                    ])
+                    st.rerun()
 
 st.markdown("---")
 
@@ -25,8 +25,23 @@ def api_get(path):
         return None
 
 
+def api_get_all(path, key):
+    """按 next_cursor 翻页取回完整列表，返回结构与单页相同"""
+    items, after = [], None
+    while True:
+        sep = "&" if "?" in path else "?"
+        page = api_get(f"{path}{sep}limit=1000" + (f"&after={after}" if after else ""))
+        if page is None:
+            return None
+        items.extend(page.get(key, []))
+        after = page.get("next_cursor")
+        if not after:
+            page[key] = items
+            return page
+
+
 # ---- 加载 Sessions ----
-sessions_data = api_get("/api/sessions/list")
+sessions_data = api_get_all("/api/sessions/list", "sessions")
 if not sessions_data or not sessions_data.get("sessions"):
     st.info(t("no_data_upload"))
     st.stop()
@@ -8,6 +8,7 @@ import pandas as pd
 import plotly.figure_factory as ff
 import plotly.graph_objects as go
 import numpy as np
+import time
 from i18n import language_selector, t
 
 API_URL = "http://localhost:8000"
@@ -26,6 +27,21 @@ def api_get(path):
         return None
 
 
+def api_get_all(path, key):
+    """按 next_cursor 翻页取回完整列表，返回结构与单页相同"""
+    items, after = [], None
+    while True:
+        sep = "&" if "?" in path else "?"
+        page = api_get(f"{path}{sep}limit=1000" + (f"&after={after}" if after else ""))
+        if page is None:
+            return None
+        items.extend(page.get(key, []))
+        after = page.get("next_cursor")
+        if not after:
+            page[key] = items
+            return page
+
+
 def api_post(path, json_data):
     try:
         r = requests.post(f"{API_URL}{path}", json=json_data, timeout=60)
@@ -37,7 +53,7 @@ def api_post(path, json_data):
 
 
 # ---- 加载 Sessions ----
-sessions_data = api_get("/api/sessions/list")
+sessions_data = api_get_all("/api/sessions/list", "sessions")
 if not sessions_data or not sessions_data.get("sessions"):
     st.info(t("no_data_upload_short"))
     st.stop()
@@ -75,23 +91,33 @@ st.markdown("---")
 # ---- Step 2: 模型配置 ----
 st.subheader(t("model_config"))
 
-model_type_names = {"svm": t("svm_name"), "decision_tree": t("dt_name"), "random_forest": t("rf_name")}
+model_type_names = {
+    "svm": t("svm_name"), "decision_tree": t("dt_name"), "random_forest": t("rf_name"),
+    "svm_approx": t("svm_approx_name"), "hist_gradient_boosting": t("hgb_name"),
+    "incremental_sgd": t("incremental_sgd_name"), "incremental_nb": t("incremental_nb_name"),
+}
 
 col1, col2 = st.columns(2)
 
 with col1:
     model_type = st.selectbox(
         t("model_type"),
-        ["svm", "decision_tree", "random_forest"],
+        list(model_type_names),
         format_func=lambda x: model_type_names[x]
     )
 
 with col2:
-    if model_type == "svm":
+    if model_type in ("svm", "svm_approx"):
         svm_c = st.slider(t("regularization"), 0.01, 10.0, 1.0, step=0.1)
         svm_kernel = st.selectbox("Kernel", ["rbf", "linear", "poly"])
         max_depth = None
         n_estimators = 100
+    elif model_type.startswith("incremental_"):
+        st.caption(t("incremental_hint"))
+        svm_c = 1.0
+        svm_kernel = "rbf"
+        max_depth = None
+        n_estimators = 100
     elif model_type == "decision_tree":
         max_depth = st.slider("Max Depth", 1, 20, 5)
         svm_c = 1.0
@@ -105,27 +131,77 @@ with col2:
         svm_c = 1.0
         svm_kernel = "rbf"
 
+eval_mode = st.radio(
+    t("eval_mode"), ["full", "fast"], horizontal=True,
+    format_func=lambda x: t(f"eval_{x}"),
+)
+
 st.markdown("---")
 
 # ---- Step 3: 开始训练 ----
 st.subheader(t("training_section"))
 
 if st.button(t("start_training"), type="primary", use_container_width=True, disabled=not selected_ids):
-    with st.spinner(t("training_progress")):
-        result = api_post("/api/training/start", {
-            "session_ids": selected_ids,
-            "model_type": model_type,
-            "svm_c": svm_c,
-            "svm_kernel": svm_kernel,
-            "max_depth": max_depth,
-            "n_estimators": n_estimators,
-        })
-
-    if result and result.get("status") == "completed":
+    job = api_post("/api/training/start", {
+        "session_ids": selected_ids,
+        "model_type": model_type,
+        "svm_c": svm_c,
+        "svm_kernel": svm_kernel,
+        "max_depth": max_depth,
+        "n_estimators": n_estimators,
+        "eval_mode": eval_mode,
+    })
+
+    # 训练在后台队列执行，这里轮询状态直到结束
+    result = None
+    if job:
+        with st.spinner(t("training_progress")):
+            while True:
+                result = api_get(f"/api/training/status/{job['run_id']}")
+                if result and result["status"] in ("completed", "failed", "cancelled"):
+                    break
+                time.sleep(1)
+
+    if result and result["status"] == "completed":
         st.success(t("training_complete"))
         st.session_state["last_training_result"] = result
+    elif result and result["status"] == "cancelled":
+        st.warning(t("training_cancelled"))
     elif result:
-        st.error(f"{t('training_failed')}: {result}")
+        st.error(f"{t('training_failed')}: {result.get('error')}")
+
+# 超参数搜索：搜索当前模型类型的默认参数空间，最优参数训练的模型作为结果显示
+with st.expander(t("hyperparam_search")):
+    sc1, sc2 = st.columns(2)
+    strategy = sc1.selectbox(t("search_strategy"), ["grid", "random", "halving"])
+    n_iter = sc2.slider(t("search_candidates_n"), 2, 30, 10)
+    if st.button(t("start_search"), disabled=not selected_ids):
+        job = api_post("/api/training/search", {
+            "session_ids": selected_ids,
+            "model_type": model_type,
+            "strategy": strategy,
+            "n_iter": n_iter,
+            "eval_mode": eval_mode,
+        })
+        search = None
+        if job:
+            with st.spinner(t("search_progress")):
+                while True:
+                    search = api_get(f"/api/training/search/{job['run_id']}")
+                    if search and search["search"]["status"] in ("completed", "failed", "cancelled"):
+                        break
+                    time.sleep(1)
+
+        if search and search["search"]["status"] == "completed":
+            st.success(t("search_complete"))
+            st.session_state["last_training_result"] = search["search"]
+            st.dataframe(pd.DataFrame([
+                {"run_id": c["run_id"], **{k: v for k, v in c["hyperparams"].items() if k != "model_type"},
+                 "cv_mean": c["cv_mean"], "cv_std": c["cv_std"], "samples": c["sample_count"]}
+                for c in search["candidates"]
+            ]), use_container_width=True, hide_index=True)
+        elif search:
+            st.error(f"{t('training_failed')}: {search['search'].get('error')}")
 
 # ---- Step 4: 显示结果 ----
 result = st.session_state.get("last_training_result")
@@ -133,18 +209,24 @@ if result:
     st.markdown("---")
     st.subheader(t("results_section"))
 
+    # 增量模型第一次训练还没有 prequential 评估结果，指标为空
+    def pct(value):
+        return "-" if value is None else f"{value:.1%}"
+
     c1, c2, c3, c4 = st.columns(4)
-    c1.metric(t("accuracy"), f"{result['accuracy']:.1%}")
-    c2.metric(t("precision"), f"{result['precision']:.1%}")
-    c3.metric(t("recall"), f"{result['recall']:.1%}")
-    c4.metric(t("f1_score"), f"{result['f1_score']:.1%}")
+    c1.metric(t("accuracy"), pct(result["accuracy"]))
+    c2.metric(t("precision"), pct(result["precision"]))
+    c3.metric(t("recall"), pct(result["recall"]))
+    c4.metric(t("f1_score"), pct(result["f1_score"]))
 
     col1, col2 = st.columns(2)
 
     with col1:
         st.markdown(f"**{t('cross_val')}**")
-        st.write(f"{t('cv_mean')}: {result['cv_mean']:.1%} ± {result['cv_std']:.1%}")
+        st.write(f"{t('cv_mean')}: {pct(result['cv_mean'])} ± {pct(result['cv_std'])}")
         st.write(f"{t('sample_count')}: {result['sample_count']}")
+        if result.get("train_seconds") is not None:
+            st.write(f"{t('train_seconds')}: {result['train_seconds']:.2f}s ({t('eval_' + result['eval_mode'])})")
 
     with col2:
         st.markdown(f"**{t('confusion_matrix')}**")
@@ -182,18 +264,82 @@ if result:
             st.markdown(f"**{t('download_pkl')}**")
             st.markdown(f"[{t('click_download')} tennis_model_{run_id}.pkl]({API_URL}/api/training/download/{run_id}?fmt=pkl)")
 
+        # 手表精简导出：把模型蒸馏成预算内的小决策树 / 线性模型
+        with st.expander(t("compact_export")):
+            st.caption(t("compact_export_hint"))
+            c1, c2, c3 = st.columns(3)
+            max_kb = c1.number_input(t("compact_max_kb"), min_value=0.0, value=16.0, step=1.0)
+            max_nodes = c2.number_input(t("compact_max_nodes"), min_value=0, value=0, step=16)
+            student = c3.selectbox(t("compact_student"), ["auto", "tree", "linear"])
+            if st.button(t("compact_export_button")):
+                job = api_post(f"/api/training/compact-export/{run_id}", {
+                    "max_bytes": int(max_kb * 1024) or None,
+                    "max_nodes": int(max_nodes) or None,
+                    "student": student,
+                })
+                if job:
+                    with st.spinner(t("compact_exporting")):
+                        while job and job["status"] in ("pending", "running"):
+                            time.sleep(1)
+                            job = api_get(f"/api/training/compact-export/jobs/{job['job_id']}")
+                    if job and job["status"] == "completed":
+                        result["compact_export"] = job["report"]
+                    elif job:
+                        st.error(f"{t('compact_export_failed')}: {job.get('error')}")
+
+            report = result.get("compact_export")
+            if report:
+                size = f"{report['size_bytes'] / 1024:.1f} KB"
+                if report.get("nodes"):
+                    size += f" / {report['nodes']} {t('compact_nodes')}"
+                c1, c2, c3, c4 = st.columns(4)
+                c1.metric(t("compact_student"), report["student"])
+                c2.metric(t("compact_size"), size, f"{report['teacher_bytes'] / 1024:.0f} KB", delta_color="off")
+                c3.metric(t("compact_fidelity"), f"{report['fidelity']:.1%}")
+                c4.metric(
+                    t("compact_latency"), f"{report['latency_us']['p50']:.0f} µs",
+                    f"{report['teacher_latency_us']['p50']:.0f} µs", delta_color="off",
+                )
+                st.caption(t("compact_teacher_hint"))
+                st.dataframe(pd.DataFrame([
+                    {
+                        t("compact_student"): c["student"],
+                        t("compact_size"): c["size_bytes"],
+                        t("compact_units"): c["nodes"] if c["nodes"] is not None else c["params"]["n_features"],
+                        t("compact_fidelity"): c["fidelity"],
+                        t("accuracy"): c["accuracy"],
+                    }
+                    for c in report["candidates"]
+                ]), hide_index=True, use_container_width=True)
+                st.markdown(f"[{t('click_download')}]({API_URL}/api/training/download/{run_id}?fmt=compact)")
+
 st.markdown("---")
 
 # ---- 训练历史 ----
 st.subheader(t("training_history"))
-runs_data = api_get("/api/training/runs")
+runs_data = api_get_all("/api/training/runs", "runs")
 if runs_data and runs_data.get("runs"):
     for run in reversed(runs_data["runs"]):
         with st.container(border=True):
-            c1, c2, c3, c4 = st.columns(4)
+            c1, c2, c3, c4, c5 = st.columns(5)
             c1.write(f"**{run['run_id']}**")
             c2.write(f"{t('model_label')}: {run['model_type']}")
-            c3.write(f"{t('accuracy_label')}: {run['accuracy']:.1%}")
-            c4.write(f"{t('samples_label')}: {run['sample_count']}")
+            if run["status"] == "completed":
+                accuracy = "-" if run["accuracy"] is None else f"{run['accuracy']:.1%}"
+                c3.write(f"{t('accuracy_label')}: {accuracy}")
+                c4.write(f"{t('samples_label')}: {run['sample_count']}")
+            else:
+                c3.write(f"{t('status')}: {run['status']}")
+                if run.get("error"):
+                    c4.caption(run["error"])
+            if run["status"] in ("pending", "training"):
+                if c5.button(t("cancel_training"), key=f"cancel_{run['run_id']}"):
+                    api_post(f"/api/training/cancel/{run['run_id']}", None)
+                    st.rerun()
+            elif run["model_type"].startswith("incremental_"):
+                # 增量模型：用上方选中的 session 做一次增量更新
+                if c5.button(t("incremental_update"), key=f"update_{run['run_id']}", disabled=not selected_ids):
+                    api_post(f"/api/training/incremental/{run['run_id']}/update", {"session_ids": selected_ids})
+                    st.rerun()
 else:
     st.info(t("no_training_history"))
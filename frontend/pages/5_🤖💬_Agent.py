@@ -35,6 +35,21 @@ def api_get(path):
         return None
 
 
+def api_get_all(path, key):
+    """按 next_cursor 翻页取回完整列表，返回结构与单页相同"""
+    items, after = [], None
+    while True:
+        sep = "&" if "?" in path else "?"
+        page = api_get(f"{path}{sep}limit=1000" + (f"&after={after}" if after else ""))
+        if page is None:
+            return None
+        items.extend(page.get(key, []))
+        after = page.get("next_cursor")
+        if not after:
+            page[key] = items
+            return page
+
+
 def load_conversations():
     """从后端加载对话列表"""
     result = api_get("/api/agent/conversations")
@@ -45,7 +60,7 @@ def load_conversations():
 
 def load_history(conversation_id):
     """从后端加载对话历史"""
-    result = api_get(f"/api/agent/history/{conversation_id}")
+    result = api_get_all(f"/api/agent/history/{conversation_id}", "messages")
     if result and result.get("messages"):
         return [{"role": m["role"], "content": m["content"]} for m in result["messages"]]
     return []